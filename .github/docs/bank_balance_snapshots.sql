@@ -0,0 +1,20 @@
+-- Snapshot dei saldi bancari per giorno Mystara (absolute_day) e riconciliazione con i movimenti.
+-- Ogni avanzamento del tempo e il comando Banche > Riconcilia Saldi registrano una riga per banca:
+--   balance             saldo current_balance al giorno indicato
+--   expected_balance    saldo ricalcolato: snapshot precedente + movimenti successivi (NULL sul primo snapshot)
+--   drift               balance - expected_balance (diverso da 0 = saldo modificato senza movimento)
+--   last_transaction_id ultimo id di bank_transactions gia' conteggiato
+-- La chiave primaria (bank_id, absolute_day) rende immediata la lettura del saldo a una data.
+-- Eseguire una sola volta sul database MariaDB.
+
+CREATE TABLE IF NOT EXISTS bank_balance_snapshots (
+    bank_id INT NOT NULL,
+    absolute_day INT NOT NULL,
+    balance DECIMAL(15,2) NOT NULL,
+    expected_balance DECIMAL(15,2) NULL,
+    drift DECIMAL(15,2) NULL,
+    last_transaction_id INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (bank_id, absolute_day),
+    CONSTRAINT fk_bank_balance_snapshots_bank FOREIGN KEY (bank_id) REFERENCES banks(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,8 @@
+-- Indice per lo storico bancario a pagine (Banche > Storico).
+-- Lo storico legge le operazioni di una banca dalla piu' recente con paginazione keyset
+-- su (timestamp, id): con questo indice ogni pagina e' una lettura di intervallo,
+-- senza ordinamento in memoria ne' scansione di tutto lo storico della banca.
+-- Eseguire una sola volta sul database MariaDB.
+
+ALTER TABLE bank_transactions
+    ADD INDEX IF NOT EXISTS idx_bank_transactions_bank_ts_id (bank_id, timestamp, id);
@@ -0,0 +1,9 @@
+-- Indice per la scadenza automatica degli effetti di stato (Gestione Tempo).
+-- Ogni avanzamento del tempo disattiva con un solo UPDATE gli effetti attivi con
+-- end_absolute_day <= nuovo giorno assoluto: con questo indice l'UPDATE legge solo
+-- l'intervallo degli effetti attivi in scadenza invece di scorrere tutta la tabella,
+-- e le letture degli effetti attivi ordinate per giorno di fine restano rapide.
+-- Eseguire una sola volta sul database MariaDB.
+
+ALTER TABLE pc_status_effects
+    ADD INDEX IF NOT EXISTS idx_pc_status_effects_active_end (is_active, end_absolute_day);
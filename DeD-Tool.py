@@ -1,21 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, simpledialog, filedialog
-import requests
 import os
 import sys
 from datetime import date as date, datetime as datetime, timedelta as timedelta
 from decimal import Decimal
 import pymysql
-from cryptography.fernet import Fernet
 import json
+import gzip
+import hashlib
 import traceback
-import pandas as pd
-from openai import OpenAI
-import smtplib
-from email.message import EmailMessage
 import re
+import bisect
+from collections import deque
 import threading
-from dbutils.pooled_db import PooledDB
+import queue
+import uuid
+import csv
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+# openpyxl, openai, cryptography, smtplib, requests e dbutils vengono importati dalle funzioni
+# che li usano: l'avvio non paga il loro tempo di caricamento
 
 __VERSION__ = "1.0.7"
 
@@ -23,8 +27,14 @@ __VERSION__ = "1.0.7"
 VERSION_URL = "https://raw.githubusercontent.com/MaxTrevi/DeD-Tool/main/version.txt"
 SCRIPT_URL = "https://raw.githubusercontent.com/MaxTrevi/DeD-Tool/main/DeD-Tool.py"
 
-def check_for_updates():
+def check_for_updates(interactive=True):
+    """
+    Controlla la versione pubblicata e, se piu' recente, sovrascrive lo script.
+    In modalita' interattiva attende Invio e chiude il programma; altrimenti restituisce
+    la versione installata (None se non c'e' aggiornamento) e lascia decidere al chiamante.
+    """
     try:
+        import requests
         response = requests.get(VERSION_URL, timeout=5)
         response.raise_for_status()
         latest_version = response.text.strip()
@@ -40,10 +50,785 @@ def check_for_updates():
                 f.write(response.content)
 
             print("✅ Aggiornamento completato. Riavvia il programma.")
+            if not interactive:
+                return latest_version
             input("Premi Invio per chiudere...")
             sys.exit(0)
     except Exception as e:
         print(f"⚠️ Errore durante il controllo aggiornamenti: {e}")
+    return None
+
+class CharacterSheetTabHost(ttk.Frame):
+    """
+    Segnaposto di una tab della Scheda Personaggio costruita alla prima selezione.
+    I create_character_*_tab usano l'host come notebook: add() impacchetta la tab nell'host.
+    """
+
+    def add(self, child, **options):
+        child.pack(fill='both', expand=True)
+
+
+class TreeFilterModel:
+    """
+    Righe di una Treeview caricate una volta per refresh e filtrate in locale.
+    La ricerca usa il testo minuscolo di ogni riga; se il nuovo testo estende il precedente
+    si filtra solo il risultato precedente. La Treeview viene aggiornata per differenza:
+    le righe escluse vengono staccate (detach) e quelle che tornano visibili riattaccate.
+    """
+
+    DEBOUNCE_MS = 200
+
+    def __init__(self, tree, values_fn, search_fn, tags_fn=None, striped=False):
+        self.tree = tree
+        self.values_fn = values_fn
+        self.search_fn = search_fn
+        self.tags_fn = tags_fn or (lambda row: ())
+        self.striped = striped
+        self.order = []
+        self.rows = {}
+        self.search_keys = {}
+        self.filter_text = ''
+        self.matches = []
+        self._stripe = {}
+        self._after_id = None
+
+    def set_rows(self, rows, iid_fn):
+        """Sostituisce il modello (righe gia' ordinate) e riapplica il filtro corrente."""
+        self._cancel_pending()
+        self.tree.delete(*self.order)
+        self.order = []
+        self.rows = {}
+        self.search_keys = {}
+        self._stripe = {}
+        for row in rows:
+            iid = str(iid_fn(row))
+            self.order.append(iid)
+            self.rows[iid] = row
+            self.search_keys[iid] = (self.search_fn(row) or '').casefold()
+        self.matches = []
+        self._apply(self.filter_text, reuse_previous=False)
+
+    def schedule_filter(self, text):
+        """Filtro con debounce: viene applicato solo DEBOUNCE_MS dopo l'ultimo tasto."""
+        self._cancel_pending()
+        self._after_id = self.tree.after(self.DEBOUNCE_MS, lambda: self.apply_filter(text))
+
+    def apply_filter(self, text):
+        self._after_id = None
+        self._apply(text, reuse_previous=True)
+
+    def _cancel_pending(self):
+        if self._after_id:
+            try:
+                self.tree.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+
+    def _apply(self, text, reuse_previous):
+        needle = (text or '').strip().casefold()
+        previous = (self.filter_text or '').strip().casefold()
+        if reuse_previous and previous and needle.startswith(previous):
+            candidates = self.matches
+        else:
+            candidates = self.order
+        if needle:
+            matches = [iid for iid in candidates if needle in self.search_keys[iid]]
+        else:
+            matches = list(self.order)
+        self.filter_text = text or ''
+        self.matches = matches
+        self._sync_tree(matches)
+
+    def _sync_tree(self, matches):
+        visible = set(matches)
+        attached = self.tree.get_children()
+        removed = [iid for iid in attached if iid not in visible]
+        if removed:
+            self.tree.detach(*removed)
+        attached = set(attached) - set(removed)
+
+        for index, iid in enumerate(matches):
+            row = self.rows[iid]
+            tags = tuple(self.tags_fn(row))
+            if self.striped:
+                tags += ('evenrow' if index % 2 == 0 else 'oddrow',)
+            if iid in attached:
+                if self.striped and self._stripe.get(iid) != index % 2:
+                    self.tree.item(iid, tags=tags)
+            elif self.tree.exists(iid):
+                self.tree.move(iid, '', index)
+                self.tree.item(iid, tags=tags)
+            else:
+                self.tree.insert('', index, iid=iid, values=self.values_fn(row), tags=tags)
+            self._stripe[iid] = index % 2
+
+
+class CharacterSnapshot:
+    """
+    Istantanea dei dati di un PG per la Scheda Personaggio aperta.
+    All'apertura legge player_characters e le tabelle figlie pc_* in parallelo su
+    connessioni del pool; le tab costruite leggono da qui e refresh(table) ricarica
+    una sola tabella dopo una modifica.
+    """
+
+    TABLES = (
+        'pc_armi', 'pc_armature', 'pc_containers', 'pc_inventario', 'pc_oggetti_magici',
+        'pc_linguaggi', 'pc_abilita_ladro', 'pc_cavalcature', 'pc_mercenari',
+        'pc_consiglieri', 'pc_specialisti', 'pc_pergamene', 'pc_azioni_speciali',
+        'pc_possedimenti', 'pc_spellbook', 'pc_spell_prepared',
+    )
+    PARALLEL_WORKERS = 4
+
+    def __init__(self, gui, pg_id, user_id=None):
+        self.gui = gui
+        self.pg_id = int(pg_id)
+        self.user_id = user_id
+        self.character = None
+        self.tables = {}
+
+    def _fetch_character(self, cursor):
+        if self.user_id is not None:
+            cursor.execute(
+                "SELECT * FROM player_characters WHERE id = %s AND user_id = %s",
+                (self.pg_id, self.user_id)
+            )
+        else:
+            cursor.execute("SELECT * FROM player_characters WHERE id = %s", (self.pg_id,))
+        return cursor.fetchone()
+
+    def _fetch_table(self, cursor, table):
+        cursor.execute(f"SELECT * FROM {table} WHERE pg_id = %s", (self.pg_id,))
+        return list(cursor.fetchall() or [])
+
+    def _fetch_group(self, tables):
+        """Legge un gruppo di tabelle su una connessione del pool (eseguito in un thread)."""
+        results = {}
+        conn, cursor = None, None
+        try:
+            conn = self.gui.connection_pool.connection()
+            cursor = conn.cursor()
+            for table in tables:
+                try:
+                    results[table] = self._fetch_table(cursor, table)
+                except Exception as e:
+                    print(f"⚠️ Snapshot PG {self.pg_id}: lettura {table} fallita: {e}")
+        finally:
+            try:
+                if cursor:
+                    cursor.close()
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
+        return results
+
+    def load(self):
+        """Carica PG e tabelle figlie. Restituisce False se il PG non esiste o non e' accessibile."""
+        cursor = self.gui.db.cursor()
+        try:
+            self.character = self._fetch_character(cursor)
+            if not self.character:
+                return False
+            if not getattr(self.gui, 'connection_pool', None):
+                for table in self.TABLES:
+                    try:
+                        self.tables[table] = self._fetch_table(cursor, table)
+                    except Exception as e:
+                        print(f"⚠️ Snapshot PG {self.pg_id}: lettura {table} fallita: {e}")
+                return True
+        finally:
+            cursor.close()
+
+        groups = [self.TABLES[i::self.PARALLEL_WORKERS] for i in range(self.PARALLEL_WORKERS)]
+        with ThreadPoolExecutor(max_workers=self.PARALLEL_WORKERS) as executor:
+            for results in executor.map(self._fetch_group, groups):
+                self.tables.update(results)
+        return True
+
+    def rows(self, table):
+        """Righe della tabella per il PG; se non ancora lette vengono caricate ora."""
+        if table not in self.tables:
+            return self.refresh(table)
+        return self.tables[table]
+
+    def refresh(self, table):
+        """Rilegge una sola tabella (o 'player_characters') dopo una modifica."""
+        cursor = self.gui.db.cursor()
+        try:
+            if table == 'player_characters':
+                character = self._fetch_character(cursor)
+                if character:
+                    self.character = character
+                return self.character
+            self.tables[table] = self._fetch_table(cursor, table)
+            return self.tables[table]
+        finally:
+            cursor.close()
+
+
+class ChatSyncService:
+    """
+    Sincronizzazione chat unica per client.
+    Tiene l'id massimo visto in chat_messages, legge solo i messaggi nuovi con una query
+    per tick e li distribuisce ai widget iscritti (chat comune, popup segreti, lista contatti).
+    Senza novita' l'intervallo di polling cresce fino a MAX_INTERVAL_MS.
+    """
+
+    MIN_INTERVAL_MS = 1500
+    MAX_INTERVAL_MS = 15000
+    BACKOFF_FACTOR = 1.5
+    FETCH_LIMIT = 500
+
+    def __init__(self, gui):
+        self.gui = gui
+        self.last_seen_id = None
+        self.listeners = {}
+        self._next_token = 0
+        self.interval_ms = self.MIN_INTERVAL_MS
+        self.after_id = None
+
+    def subscribe(self, callback, since_id=None):
+        """
+        Registra callback(messages) e restituisce il token per unsubscribe.
+        since_id e' il punto da cui il widget ha bisogno dei messaggi: max tra l'ultimo id
+        mostrato e read_high_water() letto prima del caricamento iniziale. Cosi' un widget con
+        una conversazione vecchia non riporta indietro il cursore condiviso (il servizio
+        rileggerebbe tutte le chat successive); None se non c'e' nessun riferimento.
+        La callback restituisce gli id mostrati come nuovi, che vengono marcati letti in batch.
+        """
+        self._next_token += 1
+        token = self._next_token
+        self.listeners[token] = callback
+        if since_id and (self.last_seen_id is None or since_id < self.last_seen_id):
+            self.last_seen_id = since_id
+        self.poke()
+        return token
+
+    def unsubscribe(self, token):
+        self.listeners.pop(token, None)
+        if not self.listeners:
+            self.stop()
+
+    def poke(self):
+        """Forza un tick a breve e riporta l'intervallo al minimo (nuovo invio, cambio tab)."""
+        self.interval_ms = self.MIN_INTERVAL_MS
+        self._schedule(0)
+
+    def stop(self):
+        if self.after_id:
+            try:
+                self.gui.root.after_cancel(self.after_id)
+            except Exception:
+                pass
+        self.after_id = None
+
+    def _schedule(self, delay_ms):
+        self.stop()
+        if not self.listeners:
+            return
+        try:
+            self.after_id = self.gui.root.after(delay_ms, self._tick)
+        except Exception:
+            self.after_id = None
+
+    def read_high_water(self, cursor):
+        """Id massimo attuale di chat_messages (tutte le chat), da leggere prima del caricamento iniziale di un widget."""
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM chat_messages")
+        return cursor.fetchone()['max_id'] or 0
+
+    def _fetch_new_messages(self, cursor, user_id):
+        if self.last_seen_id is None:
+            # Riparte dall'id di riferimento dei contatori non letti, se gia' calcolato
+            high_water = getattr(self.gui, '_chat_unread_high_water', None)
+            if high_water is None:
+                high_water = self.read_high_water(cursor)
+            self.last_seen_id = high_water
+            return []
+        cursor.execute("""
+            SELECT
+                c.id,
+                c.message,
+                c.created_at,
+                c.sender_id,
+                c.receiver_id,
+                c.is_secret,
+                CASE
+                    WHEN r.id IS NULL AND c.sender_id != %s THEN 1
+                    ELSE 0
+                END as is_new
+            FROM chat_messages c
+            LEFT JOIN chat_reads r ON c.id = r.message_id AND r.user_id = %s
+            WHERE c.id > %s
+              AND ((c.is_secret = 0 AND c.receiver_id IS NULL)
+                   OR (c.is_secret = 1 AND (c.sender_id = %s OR c.receiver_id = %s)))
+            ORDER BY c.id ASC
+            LIMIT %s
+        """, (user_id, user_id, self.last_seen_id, user_id, user_id, self.FETCH_LIMIT))
+        return list(cursor.fetchall() or [])
+
+    def _tick(self):
+        self.after_id = None
+        if not self.listeners or not self.gui.current_user:
+            return
+
+        user_id = self.gui.current_user['id']
+        conn, cursor = None, None
+        messages = []
+        try:
+            conn, cursor = self.gui.safe_cursor()
+            messages = self._fetch_new_messages(cursor, user_id)
+            if messages:
+                self.last_seen_id = messages[-1]['id']
+
+                read_ids = set()
+                for token, callback in list(self.listeners.items()):
+                    try:
+                        read_ids.update(callback(messages) or [])
+                    except tk.TclError:
+                        # Widget distrutto senza unsubscribe
+                        self.listeners.pop(token, None)
+                    except Exception as e:
+                        print(f"Errore aggiornamento widget chat: {e}")
+
+                if read_ids:
+                    cursor.execute(f"""
+                        INSERT IGNORE INTO chat_reads (user_id, message_id)
+                        VALUES {','.join(['(%s, %s)'] * len(read_ids))}
+                    """, [val for msg_id in sorted(read_ids) for val in (user_id, msg_id)])
+                    conn.commit()
+
+                # Contatori badge: O(messaggi nuovi), senza riconteggio sullo storico
+                read_by_category = {}
+                for m in messages:
+                    category = self.gui._chat_message_category(m)
+                    if category and m['id'] in read_ids:
+                        read_by_category.setdefault(category, []).append(m['id'])
+                for category, ids in read_by_category.items():
+                    self.gui._chat_unread_on_read(category, ids)
+                self.gui._chat_unread_on_new_messages(messages, read_ids)
+        except Exception as e:
+            print(f"Errore sincronizzazione chat: {e}")
+        finally:
+            self.gui.close_connection(conn, cursor)
+
+        if messages:
+            try:
+                self.gui.update_chat_button_fast()
+            except Exception as e:
+                print(f"Errore aggiornamento pulsante chat: {e}")
+            self.interval_ms = self.MIN_INTERVAL_MS
+        else:
+            self.interval_ms = min(self.MAX_INTERVAL_MS, int(self.interval_ms * self.BACKOFF_FACTOR))
+        self._schedule(self.interval_ms)
+
+
+class EmailOutbox:
+    """
+    Coda persistente delle email di notifica.
+    I messaggi vengono salvati in un file JSON locale e spediti da un thread di lavoro che
+    tiene aperta una sola sessione SMTP autenticata; gli errori vengono ritentati con
+    attesa crescente. Lo stato di consegna torna alla GUI tramite root.after.
+    Server, porta, SSL e credenziali sono configurabili (es. server SMTP locale di prova
+    con SMTP_HOST=localhost, SMTP_PORT=8025, SMTP_SSL=0).
+    """
+
+    MAX_ATTEMPTS = 6
+    RETRY_BASE_SECONDS = 30
+    RETRY_MAX_SECONDS = 1800
+    IDLE_CLOSE_SECONDS = 60
+    BATCH_SIZE = 20
+    STATUS_POLL_MS = 500
+
+    def __init__(self, gui, path, host, port, use_ssl, sender, password):
+        self.gui = gui
+        self.path = path
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.sender = sender
+        self.password = password
+        self.messages = []
+        self.callbacks = {}
+        self.status_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._smtp = None
+        self._smtp_last_used = None
+        self._poll_after_id = None
+        self._load()
+
+    # ---- lato GUI ----
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+        self._poll_status()
+
+    def stop(self, timeout=2):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._poll_after_id:
+            try:
+                self.gui.root.after_cancel(self._poll_after_id)
+            except Exception:
+                pass
+            self._poll_after_id = None
+
+    def enqueue(self, to_email, subject, body, on_status=None):
+        """Accoda un'email e restituisce subito l'id; on_status(msg_id, status, error) viene chiamata sul thread Tk."""
+        message = {
+            "id": uuid.uuid4().hex,
+            "to": to_email,
+            "subject": subject,
+            "body": body,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt": 0,
+            "last_error": None,
+            "created_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self.messages.append(message)
+            self._save()
+        if on_status:
+            self.callbacks[message["id"]] = on_status
+        self.start()
+        self._wakeup.set()
+        return message["id"]
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for m in self.messages if m["status"] == "pending")
+
+    def _poll_status(self):
+        """Consegna alla GUI gli stati prodotti dal thread di lavoro (sempre sul thread Tk)."""
+        while True:
+            try:
+                msg_id, to_email, status, error = self.status_queue.get_nowait()
+            except queue.Empty:
+                break
+            callback = self.callbacks.pop(msg_id, None) if status in ("sent", "failed") else self.callbacks.get(msg_id)
+            if status == "sent":
+                print(f"📧 Email inviata con successo a {to_email}")
+            elif status == "failed":
+                print(f"❌ Invio email a {to_email} non riuscito dopo {self.MAX_ATTEMPTS} tentativi: {error}")
+            elif status == "retry":
+                print(f"⚠️ Invio email a {to_email} rinviato: {error}")
+            if callback:
+                try:
+                    callback(msg_id, status, error)
+                except Exception as e:
+                    print(f"Errore notifica stato email: {e}")
+        try:
+            self._poll_after_id = self.gui.root.after(self.STATUS_POLL_MS, self._poll_status)
+        except Exception:
+            self._poll_after_id = None
+
+    # ---- persistenza ----
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.messages = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Coda email non leggibile ({self.path}): {e}")
+            self.messages = []
+
+    def _save(self):
+        """Da chiamare con _lock acquisito. Tiene nel file solo i messaggi non ancora consegnati."""
+        self.messages = [m for m in self.messages if m["status"] != "sent"]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.messages, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    # ---- thread di lavoro ----
+
+    def _run(self):
+        while not self._stopping:
+            now = datetime.now().timestamp()
+            with self._lock:
+                due = [m for m in self.messages if m["status"] == "pending" and m["next_attempt"] <= now]
+                waiting = [m["next_attempt"] for m in self.messages if m["status"] == "pending" and m["next_attempt"] > now]
+            if due:
+                self._send_batch(due[:self.BATCH_SIZE])
+                continue
+
+            if self._smtp and self._smtp_last_used and now - self._smtp_last_used >= self.IDLE_CLOSE_SECONDS:
+                self._close_session()
+            timeout = self.IDLE_CLOSE_SECONDS
+            if waiting:
+                timeout = min(timeout, max(0.5, min(waiting) - now))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+        self._close_session()
+
+    def _open_session(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except Exception:
+                pass
+            self._close_session()
+        import smtplib
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.password:
+            server.login(self.sender, self.password)
+        self._smtp = server
+        return server
+
+    def _close_session(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+        self._smtp = None
+        self._smtp_last_used = None
+
+    def _send_batch(self, batch):
+        import smtplib
+        from email.message import EmailMessage
+
+        for message in batch:
+            if self._stopping:
+                return
+            error = None
+            try:
+                if not self.sender:
+                    raise RuntimeError("mittente email non configurato (GMAIL_USER)")
+                server = self._open_session()
+                msg = EmailMessage()
+                msg["Subject"] = message["subject"]
+                msg["From"] = self.sender
+                msg["To"] = message["to"]
+                msg.set_content(message["body"])
+                server.send_message(msg)
+                self._smtp_last_used = datetime.now().timestamp()
+            except Exception as e:
+                error = str(e)
+                if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                    self._close_session()
+
+            with self._lock:
+                if error is None:
+                    message["status"] = "sent"
+                    status = "sent"
+                else:
+                    message["attempts"] += 1
+                    message["last_error"] = error
+                    if message["attempts"] >= self.MAX_ATTEMPTS:
+                        message["status"] = "failed"
+                        status = "failed"
+                    else:
+                        delay = min(self.RETRY_MAX_SECONDS, self.RETRY_BASE_SECONDS * 2 ** (message["attempts"] - 1))
+                        message["next_attempt"] = datetime.now().timestamp() + delay
+                        status = "retry"
+                try:
+                    self._save()
+                except Exception as e:
+                    print(f"⚠️ Salvataggio coda email non riuscito: {e}")
+            self.status_queue.put((message["id"], message["to"], status, error))
+
+
+
+class StartupTasks:
+    """
+    Fasi di avvio eseguite in background mentre la schermata di login e' gia' visibile.
+    Ogni fase gira su un thread proprio; il risultato (o l'eccezione) torna al thread Tk
+    tramite una coda letta con root.after e viene passato alla callback della fase, che
+    puo' avviare le fasi dipendenti. Le durate finiscono nel resoconto dei tempi di avvio.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root, on_all_done=None):
+        self.root = root
+        self.on_all_done = on_all_done
+        self.started_at = datetime.now()
+        self.timings = []
+        self.results = queue.Queue()
+        self.pending = set()
+        self._callbacks = {}
+        self._poll_id = None
+
+    def record(self, name, seconds, outcome="ok"):
+        """Registra la durata di una fase (anche di quelle eseguite sul thread Tk)."""
+        self.timings.append((name, seconds, outcome))
+
+    def run(self, name, fn, callback=None, on_error=None):
+        """Esegue fn() in background; callback(risultato) o on_error(eccezione) sul thread Tk."""
+        self.pending.add(name)
+        self._callbacks[name] = (callback, on_error)
+
+        def worker():
+            started = datetime.now()
+            try:
+                result, error = fn(), None
+            except Exception as e:
+                result, error = None, e
+            self.results.put((name, (datetime.now() - started).total_seconds(), result, error))
+
+        threading.Thread(target=worker, name=f"startup-{name}", daemon=True).start()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        try:
+            while True:
+                name, seconds, result, error = self.results.get_nowait()
+                self.pending.discard(name)
+                self.record(name, seconds, "ok" if error is None else f"errore: {error}")
+                callback, on_error = self._callbacks.pop(name, (None, None))
+                try:
+                    if error is not None:
+                        if on_error:
+                            on_error(error)
+                        else:
+                            print(f"⚠️ Fase di avvio '{name}' non riuscita: {error}")
+                    elif callback:
+                        callback(result)
+                except Exception as e:
+                    print(f"⚠️ Errore nella callback della fase di avvio '{name}': {e}")
+        except queue.Empty:
+            pass
+
+        if self.pending:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+        elif self.on_all_done:
+            on_all_done, self.on_all_done = self.on_all_done, None
+            on_all_done()
+
+    def report(self):
+        """Resoconto testuale dei tempi di avvio, nell'ordine di completamento delle fasi."""
+        total = (datetime.now() - self.started_at).total_seconds()
+        lines = [f"⏱️ Resoconto avvio (pronto in {total:.2f}s):"]
+        for name, seconds, outcome in self.timings:
+            suffix = "" if outcome == "ok" else f"  [{outcome}]"
+            lines.append(f"   {name:<22} {seconds:6.2f}s{suffix}")
+        return "\n".join(lines)
+
+
+class TimeLogSink:
+    """
+    Log del motore del tempo con scritture bufferizzate.
+    write() e' thread-safe e si limita ad accodare la riga; un timer root.after svuota la
+    coda a blocchi: un solo inserimento nel riquadro collegato, che tiene solo le ultime
+    MAX_LINES righe, e una sola scrittura sul file di log, che ruota oltre MAX_BYTES
+    conservando BACKUP_COUNT copie (time_log.txt.1, .2, ...).
+    """
+
+    FLUSH_MS = 100
+    MAX_LINES = 2000
+    MAX_BYTES = 1024 * 1024
+    BACKUP_COUNT = 3
+
+    def __init__(self, root, path):
+        self.root = root
+        self.path = path
+        self.lines = deque(maxlen=self.MAX_LINES)
+        self.pending = queue.Queue()
+        self.widget = None
+        self._flush_id = None
+
+    def start(self):
+        if self._flush_id is None:
+            self._flush_id = self.root.after(self.FLUSH_MS, self._tick)
+
+    def stop(self):
+        if self._flush_id is not None:
+            try:
+                self.root.after_cancel(self._flush_id)
+            except Exception:
+                pass
+            self._flush_id = None
+        self.flush()
+
+    def write(self, message):
+        """Accoda una riga con timestamp; chiamabile da qualunque thread."""
+        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.pending.put(f"[{ts}] {message}\n")
+
+    def attach(self, widget):
+        """Collega il riquadro di log (sul thread Tk) e lo riempie con le ultime righe in memoria."""
+        self.flush()
+        self.widget = widget
+        try:
+            widget.configure(state='normal')
+            widget.delete('1.0', tk.END)
+            widget.insert(tk.END, "".join(self.lines))
+            widget.see(tk.END)
+            widget.configure(state='disabled')
+        except tk.TclError:
+            self.widget = None
+
+    def _tick(self):
+        self._flush_id = None
+        self.flush()
+        self.start()
+
+    def flush(self):
+        """Scarica la coda su riquadro e file (solo sul thread Tk)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        self.lines.extend(batch)
+        self._write_file(batch)
+
+        widget = self.widget
+        if widget is None:
+            return
+        try:
+            if not widget.winfo_exists():
+                self.widget = None
+                return
+            widget.configure(state='normal')
+            widget.insert(tk.END, "".join(batch[-self.MAX_LINES:]))
+            # Riquadro a buffer circolare: oltre MAX_LINES si eliminano le righe piu' vecchie
+            line_count = int(widget.index('end-1c').split('.')[0])
+            if line_count > self.MAX_LINES + 1:
+                widget.delete('1.0', f"{line_count - self.MAX_LINES}.0")
+            widget.see(tk.END)
+            widget.configure(state='disabled')
+        except tk.TclError:
+            self.widget = None   # riquadro distrutto (es. cambio menu)
+
+    def _write_file(self, batch):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.MAX_BYTES:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(batch)
+        except OSError as e:
+            print(f"⚠️ Log del tempo non scritto su file ({self.path}): {e}")
+
+    def _rotate(self):
+        for index in range(self.BACKUP_COUNT - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
 
 class DeDToolGUI:
     """Classe principale per l'interfaccia grafica"""
@@ -59,6 +844,14 @@ class DeDToolGUI:
     MONTHS_PER_YEAR = 12
     DAYS_PER_YEAR = DAYS_PER_MONTH * MONTHS_PER_YEAR  # 336
     EPOCH_DATE = date(1, 1, 1)
+
+    # Periodo in giorni di attività e spese ricorrenti: le scadenze (next_due_day)
+    # cadono sempre sul primo giorno della settimana/mese successivo
+    RECURRING_PERIODS = {
+        'giornaliera': 1,
+        'settimanale': 7,
+        'mensile': DAYS_PER_MONTH,
+    }
     
     OBJECTIVE_STATUS = {
         "NON_INIZIATO": 0,
@@ -105,12 +898,59 @@ class DeDToolGUI:
         "DWARF": "NANO",
         "NANO": "NANO",
     }
+
+    # Ordinamenti del catalogo regole (equivalenti agli ORDER BY FIELD(...) SQL)
+    RULE_CLASS_ORDER = ['CHIERICO', 'DRUIDO', 'GUERRIERO', 'LADRO', 'MAGO', 'MISTICO', 'ELFO', 'HALFLING', 'NANO']
+    TURN_UNDEAD_ORDER = ['Scheletro', 'Zombi', 'Ghoul', 'Necrospettro', 'Mummia', 'Spettro', 'Vampiro', 'Fantasma', 'Lich', 'Speciale']
+    RULE_MAX_LEVEL = 36
+
+    # Intervallo del riconteggio completo dei messaggi chat non letti
+    CHAT_UNREAD_RECONCILE_SECONDS = 300
+
+    # Backup JSON Lines compresso: versione formato e tabelle salvate in parallelo
+    BACKUP_FORMAT_VERSION = 2
+    BACKUP_PARALLEL_WORKERS = 4
+    RESTORE_BATCH_SIZE = 1000
+    RESTORE_STAGING_SUFFIX = "__restore"
+    # Tabelle quasi solo in aggiunta: nei backup incrementali si salvano solo i blocchi di id cambiati
+    DELTA_BACKUP_TABLES = (
+        'bank_transactions', 'chat_messages', 'chat_reads',
+        'pc_journal_entries', 'follower_objective_events',
+    )
+    DELTA_CHUNK_SIZE = 1000
+
+    # Opzioni imprevisti generate con LM Studio: modello, versione prompt (chiave cache) e file cache
+    AI_OPTIONS_MODEL = "mistral"
+    AI_OPTIONS_PROMPT_VERSION = 1
+    AI_OPTIONS_CACHE_FILE = "ai_options_cache.json"
+
+    # Aggiornamento della finestra di avanzamento del tempo (thread di lavoro -> Tk)
+    TIME_ADVANCE_POLL_MS = 100
+
+    # Storico bancario a pagine (keyset su timestamp, id) e tipi di operazione filtrabili
+    BANK_HISTORY_PAGE_SIZE = 200
+    BANK_OPERATION_TYPES = (
+        'deposito', 'prelievo', 'TRASFERIMENTO_IN', 'TRASFERIMENTO_OUT',
+        'ATTIVITA_ECONOMICA', 'SPESA_FISSA', 'COSTO_OBIETTIVO', 'INTERESSE_ANNUALE',
+    )
+    # Segno dei movimenti nel ricalcolo dei saldi (gli importi in bank_transactions sono positivi)
+    BANK_CREDIT_OPERATIONS = ('deposito', 'TRASFERIMENTO_IN', 'ATTIVITA_ECONOMICA', 'INTERESSE_ANNUALE')
+    BANK_DEBIT_OPERATIONS = ('prelievo', 'TRASFERIMENTO_OUT', 'SPESA_FISSA', 'COSTO_OBIETTIVO')
+
+    # Esportazione dati finanziari: righe dati per foglio Excel (oltre prosegue in un nuovo foglio)
+    EXPORT_EXCEL_MAX_ROWS = 1048575
+    EXPORT_MAX_COLUMN_WIDTH = 50
     
     def __init__(self):
+        startup_begin = datetime.now()
         self.root = tk.Tk()
         self.root.title("D&D Tool - Gestione Campagna")
         
         self.root.state('zoomed')
+
+        # Log del tempo: coda svuotata a blocchi sul riquadro e su time_log.txt
+        self.time_log = TimeLogSink(self.root, "time_log.txt")
+        self.time_log.start()
         
         # Variabili
         self.current_user = None
@@ -119,49 +959,116 @@ class DeDToolGUI:
         self.env_sec = {}
         self.tree_followers = None
         self.client = None
+        self.email_outbox = None
+        # Login abilitato solo quando connessione e data di gioco sono pronte
+        self._db_ready = False
+        # Versione del diario pubblicata (letta in background all'avvio)
+        self._remote_diario_version = None
+        self.startup_report = None
+        # Avanzamento del tempo in corso sul thread di lavoro (None se nessuno)
+        self._time_advance = None
 
         # 🔥 INTEGRAZIONE CONNECTION POOLING - UNIFICATO 🔥
         self._pool_initialized = False
         self.connection_pool = None
         self._pool_lock = threading.Lock()
 
+        # Cache in memoria delle tabelle rule_* (caricata alla prima richiesta)
+        self._rule_cache = None
+        # Override DM attivi del PG con scheda aperta: {'pg_id': ..., 'overrides': {(scope, field): riga}}
+        self._rule_override_index = None
+
+
         # Configura stile
         self.setup_style()
         
         # Gestione chiusura finestra
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # Carica ambiente sicuro
-        self.load_secure_env()
+        # Configura scorciatoie tastiera
+        self.setup_keyboard_shortcuts()
+        
+        # Mostra subito la schermata di login (il pulsante si abilita quando il database è pronto)
+        self.startup = StartupTasks(self.root, on_all_done=self._on_startup_done)
+        self.show_login_screen()
+        self.startup.record("finestra e login", (datetime.now() - startup_begin).total_seconds())
+
+        # Fasi in background: ambiente sicuro -> database -> schema e data di gioco (+ pool in parallelo);
+        # controllo aggiornamenti e versione diario partono subito
+        self.startup.run("ambiente sicuro", self.load_secure_env,
+                         self._on_secure_env_loaded, self._on_secure_env_error)
+        self.startup.run("aggiornamenti", lambda: check_for_updates(interactive=False),
+                         self._on_update_installed)
+        self.startup.run("versione diario", self._fetch_remote_diario_version,
+                         self._on_remote_diario_version)
+
+    def _on_secure_env_loaded(self, env):
+        """Applica l'ambiente sicuro, prepara la coda email e avvia le fasi che usano il database."""
+        if env is None:
+            messagebox.showwarning("Avviso", "Nessuna chiave segreta trovata. Ambiente sicuro non caricato.")
+            env = {}
+        for k, v in env.items():
+            os.environ[k] = v
+            self.env_sec[k] = v
 
         # Carica valori Email
         self.SMTP_EMAIL = self.env_sec.get("GMAIL_USER")
         self.SMTP_PASSWORD = self.env_sec.get("GMAIL_PASS")
-        
-        # Connetti al database
-        self.connect_database()
+        self.email_outbox = EmailOutbox(
+            self,
+            path="email_outbox.json",
+            host=self.env_sec.get("SMTP_HOST", "smtp.gmail.com"),
+            port=int(self.env_sec.get("SMTP_PORT", 465)),
+            use_ssl=self.env_sec.get("SMTP_SSL", "1") not in ("0", "false", "False"),
+            sender=self.SMTP_EMAIL,
+            password=self.SMTP_PASSWORD
+        )
+        if self.email_outbox.pending_count():
+            # Email rimaste in coda da una sessione precedente
+            self.email_outbox.start()
+
+        # Connessione principale e pool si aprono in parallelo
+        self.startup.run("database", self._open_database_connection,
+                         self._on_database_connected, self._on_database_error)
+        self.startup.run("pool connessioni", lambda: self.init_connection_pool(fallback=False))
+
+    def _on_secure_env_error(self, error):
+        messagebox.showerror("Errore", f"Errore caricamento ambiente sicuro: {error}")
+        self._on_secure_env_loaded({})
+
+    def _on_database_connected(self, connection):
+        self.db = connection
+        self.startup.run("schema e data di gioco", self._prepare_game_state, self._on_game_state_ready)
+
+    def _on_database_error(self, error):
+        messagebox.showerror("Errore Connessione", 
+                           f"Impossibile connettersi al database:\n{error}")
+        self.on_closing()
+        sys.exit(1)
+
+    def _prepare_game_state(self):
+        """Verifica lo schema di game_state e carica la data di gioco (in background)."""
+        self.migrate_game_state_absolute_day()
+        self.migrate_recurring_schedule()
+        return self.load_game_date()
 
-        # 🔥 INIZIALIZZA IL CONNECTION POOL SUBITO DOPO LA CONNESSIONE NORMALE 🔥
-        self.init_connection_pool()
+    def _on_game_state_ready(self, game_date):
+        self.game_date = game_date
+        self._db_ready = True
+        self._update_login_ready()
 
-        self.migrate_game_state_absolute_day()
-        self.game_date = self.load_game_date()
-        
-        # Configura scorciatoie tastiera
-        self.setup_keyboard_shortcuts()
-        
-        # Mostra schermata di login
-        self.show_login_screen()
+    def _on_update_installed(self, latest_version):
+        """Lo script è stato aggiornato su disco: propone di chiudere per riavviare."""
+        if not latest_version:
+            return
+        if messagebox.askyesno("Aggiornamento",
+                               f"È stata installata la versione {latest_version}.\n"
+                               "Riavvia il programma per usarla.\n\nChiudere ora?"):
+            self.on_closing()
 
-        # Inizializza client AI
-        try:
-            self.client = OpenAI(
-                base_url="http://localhost:1234/v1",  # porta LM Studio
-                api_key="lmstudio"
-            )
-        except Exception as e:
-            self.client = None
-            print(f"❌ Errore inizializzazione client LM Studio: {e}")
+    def _on_startup_done(self):
+        self.startup_report = self.startup.report()
+        print(self.startup_report)
 
     def run(self):
         """Avvia l'applicazione"""
@@ -174,6 +1081,12 @@ class DeDToolGUI:
             
             # 1. Chiudi tutte le finestre chat aperte e ferma polling
             self._close_all_chat_windows()
+            if getattr(self, 'chat_sync', None):
+                self.chat_sync.stop()
+            if getattr(self, 'email_outbox', None):
+                self.email_outbox.stop()
+            if getattr(self, 'time_log', None):
+                self.time_log.stop()
             
             # 2. Ferma eventuali altri polling (come la chat comune nei tab)
             if hasattr(self, 'content_frame'):
@@ -215,6 +1128,7 @@ class DeDToolGUI:
     def show_simple_changelog(self):
         """Mostra il changelog in una finestra semplice - versione minimalista"""
         try:
+            import requests
             CHANGELOG_URL = "https://raw.githubusercontent.com/MaxTrevi/DeD-Tool/main/changelog.txt"
             
             # Scarica il changelog
@@ -298,8 +1212,9 @@ class DeDToolGUI:
             for widget in self.root.winfo_children():
                 if isinstance(widget, tk.Toplevel) and "Chat segreta" in widget.title():
                     try:
-                        if hasattr(widget, '_chat_after_id'):
-                            widget.after_cancel(widget._chat_after_id)
+                        token = getattr(widget, '_chat_sync_token', None)
+                        if token and getattr(self, 'chat_sync', None):
+                            self.chat_sync.unsubscribe(token)
                         widget.destroy()
                     except:
                         pass
@@ -385,45 +1300,50 @@ class DeDToolGUI:
             print(f"❌ Errore configurazione stili: {e}")
         
     def load_secure_env(self):
-        """Carica le variabili d'ambiente sicure"""
-        try:
-            secret_key_file = "secret.key"
-            encrypted_file = "DeD-Tool.env_sec.enc"
-            
-            if not os.path.exists(secret_key_file):
-                messagebox.showwarning("Avviso", "Nessuna chiave segreta trovata. Ambiente sicuro non caricato.")
-                return
-            
-            with open(secret_key_file, "rb") as key_file:
-                key = key_file.read()
-            
-            with open(encrypted_file, "rb") as enc_file:
-                encrypted = enc_file.read()
-            
-            decrypted = Fernet(key).decrypt(encrypted).decode()
-            
-            for line in decrypted.splitlines():
-                if line and "=" in line:
-                    k, v = line.split("=", 1)
-                    os.environ[k.strip()] = v.strip()
-                    self.env_sec[k.strip()] = v.strip()
-                    
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore caricamento ambiente sicuro: {e}")
+        """
+        Legge e decifra le variabili d'ambiente sicure. Non usa la GUI (gira in background
+        all'avvio): restituisce il dizionario delle variabili, None se manca la chiave segreta.
+        """
+        secret_key_file = "secret.key"
+        encrypted_file = "DeD-Tool.env_sec.enc"
+        
+        if not os.path.exists(secret_key_file):
+            return None
+        
+        from cryptography.fernet import Fernet
+        
+        with open(secret_key_file, "rb") as key_file:
+            key = key_file.read()
+        
+        with open(encrypted_file, "rb") as enc_file:
+            encrypted = enc_file.read()
+        
+        decrypted = Fernet(key).decrypt(encrypted).decode()
+        
+        env = {}
+        for line in decrypted.splitlines():
+            if line and "=" in line:
+                k, v = line.split("=", 1)
+                env[k.strip()] = v.strip()
+        return env
     
+    def _open_database_connection(self):
+        """Apre la connessione principale a MariaDB (nessuna finestra: usabile in background)."""
+        return pymysql.connect(
+            host=self.env_sec.get("DB_HOST"),
+            user=self.env_sec.get("DB_USER"),
+            password=self.env_sec.get("DB_PASSWORD"),
+            database=self.env_sec.get("DB_NAME"),
+            port=int(self.env_sec.get("DB_PORT", 3307)),
+            charset='utf8mb4',
+            autocommit=True,
+            cursorclass=pymysql.cursors.DictCursor
+        )
+
     def connect_database(self):
         """Connette al database MariaDB"""
         try:
-            self.db = pymysql.connect(
-                host=self.env_sec.get("DB_HOST"),
-                user=self.env_sec.get("DB_USER"),
-                password=self.env_sec.get("DB_PASSWORD"),
-                database=self.env_sec.get("DB_NAME"),
-                port=int(self.env_sec.get("DB_PORT", 3307)),
-                charset='utf8mb4',
-                autocommit=True,
-                cursorclass=pymysql.cursors.DictCursor
-            )
+            self.db = self._open_database_connection()
             
             # Carica data di gioco
             self.game_date = self.load_game_date()
@@ -468,19 +1388,13 @@ class DeDToolGUI:
             return self.EPOCH_DATE
 
     def append_time_log(self, message):
-        """Aggiunge una riga al riquadro log (solo GUI, nessuna stampa console)."""
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        line = f"[{ts}] {message}\n"
-
-        try:
-            # Log nella GUI
-            if hasattr(self, "time_log_text") and isinstance(self.time_log_text, tk.Text):
-                self.time_log_text.configure(state='normal')
-                self.time_log_text.insert(tk.END, line)
-                self.time_log_text.see(tk.END)
-                self.time_log_text.configure(state='disabled')
-        except Exception:
-            pass   # evita errori se il log non esiste ancora
+        """
+        Accoda una riga al log del tempo (nessuna stampa console). Thread-safe: il riquadro
+        e il file time_log.txt vengono aggiornati a blocchi da TimeLogSink sul thread Tk.
+        """
+        time_log = getattr(self, "time_log", None)
+        if time_log:
+            time_log.write(message)
 
     def migrate_game_state_absolute_day(self):
         """
@@ -567,6 +1481,74 @@ class DeDToolGUI:
         except Exception as e:
             self.append_time_log(f"Errore generale in migrate_game_state_absolute_day: {e}")
 
+    def migrate_recurring_schedule(self):
+        """
+        Garantisce su economic_activities e fixed_expenses la colonna next_due_day
+        (giorno assoluto della prossima scadenza) e l'indice (frequency, next_due_day)
+        usato dal motore del tempo; le righe senza scadenza vengono inizializzate.
+        """
+        try:
+            cursor = self.db.cursor()
+            try:
+                for table in ('economic_activities', 'fixed_expenses'):
+                    try:
+                        cursor.execute(f"SELECT next_due_day FROM {table} LIMIT 0")
+                    except Exception:
+                        cursor.execute(f"ALTER TABLE {table} ADD COLUMN next_due_day INT NULL")
+                        self.append_time_log(f"Colonna next_due_day aggiunta a {table}.")
+                    try:
+                        cursor.execute(
+                            f"CREATE INDEX IF NOT EXISTS idx_{table}_schedule ON {table} (frequency, next_due_day)"
+                        )
+                    except Exception as e:
+                        self.append_time_log(f"Indice scadenze non creato su {table}: {e}")
+
+                cursor.execute("SELECT absolute_day FROM game_state WHERE id = 1")
+                row = cursor.fetchone()
+                abs_day = int(row.get('absolute_day') or 0) if row else 0
+                self.reset_recurring_schedule(cursor, abs_day, only_missing=True)
+                self.db.commit()
+            finally:
+                try:
+                    cursor.close()
+                except:
+                    pass
+        except Exception as e:
+            self.append_time_log(f"Errore migrazione scadenze attività/spese: {e}")
+
+    def _next_due_day(self, frequency, abs_day):
+        """Prima scadenza della frequenza indicata strettamente successiva al giorno assoluto abs_day."""
+        period = self.RECURRING_PERIODS.get(str(frequency or '').lower(), 1)
+        return (abs_day // period + 1) * period
+
+    def _current_next_due_day(self, frequency):
+        """
+        Prima scadenza successiva alla data di gioco corrente (per nuove righe o cambio frequenza).
+        Nelle UPDATE next_due_day va assegnato prima di frequency: le assegnazioni sono
+        valutate da sinistra a destra, così l'IF confronta ancora la frequenza precedente.
+        """
+        return self._next_due_day(frequency, self.date_to_absolute_day(self.game_date))
+
+    def reset_recurring_schedule(self, cursor, abs_day, only_missing=False):
+        """
+        Riallinea in modo set-based next_due_day di attività e spese alla prima
+        scadenza successiva ad abs_day (solo le righe senza scadenza se only_missing).
+        Non esegue commit: resta nella transazione del chiamante.
+        """
+        weekly = self.RECURRING_PERIODS['settimanale']
+        monthly = self.RECURRING_PERIODS['mensile']
+        where = "WHERE next_due_day IS NULL" if only_missing else ""
+        for table in ('economic_activities', 'fixed_expenses'):
+            cursor.execute(f"""
+                UPDATE {table}
+                SET next_due_day = CASE frequency
+                    WHEN 'settimanale' THEN (%s DIV %s + 1) * %s
+                    WHEN 'mensile' THEN (%s DIV %s + 1) * %s
+                    ELSE %s + 1
+                END
+                {where}
+            """, (abs_day, weekly, weekly, abs_day, monthly, monthly, abs_day))
+
     def _update_game_state_date(self, new_date):
         """
         Aggiorna game_state sia nel campo game_date (YYYY-MM-DD) che absolute_day (INT).
@@ -691,6 +1673,11 @@ class DeDToolGUI:
         # Pulisci finestra
         for widget in self.root.winfo_children():
             widget.destroy()
+        if getattr(self, 'chat_sync', None):
+            self.chat_sync.stop()
+            self.chat_sync = None
+        self._chat_unread = None
+        self._chat_unread_high_water = None
         
         # Frame principale
         login_frame = ttk.Frame(self.root, padding="20")
@@ -724,6 +1711,8 @@ class DeDToolGUI:
         
         # Pulsante login
         def attempt_login():
+            if not self._db_ready:
+                return
             username = username_entry.get().strip()
             password = password_entry.get().strip()
             remember = remember_var.get()
@@ -741,6 +1730,12 @@ class DeDToolGUI:
         
         login_btn = ttk.Button(login_frame, text="🔓 Login", command=attempt_login)
         login_btn.grid(row=6, column=0, columnspan=2, pady=20)
+        self._login_button = login_btn
+        
+        # Stato della connessione durante l'avvio in background
+        self._login_status_label = ttk.Label(login_frame, text="", style='Info.TLabel')
+        self._login_status_label.grid(row=7, column=0, columnspan=2)
+        self._update_login_ready()
         
         # Bind Enter key
         password_entry.bind('<Return>', lambda e: attempt_login())
@@ -751,6 +1746,18 @@ class DeDToolGUI:
         # Focus su username
         username_entry.focus()
 
+    def _update_login_ready(self):
+        """Abilita il pulsante di login solo quando connessione e data di gioco sono pronte."""
+        login_btn = getattr(self, '_login_button', None)
+        if not login_btn or not login_btn.winfo_exists():
+            return
+        if self._db_ready:
+            login_btn.state(['!disabled'])
+            self._login_status_label.configure(text="")
+        else:
+            login_btn.state(['disabled'])
+            self._login_status_label.configure(text="⏳ Connessione al database in corso...")
+
     def save_credentials(self, username, password):
         """Salva username e password in un file JSON"""
         credentials = {
@@ -893,7 +1900,7 @@ class DeDToolGUI:
                 diario_label = "📘 Diario ⭐ NUOVO ⭐"
                 self.diario_has_new_version = True
         except:
-            pass  # In caso di errore (no internet) resta il testo normale
+            pass  # In caso di errore (no internet o versione non ancora letta) resta il testo normale
 
         menu_items.append((diario_label, self.download_diary))
         
@@ -909,6 +1916,9 @@ class DeDToolGUI:
             else:
                 btn = ttk.Button(sidebar, text=text, command=command, width=23)
                 btn.grid(row=row, column=0, padx=10, pady=3)
+                if text.startswith("📘 Diario"):
+                    # Sostituito se la versione remota del diario arriva dopo
+                    self._diario_plain_button = btn
             
             row += 1
         
@@ -1031,6 +2041,12 @@ class DeDToolGUI:
                 
                 ttk.Button(btn_frame, text="📖 Apri Scheda", command=open_selected, 
                           style='Accent.TButton').pack(pady=5)
+
+                def reload_rule_catalog():
+                    self.invalidate_rule_cache()
+                    messagebox.showinfo("Regole", "Catalogo regole ricaricato: le prossime schede useranno i valori aggiornati del database.")
+
+                ttk.Button(btn_frame, text="🔄 Ricarica Regole", command=reload_rule_catalog).pack(pady=5)
         
         except Exception as e:
             messagebox.showerror("Errore", f"Errore apertura menu scheda: {e}")
@@ -1041,6 +2057,9 @@ class DeDToolGUI:
         """Mostra la scheda completa del personaggio"""
         try:
             self.current_sheet_pg_id = int(pg_id)
+
+            # Ogni apertura/refresh della scheda rilegge gli override con una sola query
+            self._rule_override_index = None
             
             # Flag per tracciare se ci sono modifiche non salvate
             self.has_unsaved_changes = False
@@ -1049,21 +2068,27 @@ class DeDToolGUI:
             for widget in self.content_frame.winfo_children():
                 widget.destroy()
             
-            # Carica dati personaggio
-            cursor = self.db.cursor()
+            # Carica dati personaggio e tabelle collegate in un'unica istantanea
+            snapshot_user_id = None
             if self.current_user and self.current_user.get('role') == 'GIOCATORE':
-                cursor.execute(
-                    "SELECT * FROM player_characters WHERE id = %s AND user_id = %s",
-                    (self.current_sheet_pg_id, self.current_user['id'])
-                )
-            else:
-                cursor.execute("SELECT * FROM player_characters WHERE id = %s", (self.current_sheet_pg_id,))
-            character = cursor.fetchone()
-            cursor.close()
-            
-            if not character:
+                snapshot_user_id = self.current_user['id']
+            snapshot = CharacterSnapshot(self, self.current_sheet_pg_id, snapshot_user_id)
+            self.character_snapshot = None
+            if not snapshot.load():
                 messagebox.showerror("Errore", "Personaggio non trovato o non autorizzato.")
                 return
+            self.character_snapshot = snapshot
+            character = snapshot.character
+            self.current_sheet_character = character
+
+            # I widget delle tab vengono registrati solo quando la tab viene costruita:
+            # azzera i riferimenti della scheda precedente.
+            self.char_widgets = {}
+            self.ts_widgets = {}
+            self.money_widgets = {}
+            self.religion_widgets = {}
+            self.thief_ability_widgets = {}
+            self.followers_dirty = False
             
             # Container principale
             main_frame = ttk.Frame(self.content_frame)
@@ -1095,38 +2120,7 @@ class DeDToolGUI:
             
             # Salva il bind per applicarlo dopo
             self.mark_modified_callback = mark_as_modified
-            
-            def on_tab_changed(event):
-                if self.has_unsaved_changes:
-                    self.save_all_character_data(self.current_sheet_pg_id, show_message=False)
-            
-            notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
-            
-            # Crea tutte le tab
-            self.create_character_info_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_abilities_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_combat_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_inventory_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_magic_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_notes_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_adventure_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_followers_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_spells_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_properties_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_mercenaries_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_advisors_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_specialists_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_scrolls_tab(notebook, self.current_sheet_pg_id, character)
-            self.create_character_special_actions_tab(notebook, self.current_sheet_pg_id, character)
 
-            preferred_tab = getattr(self, 'preferred_character_sheet_tab', None)
-            if preferred_tab:
-                for tab_id in notebook.tabs():
-                    if notebook.tab(tab_id, 'text') == preferred_tab:
-                        notebook.select(tab_id)
-                        break
-                self.preferred_character_sheet_tab = None
-            
             def bind_character_sheet_modification_events(parent):
                 for child in parent.winfo_children():
                     try:
@@ -1143,7 +2137,62 @@ class DeDToolGUI:
                         pass
                     bind_character_sheet_modification_events(child)
 
-            bind_character_sheet_modification_events(main_frame)
+            # Le tab vengono costruite solo alla prima selezione: aprire la scheda
+            # costa le query di una sola tab invece di quindici.
+            tab_builders = [
+                ("Info Base", self.create_character_info_tab),
+                ("Abilita Speciali", self.create_character_abilities_tab),
+                ("Combattimento", self.create_character_combat_tab),
+                ("Inventario", self.create_character_inventory_tab),
+                ("Oggetti Magici", self.create_character_magic_tab),
+                ("Note", self.create_character_notes_tab),
+                ("Avventura", self.create_character_adventure_tab),
+                ("Seguaci", self.create_character_followers_tab),
+                ("Incantesimi", self.create_character_spells_tab),
+                ("Possedimenti", self.create_character_properties_tab),
+                ("Mercenari", self.create_character_mercenaries_tab),
+                ("Consiglieri", self.create_character_advisors_tab),
+                ("Specialisti", self.create_character_specialists_tab),
+                ("Pergamene", self.create_character_scrolls_tab),
+                ("Azioni Speciali", self.create_character_special_actions_tab),
+            ]
+            pending_tabs = {}
+            for tab_text, builder in tab_builders:
+                host = CharacterSheetTabHost(notebook)
+                notebook.add(host, text=tab_text)
+                pending_tabs[str(host)] = (host, builder)
+
+            def ensure_tab_built(tab_id):
+                pending = pending_tabs.pop(str(tab_id), None)
+                if not pending:
+                    return
+                host, builder = pending
+                self._building_character_tab = True
+                try:
+                    builder(host, self.current_sheet_pg_id, self.current_sheet_character)
+                except Exception as e:
+                    messagebox.showerror("Errore", f"Errore caricamento tab: {e}")
+                    import traceback
+                    traceback.print_exc()
+                finally:
+                    self._building_character_tab = False
+                bind_character_sheet_modification_events(host)
+
+            def on_tab_changed(event):
+                if self.has_unsaved_changes:
+                    self.save_all_character_data(self.current_sheet_pg_id, show_message=False)
+                ensure_tab_built(notebook.select())
+            
+            preferred_tab = getattr(self, 'preferred_character_sheet_tab', None)
+            if preferred_tab:
+                for tab_id in notebook.tabs():
+                    if notebook.tab(tab_id, 'text') == preferred_tab:
+                        notebook.select(tab_id)
+                        break
+                self.preferred_character_sheet_tab = None
+
+            notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
+            ensure_tab_built(notebook.select())
 
         except Exception as e:
             messagebox.showerror("Errore", f"Errore caricamento scheda: {e}")
@@ -1172,16 +2221,82 @@ class DeDToolGUI:
     def save_all_character_data(self, pg_id, show_message=True):
         """Salva tutti i dati e resetta flag modifiche"""
         if not self.save_character_data(pg_id, show_message=False):
-            return
+            return False
         if hasattr(self, 'thief_ability_widgets') and self.thief_ability_widgets:
             if self.save_thief_abilities(pg_id, show_message=False) is False:
-                return
+                return False
         if getattr(self, 'followers_dirty', False):
             if not self.save_current_follower(show_message=False):
-                return
+                return False
         self.has_unsaved_changes = False
         if show_message:
             messagebox.showinfo("Successo", "Scheda personaggio salvata con successo!")
+        return True
+
+    def reload_current_sheet_character(self):
+        """Rilegge la riga player_characters della scheda aperta per le tab costruite dopo un salvataggio."""
+        try:
+            character = self.get_sheet_character(self.current_sheet_pg_id, refresh=True)
+            if character:
+                self.current_sheet_character = character
+        except Exception as e:
+            print(f"Errore ricarica dati scheda: {e}")
+
+    def get_character_snapshot(self, pg_id):
+        """Restituisce l'istantanea della scheda aperta se riguarda pg_id, altrimenti None."""
+        snapshot = getattr(self, 'character_snapshot', None)
+        try:
+            if snapshot and snapshot.pg_id == int(pg_id):
+                return snapshot
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    def get_sheet_character(self, pg_id, refresh=False):
+        """
+        Riga player_characters del PG. Con la scheda aperta legge l'istantanea, che i
+        salvataggi della scheda mantengono allineata; refresh=True la rilegge dal DB.
+        """
+        snapshot = self.get_character_snapshot(pg_id)
+        if snapshot:
+            if refresh:
+                return snapshot.refresh('player_characters')
+            return snapshot.character
+        cursor = self.db.cursor()
+        try:
+            cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def get_character_rows(self, pg_id, table, refresh=None):
+        """
+        Righe di una tabella figlia pc_* del PG. La costruzione delle tab legge dall'istantanea,
+        i refresh successivi a una modifica ricaricano solo quella tabella.
+        refresh=False legge l'istantanea anche fuori dalla costruzione: serve per le tabelle
+        di supporto (es. contenitori per l'inventario) gia' riallineate dal proprio refresh.
+        """
+        snapshot = self.get_character_snapshot(pg_id)
+        if snapshot:
+            if refresh is None:
+                refresh = not getattr(self, '_building_character_tab', False)
+            if refresh:
+                return list(snapshot.refresh(table))
+            return list(snapshot.rows(table))
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(f"SELECT * FROM {table} WHERE pg_id = %s", (pg_id,))
+            return list(cursor.fetchall() or [])
+        finally:
+            cursor.close()
+
+    def _sql_sort_key(self, value):
+        """Chiave di ordinamento equivalente a ORDER BY su testo (NULL prima, senza maiuscole)."""
+        if value is None:
+            return (0, '')
+        if isinstance(value, (int, float, Decimal)):
+            return (1, value)
+        return (2, str(value).casefold())
 
     # ==================== CHARACTER RULE ENGINE ====================
 
@@ -1201,34 +2316,144 @@ class DeDToolGUI:
         current_user = current_user or self.current_user
         return bool(current_user and current_user.get('role') == 'DM')
 
+
+    def get_rule_cache(self):
+        """Restituisce la cache delle tabelle rule_*, caricandola alla prima richiesta."""
+        if self._rule_cache is None:
+            self._rule_cache = self._load_rule_cache()
+        return self._rule_cache
+
+    def invalidate_rule_cache(self):
+        """Svuota la cache regole: la prossima lettura ricarica il catalogo dal DB."""
+        self._rule_cache = None
+
+    def _load_rule_cache(self):
+        """
+        Legge una sola volta le tabelle regolamentari statiche e le indicizza in memoria.
+        Le tabelle a intervalli di livello diventano liste indicizzate per livello (1..36),
+        quelle a intervalli di punteggio coppie (inizi ordinati, righe) per bisect.
+        Una tabella non leggibile resta None e le funzioni usano il loro fallback.
+        """
+        cache = {}
+        max_level = self.RULE_MAX_LEVEL
+
+        def fetch(query):
+            try:
+                cursor = self.db.cursor()
+                cursor.execute(query)
+                rows = cursor.fetchall() or []
+                cursor.close()
+                return rows
+            except Exception:
+                return None
+
+        def by_level(rows, key_field, min_field, max_field):
+            index = {}
+            for row in sorted(rows, key=lambda r: int(r.get(min_field) or 0)):
+                levels = index.setdefault(row.get(key_field), [None] * (max_level + 1))
+                low = max(1, int(row.get(min_field) or 1))
+                high = min(max_level, int(row.get(max_field) or 0))
+                for level in range(low, high + 1):
+                    if levels[level] is None:
+                        levels[level] = row
+            return index
+
+        def by_score(rows):
+            rows = sorted(rows, key=lambda r: int(r.get('score_min') or 0))
+            return [int(r.get('score_min') or 0) for r in rows], rows
+
+        rows = fetch("SELECT * FROM rule_classes")
+        if rows is None:
+            cache['classes'] = None
+        else:
+            def class_order(row):
+                code = row.get('class_code')
+                position = self.RULE_CLASS_ORDER.index(code) + 1 if code in self.RULE_CLASS_ORDER else 0
+                return (position, row.get('class_name') or '')
+            cache['classes'] = {row.get('class_code'): row for row in rows}
+            cache['classes_ordered'] = sorted(rows, key=class_order)
+
+        rows = fetch("SELECT score_min, score_max, xp_modifier_percent FROM rule_primary_requisite_xp_bonus")
+        cache['xp_bonus'] = None if rows is None else by_score(rows)
+
+        rows = fetch("SELECT class_code, level, xp_required FROM rule_xp_progression")
+        cache['xp_progression'] = None if rows is None else {
+            (row.get('class_code'), int(row.get('level') or 0)): int(row.get('xp_required') or 0)
+            for row in rows
+        }
+
+        rows = fetch("""
+            SELECT class_code, level_min, level_max, morte_veleno, bacchette,
+                   paralisi_pietrificazione, soffio_drago, incantesimi_verghe_bastoni
+            FROM rule_saving_throws
+        """)
+        cache['saving_throws'] = None if rows is None else by_level(rows, 'class_code', 'level_min', 'level_max')
+
+        rows = fetch("SELECT class_code, level_min, level_max, thac0 FROM rule_thac0")
+        cache['thac0'] = None if rows is None else by_level(rows, 'class_code', 'level_min', 'level_max')
+
+        rows = fetch("SELECT score_min, score_max, modifier FROM rule_ability_modifiers")
+        cache['ability_modifiers'] = None if rows is None else by_score(rows)
+
+        rows = fetch("SELECT class_code, character_level, spell_level, slots FROM rule_spell_slots")
+        if rows is None:
+            cache['spell_slots'] = None
+        else:
+            slots = {}
+            for row in sorted(rows, key=lambda r: int(r.get('spell_level') or 0)):
+                key = (row.get('class_code'), int(row.get('character_level') or 0))
+                slots.setdefault(key, {})[int(row['spell_level'])] = int(row['slots'])
+            cache['spell_slots'] = slots
+
+        rows = fetch("SELECT * FROM rule_thief_abilities")
+        cache['thief_abilities'] = None if rows is None else {int(row.get('level') or 0): row for row in rows}
+
+        rows = fetch("SELECT undead_type, result_value, cleric_level_min, cleric_level_max FROM rule_turn_undead")
+        if rows is None:
+            cache['turn_undead'] = None
+        else:
+            def undead_order(row):
+                undead_type = row.get('undead_type')
+                position = self.TURN_UNDEAD_ORDER.index(undead_type) + 1 if undead_type in self.TURN_UNDEAD_ORDER else 0
+                return (position, undead_type or '')
+            turn = {level: [] for level in range(1, max_level + 1)}
+            for row in sorted(rows, key=undead_order):
+                low = max(1, int(row.get('cleric_level_min') or 1))
+                high = min(max_level, int(row.get('cleric_level_max') or 0))
+                for level in range(low, high + 1):
+                    turn[level].append({'undead_type': row.get('undead_type'), 'result_value': row.get('result_value')})
+            cache['turn_undead'] = turn
+
+        return cache
+
+    def _lookup_rule_score_interval(self, index, score):
+        """Trova la riga con score_min <= score <= score_max in un indice (inizi, righe)."""
+        starts, rows = index
+        position = bisect.bisect_right(starts, score) - 1
+        if position >= 0 and score <= int(rows[position].get('score_max') or 0):
+            return rows[position]
+        return None
+
     def get_available_rule_classes(self):
         """Restituisce le classi regolamentari disponibili, con fallback locale."""
         fallback = [
             {'class_code': code, 'class_name': code.title()}
             for code in self.STANDARD_CLASS_CODES
         ]
-        try:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT class_code, class_name
-                FROM rule_classes
-                ORDER BY FIELD(class_code, 'CHIERICO','DRUIDO','GUERRIERO','LADRO','MAGO','MISTICO','ELFO','HALFLING','NANO'), class_name
-            """)
-            rows = cursor.fetchall()
-            cursor.close()
-            return rows or fallback
-        except Exception:
+        cache = self.get_rule_cache()
+        if cache.get('classes') is None:
             return fallback
+        return [
+            {'class_code': row.get('class_code'), 'class_name': row.get('class_name')}
+            for row in cache['classes_ordered']
+        ] or fallback
 
     def get_rule_class_by_code(self, class_code):
-        try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM rule_classes WHERE class_code = %s", (class_code,))
-            row = cursor.fetchone()
-            cursor.close()
-            return row
-        except Exception:
+        classes = self.get_rule_cache().get('classes')
+        if not classes:
             return None
+        row = classes.get(class_code)
+        return dict(row) if row else None
 
     def get_primary_requisite_score(self, character, class_code):
         """Restituisce punteggio del requisito primario in base alla classe."""
@@ -1267,15 +2492,10 @@ class DeDToolGUI:
         """Calcola bonus/malus PX da tabella rule_primary_requisite_xp_bonus."""
         score = self.get_primary_requisite_score(character, class_code)
         try:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT xp_modifier_percent
-                FROM rule_primary_requisite_xp_bonus
-                WHERE %s BETWEEN score_min AND score_max
-                LIMIT 1
-            """, (score,))
-            row = cursor.fetchone()
-            cursor.close()
+            index = self.get_rule_cache().get('xp_bonus')
+            if index is None:
+                raise LookupError("rule_primary_requisite_xp_bonus non disponibile")
+            row = self._lookup_rule_score_interval(index, score)
             return int(row['xp_modifier_percent']) if row else 0
         except Exception:
             if score <= 5:
@@ -1292,15 +2512,8 @@ class DeDToolGUI:
         """Legge rule_xp_progression e restituisce PX livello successivo."""
         try:
             next_level = min(int(level or 1) + 1, 36)
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT xp_required
-                FROM rule_xp_progression
-                WHERE class_code = %s AND level = %s
-            """, (class_code, next_level))
-            row = cursor.fetchone()
-            cursor.close()
-            return int(row['xp_required']) if row else 0
+            progression = self.get_rule_cache().get('xp_progression') or {}
+            return progression.get((class_code, next_level), 0)
         except Exception:
             return 0
 
@@ -1308,18 +2521,14 @@ class DeDToolGUI:
         """Restituisce dict con le 5 categorie salvezza BECMI."""
         try:
             level = max(1, min(int(level or 1), 36))
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT morte_veleno, bacchette, paralisi_pietrificazione,
-                       soffio_drago, incantesimi_verghe_bastoni
-                FROM rule_saving_throws
-                WHERE class_code = %s AND %s BETWEEN level_min AND level_max
-                LIMIT 1
-            """, (class_code, level))
-            row = cursor.fetchone()
-            cursor.close()
+            levels = (self.get_rule_cache().get('saving_throws') or {}).get(class_code)
+            row = levels[level] if levels else None
             if row:
-                return row
+                return {
+                    field: row.get(field)
+                    for field in ('morte_veleno', 'bacchette', 'paralisi_pietrificazione',
+                                  'soffio_drago', 'incantesimi_verghe_bastoni')
+                }
         except Exception:
             pass
         return {}
@@ -1328,15 +2537,8 @@ class DeDToolGUI:
         """Restituisce THAC0 da rule_thac0."""
         try:
             level = max(1, min(int(level or 1), 36))
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT thac0
-                FROM rule_thac0
-                WHERE class_code = %s AND %s BETWEEN level_min AND level_max
-                LIMIT 1
-            """, (class_code, level))
-            row = cursor.fetchone()
-            cursor.close()
+            levels = (self.get_rule_cache().get('thac0') or {}).get(class_code)
+            row = levels[level] if levels else None
             return int(row['thac0']) if row else None
         except Exception:
             return None
@@ -1347,15 +2549,7 @@ class DeDToolGUI:
         Se esiste override DM attivo usa override_value, altrimenti automatic_value.
         """
         try:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT override_value, reason
-                FROM pc_rule_overrides
-                WHERE pg_id = %s AND scope = %s AND field_name = %s AND is_active = 1
-                LIMIT 1
-            """, (pg_id, scope, field_name))
-            row = cursor.fetchone()
-            cursor.close()
+            row = self._get_rule_override_index(pg_id).get((scope, field_name))
             if row:
                 return {
                     'automatic': automatic_value,
@@ -1372,6 +2566,51 @@ class DeDToolGUI:
             'reason': '',
         }
 
+    def _get_rule_override_index(self, pg_id):
+        """
+        Restituisce gli override DM attivi del PG come dict (scope, field_name) -> riga.
+        Viene caricato con una sola query e resta valido finche' la scheda del PG e' aperta;
+        set_rule_override e clear_rule_override lo aggiornano in scrittura.
+        """
+        try:
+            pg_id = int(pg_id)
+        except (TypeError, ValueError):
+            pass
+        index = self._rule_override_index
+        if index is not None and index['pg_id'] == pg_id:
+            return index['overrides']
+
+        cursor = self.db.cursor()
+        try:
+            cursor.execute("""
+                SELECT scope, field_name, override_value, reason
+                FROM pc_rule_overrides
+                WHERE pg_id = %s AND is_active = 1
+            """, (pg_id,))
+            overrides = {}
+            for row in cursor.fetchall() or []:
+                overrides.setdefault((row.get('scope'), row.get('field_name')), row)
+        finally:
+            cursor.close()
+        self._rule_override_index = {'pg_id': pg_id, 'overrides': overrides}
+        return overrides
+
+    def _update_rule_override_index(self, pg_id, scope, field_name, row=None):
+        """Aggiorna l'indice override gia' caricato; row=None rimuove la voce."""
+        index = self._rule_override_index
+        if index is None:
+            return
+        try:
+            pg_id = int(pg_id)
+        except (TypeError, ValueError):
+            pass
+        if index['pg_id'] != pg_id:
+            return
+        if row is None:
+            index['overrides'].pop((scope, field_name), None)
+        else:
+            index['overrides'][(scope, field_name)] = row
+
     def get_table_columns(self, table_name):
         """Restituisce le colonne reali della tabella, utile durante migrazioni manuali."""
         try:
@@ -1390,15 +2629,8 @@ class DeDToolGUI:
         except Exception:
             score = 10
         try:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT modifier
-                FROM rule_ability_modifiers
-                WHERE %s BETWEEN score_min AND score_max
-                LIMIT 1
-            """, (score,))
-            row = cursor.fetchone()
-            cursor.close()
+            index = self.get_rule_cache().get('ability_modifiers')
+            row = self._lookup_rule_score_interval(index, score) if index else None
             if row and row.get('modifier') is not None:
                 return int(row.get('modifier'))
         except Exception:
@@ -1545,6 +2777,12 @@ class DeDToolGUI:
             ))
             self.db.commit()
             cursor.close()
+            self._update_rule_override_index(pg_id, scope, field_name, {
+                'scope': scope,
+                'field_name': field_name,
+                'override_value': str(override_value) if override_value is not None else None,
+                'reason': reason,
+            })
             return True
         except Exception as e:
             messagebox.showerror("Errore", f"Errore override DM: {e}")
@@ -1565,6 +2803,7 @@ class DeDToolGUI:
             """, (pg_id, scope, field_name))
             self.db.commit()
             cursor.close()
+            self._update_rule_override_index(pg_id, scope, field_name)
             return True
         except Exception as e:
             messagebox.showerror("Errore", f"Errore ripristino automatico: {e}")
@@ -1572,10 +2811,7 @@ class DeDToolGUI:
 
     def calculate_character_rule_summary(self, pg_id):
         """Restituisce tutti i valori automatici principali per la scheda."""
-        cursor = self.db.cursor()
-        cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-        character = cursor.fetchone()
-        cursor.close()
+        character = self.get_sheet_character(pg_id)
         if not character:
             return {}
 
@@ -1650,11 +2886,8 @@ class DeDToolGUI:
         """Legge rule_thief_abilities e restituisce dict abilita ladro."""
         try:
             level = max(1, min(int(level or 1), 36))
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM rule_thief_abilities WHERE level = %s", (level,))
-            row = cursor.fetchone()
-            cursor.close()
-            return row or {}
+            row = (self.get_rule_cache().get('thief_abilities') or {}).get(level)
+            return dict(row) if row else {}
         except Exception:
             return {}
 
@@ -1669,16 +2902,8 @@ class DeDToolGUI:
             return []
         try:
             level = max(1, min(int(level or 1), 36))
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT undead_type, result_value
-                FROM rule_turn_undead
-                WHERE %s BETWEEN cleric_level_min AND cleric_level_max
-                ORDER BY FIELD(undead_type, 'Scheletro','Zombi','Ghoul','Necrospettro','Mummia','Spettro','Vampiro','Fantasma','Lich','Speciale'), undead_type
-            """, (level,))
-            rows = cursor.fetchall()
-            cursor.close()
-            return rows or []
+            rows = (self.get_rule_cache().get('turn_undead') or {}).get(level) or []
+            return [dict(row) for row in rows]
         except Exception:
             return []
 
@@ -1686,16 +2911,8 @@ class DeDToolGUI:
         """Restituisce dict spell_level -> slots."""
         try:
             character_level = max(1, min(int(character_level or 1), 36))
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT spell_level, slots
-                FROM rule_spell_slots
-                WHERE class_code = %s AND character_level = %s
-                ORDER BY spell_level
-            """, (class_code, character_level))
-            rows = cursor.fetchall()
-            cursor.close()
-            return {int(row['spell_level']): int(row['slots']) for row in rows}
+            slots = (self.get_rule_cache().get('spell_slots') or {}).get((class_code, character_level))
+            return dict(slots) if slots else {}
         except Exception:
             return {}
 
@@ -1718,25 +2935,18 @@ class DeDToolGUI:
     def refresh_spell_preparation_limits(self, pg_id):
         """Controlla che i preparati non superino slot effettivi, salvo override DM."""
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-            character = cursor.fetchone()
-            cursor.close()
+            character = self.get_sheet_character(pg_id)
             if not character:
                 return {}
             class_code = self.get_character_class_code(character)
             level = int(character.get('livello') or 1)
             slots = self.get_effective_spell_slots(pg_id, class_code, level)
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT spell_level, COALESCE(SUM(prepared_count), 0) AS prepared,
-                       COALESCE(SUM(cast_count), 0) AS casted
-                FROM pc_spell_prepared
-                WHERE pg_id = %s
-                GROUP BY spell_level
-            """, (pg_id,))
-            structured = {int(r['spell_level']): r for r in cursor.fetchall()}
-            cursor.close()
+            # Il riepilogo segue sempre refresh_spellbook_list, che ha gia' riletto pc_spell_prepared
+            structured = {}
+            for row in self.get_character_rows(pg_id, 'pc_spell_prepared', refresh=False):
+                totals = structured.setdefault(int(row['spell_level']), {'prepared': 0, 'casted': 0})
+                totals['prepared'] += int(row.get('prepared_count') or 0)
+                totals['casted'] += int(row.get('cast_count') or 0)
             result = {}
             for spell_level in sorted(set(slots) | set(structured)):
                 prepared = int(structured.get(spell_level, {}).get('prepared') or 0)
@@ -1850,17 +3060,18 @@ class DeDToolGUI:
     def update_character_equipment_calculations(self, pg_id):
         """Aggiorna la CA effettiva in player_characters."""
         ac = self.calculate_armor_class(pg_id)
+        armor_class = ac.get('effective') if ac.get('effective') is not None else ac.get('automatic')
         cursor = self.db.cursor()
         cursor.execute("""
             UPDATE player_characters
             SET classe_armatura = %s
             WHERE id = %s
-        """, (
-            ac.get('effective') if ac.get('effective') is not None else ac.get('automatic'),
-            pg_id,
-        ))
+        """, (armor_class, pg_id))
         self.db.commit()
         cursor.close()
+        snapshot = self.get_character_snapshot(pg_id)
+        if snapshot and snapshot.character:
+            snapshot.character['classe_armatura'] = armor_class
         return {'armor_class': ac}
     
     def create_character_info_tab(self, notebook, pg_id, character):
@@ -2186,10 +3397,10 @@ class DeDToolGUI:
         """Ricarica linguaggi inline"""
         try:
             self.languages_listbox.delete(0, 'end')
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_linguaggi WHERE pg_id = %s ORDER BY lingua", (pg_id,))
-            languages = cursor.fetchall()
-            cursor.close()
+            languages = sorted(
+                self.get_character_rows(pg_id, 'pc_linguaggi'),
+                key=lambda r: self._sql_sort_key(r.get('lingua'))
+            )
             
             # Salva IDs
             if not hasattr(self, 'language_ids'):
@@ -2250,10 +3461,8 @@ class DeDToolGUI:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        cursor = self.db.cursor()
-        cursor.execute("SELECT * FROM pc_abilita_ladro WHERE pg_id = %s", (pg_id,))
-        abilities = cursor.fetchone()
-        cursor.close()
+        ability_rows = self.get_character_rows(pg_id, 'pc_abilita_ladro')
+        abilities = ability_rows[0] if ability_rows else None
 
         class_code = self.get_character_class_code(character)
         class_row = self.get_rule_class_by_code(class_code) or {}
@@ -2820,84 +4029,96 @@ class DeDToolGUI:
                 except:
                     return default
             
-            class_label = self.char_widgets['classe'].get() or 'Ladro'
-            class_code = getattr(self, 'rule_class_code_by_label', {}).get(class_label)
-            if not class_code:
-                class_code = self.normalize_class_code(class_label)
-            class_name = getattr(self, 'rule_class_name_by_code', {}).get(class_code) or class_label.split(' (')[0]
-
-            temp_character = {
-                'forza': int(get_safe_value(self.char_widgets['forza'], 10)),
-                'intelligenza': int(get_safe_value(self.char_widgets['intelligenza'], 10)),
-                'saggezza': int(get_safe_value(self.char_widgets['saggezza'], 10)),
-                'destrezza': int(get_safe_value(self.char_widgets['destrezza'], 10)),
-                'costituzione': int(get_safe_value(self.char_widgets['costituzione'], 10)),
-                'carisma': int(get_safe_value(self.char_widgets['carisma'], 10)),
-            }
-            class_row = self.get_rule_class_by_code(class_code) or {}
-            level = max(1, min(int(get_safe_value(self.char_widgets['livello'], 1)), 36))
-            rule_summary = {
-                'requisito_primario': class_row.get('primary_requisite') or '',
-                'modificatore_px': self.calculate_xp_modifier(temp_character, class_code),
-                'dado_vita': self.format_hit_die_with_constitution(
-                    class_row.get('hit_die') or '',
-                    temp_character.get('costituzione', 10)
-                ),
-                'px_prossimo_livello': self.calculate_next_level_xp(class_code, level),
-                'thac0': self.calculate_thac0_becmi(class_code, level),
-            }
+            # Con la costruzione lazy delle tab si salvano solo i campi delle tab gia' aperte;
+            # classe e livello mancanti si leggono dalla riga caricata all'apertura della scheda.
+            sheet_character = getattr(self, 'current_sheet_character', None) or {}
+            update_fields = {}
 
-            automatic_saves = self.calculate_saving_throws_becmi(class_code, level)
+            if 'classe' in self.char_widgets:
+                class_label = self.char_widgets['classe'].get() or 'Ladro'
+                class_code = getattr(self, 'rule_class_code_by_label', {}).get(class_label)
+                if not class_code:
+                    class_code = self.normalize_class_code(class_label)
+                class_name = getattr(self, 'rule_class_name_by_code', {}).get(class_code) or class_label.split(' (')[0]
+
+                temp_character = {
+                    'forza': int(get_safe_value(self.char_widgets['forza'], 10)),
+                    'intelligenza': int(get_safe_value(self.char_widgets['intelligenza'], 10)),
+                    'saggezza': int(get_safe_value(self.char_widgets['saggezza'], 10)),
+                    'destrezza': int(get_safe_value(self.char_widgets['destrezza'], 10)),
+                    'costituzione': int(get_safe_value(self.char_widgets['costituzione'], 10)),
+                    'carisma': int(get_safe_value(self.char_widgets['carisma'], 10)),
+                }
+                class_row = self.get_rule_class_by_code(class_code) or {}
+                level = max(1, min(int(get_safe_value(self.char_widgets['livello'], 1)), 36))
+                rule_summary = {
+                    'requisito_primario': class_row.get('primary_requisite') or '',
+                    'modificatore_px': self.calculate_xp_modifier(temp_character, class_code),
+                    'dado_vita': self.format_hit_die_with_constitution(
+                        class_row.get('hit_die') or '',
+                        temp_character.get('costituzione', 10)
+                    ),
+                    'px_prossimo_livello': self.calculate_next_level_xp(class_code, level),
+                    'thac0': self.calculate_thac0_becmi(class_code, level),
+                }
 
-            # Prepara dati da aggiornare
-            update_fields = {
-                'classe': class_name,
-                'class_code': class_code,
-                'livello': level,
-                'titolo': self.char_widgets['titolo'].get() or '',
-                'px_attuali': int(get_safe_value(self.char_widgets.get('px_attuali'), 0)),
-                'px_prossimo_livello': int(rule_summary['px_prossimo_livello'] or 0),
-                'requisito_primario': rule_summary['requisito_primario'],
-                'modificatore_px': int(rule_summary['modificatore_px'] or 0),
-                'dado_vita': rule_summary['dado_vita'],
-                'thac0': int(rule_summary['thac0']) if rule_summary['thac0'] is not None else None,
-                'forza': int(get_safe_value(self.char_widgets['forza'], 10)),
-                'intelligenza': int(get_safe_value(self.char_widgets['intelligenza'], 10)),
-                'saggezza': int(get_safe_value(self.char_widgets['saggezza'], 10)),
-                'destrezza': int(get_safe_value(self.char_widgets['destrezza'], 10)),
-                'costituzione': int(get_safe_value(self.char_widgets['costituzione'], 10)),
-                'carisma': int(get_safe_value(self.char_widgets['carisma'], 10)),
-                'legale': int(self.char_widgets['legale'].get()),
-                'neutrale': int(self.char_widgets['neutrale'].get()),
-                'caotico': int(self.char_widgets['caotico'].get()),
-                'sesso': self.char_widgets['sesso'].get() or '',
-                'eta': int(get_safe_value(self.char_widgets['eta'], 0)),
-                'capelli': self.char_widgets['capelli'].get() or '',
-                'occhi': self.char_widgets['occhi'].get() or '',
-                'pelle': self.char_widgets['pelle'].get() or '',
-                'altezza': self.char_widgets['altezza'].get() or '',
-                'peso': self.char_widgets['peso'].get() or '',
-                'luogo_origine': self.char_widgets['luogo_origine'].get() or '',
-                'compleanno': self.char_widgets['compleanno'].get() or '',
-                'nome_famiglia': self.char_widgets['nome_famiglia'].get() or '',
-                'nome_padre': self.char_widgets['nome_padre'].get() or '',
-                'classe_sociale': self.char_widgets['classe_sociale'].get() or '',
-                'soprannome': self.char_widgets['soprannome'].get() or '',
-                'background': self.char_widgets['background'].get('1.0', 'end-1c') or '',
-                'manierismo': self.char_widgets['manierismo'].get('1.0', 'end-1c') or '',
-                'bonus_speciali': self.char_widgets['bonus_speciali'].get('1.0', 'end-1c') or '',
-                'pf_massimi': int(get_safe_value(self.char_widgets['pf_massimi'], 0)),
-                'pf_attuali': int(get_safe_value(self.char_widgets['pf_attuali'], 0)),
-                'classe_armatura': int(get_safe_value(self.char_widgets['classe_armatura'], 10)),
-            }
+                # Prepara dati da aggiornare
+                update_fields.update({
+                    'classe': class_name,
+                    'class_code': class_code,
+                    'livello': level,
+                    'titolo': self.char_widgets['titolo'].get() or '',
+                    'px_attuali': int(get_safe_value(self.char_widgets.get('px_attuali'), 0)),
+                    'px_prossimo_livello': int(rule_summary['px_prossimo_livello'] or 0),
+                    'requisito_primario': rule_summary['requisito_primario'],
+                    'modificatore_px': int(rule_summary['modificatore_px'] or 0),
+                    'dado_vita': rule_summary['dado_vita'],
+                    'thac0': int(rule_summary['thac0']) if rule_summary['thac0'] is not None else None,
+                    'forza': int(get_safe_value(self.char_widgets['forza'], 10)),
+                    'intelligenza': int(get_safe_value(self.char_widgets['intelligenza'], 10)),
+                    'saggezza': int(get_safe_value(self.char_widgets['saggezza'], 10)),
+                    'destrezza': int(get_safe_value(self.char_widgets['destrezza'], 10)),
+                    'costituzione': int(get_safe_value(self.char_widgets['costituzione'], 10)),
+                    'carisma': int(get_safe_value(self.char_widgets['carisma'], 10)),
+                    'legale': int(self.char_widgets['legale'].get()),
+                    'neutrale': int(self.char_widgets['neutrale'].get()),
+                    'caotico': int(self.char_widgets['caotico'].get()),
+                    'sesso': self.char_widgets['sesso'].get() or '',
+                    'eta': int(get_safe_value(self.char_widgets['eta'], 0)),
+                    'capelli': self.char_widgets['capelli'].get() or '',
+                    'occhi': self.char_widgets['occhi'].get() or '',
+                    'pelle': self.char_widgets['pelle'].get() or '',
+                    'altezza': self.char_widgets['altezza'].get() or '',
+                    'peso': self.char_widgets['peso'].get() or '',
+                    'luogo_origine': self.char_widgets['luogo_origine'].get() or '',
+                    'compleanno': self.char_widgets['compleanno'].get() or '',
+                    'nome_famiglia': self.char_widgets['nome_famiglia'].get() or '',
+                    'nome_padre': self.char_widgets['nome_padre'].get() or '',
+                    'classe_sociale': self.char_widgets['classe_sociale'].get() or '',
+                    'soprannome': self.char_widgets['soprannome'].get() or '',
+                    'background': self.char_widgets['background'].get('1.0', 'end-1c') or '',
+                    'manierismo': self.char_widgets['manierismo'].get('1.0', 'end-1c') or '',
+                    'bonus_speciali': self.char_widgets['bonus_speciali'].get('1.0', 'end-1c') or '',
+                })
+
+                for ability in ['forza', 'intelligenza', 'saggezza', 'destrezza', 'costituzione', 'carisma']:
+                    base_widget = self.char_widgets.get(f'{ability}_base')
+                    reason_widget = self.char_widgets.get(f'{ability}_motivo')
+                    if base_widget:
+                        update_fields[f'{ability}_base'] = int(get_safe_value(base_widget, update_fields[ability]))
+                    if reason_widget:
+                        update_fields[f'{ability}_motivo'] = reason_widget.get() or ''
+            else:
+                class_code = self.get_character_class_code(sheet_character)
+                level = max(1, min(int(sheet_character.get('livello') or 1), 36))
 
-            for ability in ['forza', 'intelligenza', 'saggezza', 'destrezza', 'costituzione', 'carisma']:
-                base_widget = self.char_widgets.get(f'{ability}_base')
-                reason_widget = self.char_widgets.get(f'{ability}_motivo')
-                if base_widget:
-                    update_fields[f'{ability}_base'] = int(get_safe_value(base_widget, update_fields[ability]))
-                if reason_widget:
-                    update_fields[f'{ability}_motivo'] = reason_widget.get() or ''
+            # Campi base del TAB Combattimento
+            if 'pf_massimi' in self.char_widgets:
+                update_fields['pf_massimi'] = int(get_safe_value(self.char_widgets['pf_massimi'], 0))
+                update_fields['pf_attuali'] = int(get_safe_value(self.char_widgets['pf_attuali'], 0))
+                update_fields['classe_armatura'] = int(get_safe_value(self.char_widgets['classe_armatura'], 10))
+
+            automatic_saves = self.calculate_saving_throws_becmi(class_code, level)
             
             # Aggiungi TS se esistono
             if hasattr(self, 'ts_widgets'):
@@ -2939,6 +4160,13 @@ class DeDToolGUI:
             if existing_columns:
                 update_fields = {k: v for k, v in update_fields.items() if k in existing_columns}
 
+            if not update_fields:
+                # Nessuna tab con campi del PG ancora costruita: niente da salvare
+                cursor.close()
+                if show_message:
+                    messagebox.showinfo("Successo", "Dati personaggio salvati con successo!")
+                return True
+
             # Costruisci query UPDATE
             set_clause = ', '.join([f"{k} = %s" for k in update_fields.keys()])
             values = list(update_fields.values()) + [pg_id]
@@ -2955,6 +4183,9 @@ class DeDToolGUI:
             
             self.db.commit()
             cursor.close()
+            # Riallinea l'istantanea della scheda ai valori appena salvati
+            if self.get_character_snapshot(pg_id):
+                self.reload_current_sheet_character()
             
             if show_message:
                 messagebox.showinfo("Successo", "Dati personaggio salvati con successo!")
@@ -3316,7 +4547,9 @@ class DeDToolGUI:
         self.inventory_search_var = tk.StringVar()
         search_entry = ttk.Entry(search_frame, textvariable=self.inventory_search_var, width=36)
         search_entry.pack(side='left', fill='x', expand=True)
-        self.inventory_search_var.trace_add('write', lambda *_: self.refresh_inventory_lists(pg_id))
+        self.inventory_search_var.trace_add(
+            'write', lambda *_: self._get_inventory_filter_model().schedule_filter(self.inventory_search_var.get())
+        )
 
         columns = ('oggetto', 'quantita', 'contenitore', 'posizione', 'trasportato', 'consumabile')
         tree_frame = ttk.Frame(equipment_frame)
@@ -3375,9 +4608,11 @@ class DeDToolGUI:
     def refresh_weapons_unified_list(self, pg_id):
         try:
             self.weapons_tree.delete(*self.weapons_tree.get_children())
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_armi WHERE pg_id = %s ORDER BY nome", (pg_id,))
-            for i, weapon in enumerate(cursor.fetchall()):
+            weapons = sorted(
+                self.get_character_rows(pg_id, 'pc_armi'),
+                key=lambda r: self._sql_sort_key(r.get('nome'))
+            )
+            for i, weapon in enumerate(weapons):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
                 self.weapons_tree.insert('', 'end', values=(
                     weapon['nome'], self.normalize_weapon_type(weapon.get('tipo')),
@@ -3387,17 +4622,13 @@ class DeDToolGUI:
                     weapon.get('gittata_media', 0) or 0, weapon.get('gittata_lunga', 0) or 0,
                     weapon.get('quantita', 1) or 1
                 ), tags=(weapon['id'], tag))
-            cursor.close()
         except Exception as e:
             print(f"Errore refresh armi: {e}")
 
     def add_weapon_unified_dialog(self, pg_id):
         try:
             pg_id = int(pg_id)
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-            character = cursor.fetchone() or {}
-            cursor.close()
+            character = self.get_sheet_character(pg_id) or {}
             class_code = self.get_character_class_code(character)
             weapons = self._fetch_catalog_rows('rule_weapons', 'weapon_name')
 
@@ -3618,26 +4849,24 @@ class DeDToolGUI:
     def refresh_armor_list(self, pg_id):
         try:
             self.armor_tree.delete(*self.armor_tree.get_children())
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_armature WHERE pg_id = %s ORDER BY equipped DESC, tipo", (pg_id,))
-            for i, armor in enumerate(cursor.fetchall()):
+            armors = sorted(
+                self.get_character_rows(pg_id, 'pc_armature'),
+                key=lambda r: (-(r.get('equipped') or 0), self._sql_sort_key(r.get('tipo')))
+            )
+            for i, armor in enumerate(armors):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
                 self.armor_tree.insert('', 'end', values=(
                     armor.get('tipo') or '', armor.get('base_ac') if armor.get('base_ac') is not None else '',
                     armor.get('bonus_magico', 0) or 0, "Si" if armor.get('equipped') else "No",
                     armor.get('cost_mo') or '', armor.get('notes') or ''
                 ), tags=(armor['id'], tag))
-            cursor.close()
         except Exception as e:
             print(f"Errore refresh armature: {e}")
 
     def add_armor_dialog(self, pg_id):
         try:
             pg_id = int(pg_id)
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-            character = cursor.fetchone() or {}
-            cursor.close()
+            character = self.get_sheet_character(pg_id) or {}
             class_code = self.get_character_class_code(character)
             armors = self._fetch_catalog_rows('rule_armor', 'armor_name')
             dialog = tk.Toplevel(self.root)
@@ -3784,11 +5013,12 @@ class DeDToolGUI:
             return
         try:
             tree.delete(*tree.get_children())
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_containers WHERE pg_id = %s ORDER BY container_name", (pg_id,))
-            for row in cursor.fetchall():
+            containers = sorted(
+                self.get_character_rows(pg_id, 'pc_containers'),
+                key=lambda r: self._sql_sort_key(r.get('container_name'))
+            )
+            for row in containers:
                 tree.insert('', 'end', values=(row['container_name'], row.get('container_type') or '', row.get('location') or '', row.get('notes') or ''), tags=(row['id'],))
-            cursor.close()
         except Exception as e:
             print(f"Errore contenitori: {e}")
 
@@ -3799,29 +5029,21 @@ class DeDToolGUI:
                 name = item.get('item_name')
                 if name and name not in names:
                     names.append(name)
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT DISTINCT oggetto
-                FROM pc_inventario
-                WHERE pg_id = %s AND oggetto IS NOT NULL AND oggetto <> ''
-                ORDER BY oggetto
-            """, (pg_id,))
-            for row in cursor.fetchall():
+            for row in self.get_character_rows(pg_id, 'pc_inventario', refresh=False):
                 name = row.get('oggetto')
                 if name and name not in names:
                     names.append(name)
-            cursor.close()
         except Exception:
             pass
         return sorted(names, key=lambda value: value.lower())
 
     def get_pg_containers(self, pg_id):
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT id, container_name FROM pc_containers WHERE pg_id = %s ORDER BY container_name", (pg_id,))
-            rows = cursor.fetchall()
-            cursor.close()
-            return rows
+            # Ogni modifica ai contenitori passa da refresh_container_list, che riallinea l'istantanea
+            return sorted(
+                self.get_character_rows(pg_id, 'pc_containers', refresh=False),
+                key=lambda r: self._sql_sort_key(r.get('container_name'))
+            )
         except Exception:
             return []
 
@@ -3975,39 +5197,44 @@ class DeDToolGUI:
         ttk.Button(dialog, text="Travasa", command=save).grid(row=2, column=0, pady=12)
         ttk.Button(dialog, text="Annulla", command=dialog.destroy).grid(row=2, column=1, pady=12)
 
+    def _get_inventory_filter_model(self):
+        """Modello righe dell'inventario per la Treeview corrente (ricerca locale con debounce)."""
+        model = getattr(self, 'inventory_filter_model', None)
+        if model is None or model.tree is not self.inventory_tree:
+            model = TreeFilterModel(
+                self.inventory_tree,
+                values_fn=lambda item: (
+                    item.get('oggetto') or '', item.get('quantita') or 1,
+                    item.get('container_name') or '', item.get('location') or '',
+                    "Si" if item.get('carried', 1) else "No",
+                    "Si" if item.get('consumable') else "No"
+                ),
+                search_fn=lambda item: item.get('oggetto'),
+                tags_fn=lambda item: (item['id'],),
+                striped=True
+            )
+            search_var = getattr(self, 'inventory_search_var', None)
+            model.filter_text = search_var.get() if search_var else ''
+            self.inventory_filter_model = model
+        return model
+
     def refresh_inventory_lists(self, pg_id):
         try:
-            cursor = self.db.cursor()
-            self.inventory_tree.delete(*self.inventory_tree.get_children())
-            search_var = getattr(self, 'inventory_search_var', None)
-            search_text = search_var.get().strip() if search_var else ''
             order_column = getattr(self, 'inventory_sort_column', 'oggetto')
             order_dir = getattr(self, 'inventory_sort_dir', 'ASC')
-            order_map = {
-                'oggetto': 'pi.oggetto',
-                'contenitore': 'pc.container_name',
+            sort_field = 'container_name' if order_column == 'contenitore' else 'oggetto'
+            container_names = {
+                row['id']: row.get('container_name')
+                for row in self.get_character_rows(pg_id, 'pc_containers', refresh=False)
             }
-            order_sql = order_map.get(order_column, 'pi.oggetto')
-            params = [pg_id]
-            where = "WHERE pi.pg_id = %s"
-            if search_text:
-                where += " AND pi.oggetto LIKE %s"
-                params.append(f"%{search_text}%")
-            cursor.execute(f"""
-                SELECT pi.*, pc.container_name
-                FROM pc_inventario pi
-                LEFT JOIN pc_containers pc ON pi.container_id = pc.id
-                {where}
-                ORDER BY {order_sql} {order_dir}, pi.oggetto ASC
-            """, tuple(params))
-            for i, item in enumerate(cursor.fetchall()):
-                self.inventory_tree.insert('', 'end', values=(
-                    item.get('oggetto') or '', item.get('quantita') or 1,
-                    item.get('container_name') or '', item.get('location') or '',
-                    "Si" if item.get('carried', 1) else "No",
-                    "Si" if item.get('consumable') else "No"
-                ), tags=(item['id'], 'evenrow' if i % 2 == 0 else 'oddrow'))
-            cursor.close()
+            # Tutte le righe del PG: la ricerca per nome filtra il modello in memoria
+            items = [
+                {**item, 'container_name': container_names.get(item.get('container_id'))}
+                for item in self.get_character_rows(pg_id, 'pc_inventario')
+            ]
+            items.sort(key=lambda item: self._sql_sort_key(item.get('oggetto')))
+            items.sort(key=lambda item: self._sql_sort_key(item.get(sort_field)), reverse=order_dir == 'DESC')
+            self._get_inventory_filter_model().set_rows(items, lambda item: item['id'])
         except Exception as e:
             print(f"Errore refresh inventario: {e}")
 
@@ -4021,10 +5248,7 @@ class DeDToolGUI:
     def add_inventory_dialog(self, pg_id, tipo='equipaggiamento'):
         try:
             items = self._fetch_catalog_rows('rule_equipment', 'item_name')
-            cursor = self.db.cursor()
-            cursor.execute("SELECT id, container_name FROM pc_containers WHERE pg_id = %s ORDER BY container_name", (pg_id,))
-            containers = cursor.fetchall()
-            cursor.close()
+            containers = self.get_pg_containers(pg_id)
             dialog = tk.Toplevel(self.root)
             dialog.title("Aggiungi Equipaggiamento")
             dialog.geometry("470x360")
@@ -4218,10 +5442,7 @@ class DeDToolGUI:
             self.magic_tree.tag_configure('oddrow', background='white')
             self.magic_tree.tag_configure('evenrow', background='#f0f0f0')
             
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_oggetti_magici WHERE pg_id = %s", (pg_id,))
-            items = cursor.fetchall()
-            cursor.close()
+            items = self.get_character_rows(pg_id, 'pc_oggetti_magici')
             
             for i, item in enumerate(items):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
@@ -5580,7 +6801,7 @@ class DeDToolGUI:
 
         def on_spell_search(*_):
             self.spellbook_search_text = self.spellbook_search_var.get()
-            self.refresh_spellbook_list(pg_id)
+            self._get_spellbook_filter_model().schedule_filter(self.spellbook_search_text)
 
         self.spellbook_search_var.trace_add('write', on_spell_search)
         self.spellbook_sort_column = getattr(self, 'spellbook_sort_column', 'livello')
@@ -5715,25 +6936,18 @@ class DeDToolGUI:
     def refresh_spell_preparation_limits(self, pg_id):
         """Riepiloga gli slot usando solo il libro/preparazione strutturati."""
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-            character = cursor.fetchone()
-            cursor.close()
+            character = self.get_sheet_character(pg_id)
             if not character:
                 return {}
             class_code = self.get_character_class_code(character)
             level = int(character.get('livello') or 1)
             slots = self.get_effective_spell_slots(pg_id, class_code, level)
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT spell_level, COALESCE(SUM(prepared_count), 0) AS prepared,
-                       COALESCE(SUM(cast_count), 0) AS casted
-                FROM pc_spell_prepared
-                WHERE pg_id = %s
-                GROUP BY spell_level
-            """, (pg_id,))
-            structured = {int(r['spell_level']): r for r in cursor.fetchall()}
-            cursor.close()
+            # Il riepilogo segue sempre refresh_spellbook_list, che ha gia' riletto pc_spell_prepared
+            structured = {}
+            for row in self.get_character_rows(pg_id, 'pc_spell_prepared', refresh=False):
+                totals = structured.setdefault(int(row['spell_level']), {'prepared': 0, 'casted': 0})
+                totals['prepared'] += int(row.get('prepared_count') or 0)
+                totals['casted'] += int(row.get('cast_count') or 0)
             result = {}
             for spell_level in sorted(set(slots) | set(structured)):
                 prepared = int(structured.get(spell_level, {}).get('prepared') or 0)
@@ -5750,60 +6964,90 @@ class DeDToolGUI:
         except Exception:
             return {}
 
+    def _spellbook_tree_values(self, row):
+        effect = row.get('effect_text') or ''
+        if len(effect) > 60:
+            effect = effect[:57] + "..."
+        return (
+            row.get('spell_name') or '',
+            row.get('spell_level') or '',
+            "Si" if row.get('reversible') else "No",
+            row.get('range_text') or '',
+            row.get('duration_text') or '',
+            effect,
+            row.get('prepared_count', 0) or 0,
+            row.get('cast_count', 0) or 0,
+            "Si" if row.get('known') else "No",
+            "Si" if row.get('in_spellbook') else "No",
+        )
+
+    def _get_spellbook_filter_model(self):
+        """Modello righe del libro incantesimi per la Treeview corrente (ricerca locale con debounce)."""
+        model = getattr(self, 'spellbook_filter_model', None)
+        if model is None or model.tree is not self.spellbook_tree:
+            model = TreeFilterModel(
+                self.spellbook_tree,
+                values_fn=self._spellbook_tree_values,
+                search_fn=lambda row: row.get('spell_name'),
+                tags_fn=lambda row: (row['spell_id'],)
+            )
+            model.filter_text = getattr(self, 'spellbook_search_text', '') or ''
+            self.spellbook_filter_model = model
+        return model
+
     def refresh_spellbook_list(self, pg_id):
         tree = getattr(self, 'spellbook_tree', None)
         if not tree:
             return
         try:
-            tree.delete(*tree.get_children())
-            cursor = self.db.cursor()
-            search_text = (getattr(self, 'spellbook_search_text', '') or '').strip()
-            direction = 'DESC' if getattr(self, 'spellbook_sort_reverse', False) else 'ASC'
+            reverse = bool(getattr(self, 'spellbook_sort_reverse', False))
             sort_column = getattr(self, 'spellbook_sort_column', 'livello')
+            book = self.get_character_rows(pg_id, 'pc_spellbook')
+            prepared = {row['spell_id']: row for row in self.get_character_rows(pg_id, 'pc_spell_prepared')}
+            # Libro e preparazioni arrivano dall'istantanea: dal catalogo servono solo gli incantesimi del libro
+            spells = {}
+            spell_ids = sorted({row['spell_id'] for row in book if row.get('spell_id') is not None})
+            if spell_ids:
+                cursor = self.db.cursor()
+                cursor.execute(f"""
+                    SELECT id, spell_name, spell_level, spell_list_type, reversible,
+                           range_text, duration_text, effect_text, description
+                    FROM rule_spells
+                    WHERE id IN ({', '.join(['%s'] * len(spell_ids))})
+                """, spell_ids)
+                spells = {spell['id']: spell for spell in cursor.fetchall()}
+                cursor.close()
+            rows = []
+            for entry in book:
+                spell = spells.get(entry.get('spell_id'))
+                if not spell:
+                    continue
+                preparation = prepared.get(spell['id']) or {}
+                rows.append({
+                    **{key: value for key, value in spell.items() if key != 'id'},
+                    'spellbook_id': entry['id'],
+                    'book_notes': entry.get('notes'),
+                    'spell_id': spell['id'],
+                    'prepared_count': preparation.get('prepared_count') or 0,
+                    'cast_count': preparation.get('cast_count') or 0,
+                    'known': entry.get('known'),
+                    'in_spellbook': entry.get('in_spellbook'),
+                })
+            # Tutte le righe del PG: la ricerca per nome filtra il modello in memoria
+            name_key = lambda row: self._sql_sort_key(row.get('spell_name'))
+            level_key = lambda row: int(row.get('spell_level') or 0)
             if sort_column == 'nome':
-                order_sql = f"rs.spell_name {direction}, rs.spell_level ASC"
+                rows.sort(key=level_key)
+                rows.sort(key=name_key, reverse=reverse)
             elif sort_column == 'preparati':
-                order_sql = f"prepared_count {direction}, rs.spell_level ASC, rs.spell_name ASC"
+                rows.sort(key=lambda row: (level_key(row), name_key(row)))
+                rows.sort(key=lambda row: int(row['prepared_count']), reverse=reverse)
             else:
-                order_sql = f"rs.spell_level {direction}, rs.spell_name ASC"
-            query = f"""
-                SELECT ps.id AS spellbook_id, ps.notes AS book_notes, rs.id AS spell_id,
-                       rs.spell_name, rs.spell_level, rs.spell_list_type, rs.reversible,
-                       rs.range_text, rs.duration_text, rs.effect_text, rs.description,
-                       COALESCE(pp.prepared_count, 0) AS prepared_count,
-                       COALESCE(pp.cast_count, 0) AS cast_count,
-                       ps.known, ps.in_spellbook
-                FROM pc_spellbook ps
-                JOIN rule_spells rs ON ps.spell_id = rs.id
-                LEFT JOIN pc_spell_prepared pp ON pp.pg_id = ps.pg_id AND pp.spell_id = rs.id
-                WHERE ps.pg_id = %s
-            """
-            params = [pg_id]
-            if search_text:
-                query += " AND rs.spell_name LIKE %s"
-                params.append(f"%{search_text}%")
-            query += f" ORDER BY {order_sql}"
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+                rows.sort(key=name_key)
+                rows.sort(key=level_key, reverse=reverse)
             dynamic_height = max(5, min(len(rows) if rows else 5, 14))
             tree.configure(height=dynamic_height)
-            for row in rows:
-                effect = row.get('effect_text') or ''
-                if len(effect) > 60:
-                    effect = effect[:57] + "..."
-                tree.insert('', 'end', values=(
-                    row.get('spell_name') or '',
-                    row.get('spell_level') or '',
-                    "Si" if row.get('reversible') else "No",
-                    row.get('range_text') or '',
-                    row.get('duration_text') or '',
-                    effect,
-                    row.get('prepared_count', 0) or 0,
-                    row.get('cast_count', 0) or 0,
-                    "Si" if row.get('known') else "No",
-                    "Si" if row.get('in_spellbook') else "No",
-                ), tags=(row['spell_id'],))
-            cursor.close()
+            self._get_spellbook_filter_model().set_rows(rows, lambda row: row['spellbook_id'])
         except Exception as e:
             print(f"Errore refresh spellbook: {e}")
 
@@ -5834,24 +7078,18 @@ class DeDToolGUI:
         return row
 
     def get_spell_preparation_status_for_level(self, pg_id, spell_level):
-        cursor = self.db.cursor()
-        cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-        character = cursor.fetchone()
+        character = self.get_sheet_character(pg_id)
         if not character:
-            cursor.close()
             return {'slots': 0, 'prepared': 0, 'available': 0}
         class_code = self.get_character_class_code(character)
         level = int(character.get('livello') or 1)
         slots = self.get_effective_spell_slots(pg_id, class_code, level)
-        cursor.execute("""
-            SELECT COALESCE(SUM(prepared_count), 0) AS prepared
-            FROM pc_spell_prepared
-            WHERE pg_id = %s AND spell_level = %s
-        """, (pg_id, spell_level))
-        row = cursor.fetchone() or {}
-        cursor.close()
+        prepared = sum(
+            int(row.get('prepared_count') or 0)
+            for row in self.get_character_rows(pg_id, 'pc_spell_prepared')
+            if int(row.get('spell_level') or 0) == int(spell_level)
+        )
         slot_count = int(slots.get(int(spell_level), 0) or 0)
-        prepared = int(row.get('prepared') or 0)
         return {
             'slots': slot_count,
             'prepared': prepared,
@@ -5860,11 +7098,10 @@ class DeDToolGUI:
 
     def add_spell_from_catalog_dialog(self, pg_id):
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-            character = cursor.fetchone()
+            character = self.get_sheet_character(pg_id)
             class_code = self.get_character_class_code(character)
             list_type = self.get_character_spell_list_type(class_code)
+            cursor = self.db.cursor()
             if list_type:
                 cursor.execute("""
                     SELECT id, spell_name, spell_level, spell_list_type, reversible,
@@ -5987,10 +7224,7 @@ class DeDToolGUI:
         else:
             level_spin.set(1)
             try:
-                cursor = self.db.cursor()
-                cursor.execute("SELECT * FROM player_characters WHERE id = %s", (pg_id,))
-                character = cursor.fetchone()
-                cursor.close()
+                character = self.get_sheet_character(pg_id)
                 list_combo.set(self.get_character_spell_list_type(self.get_character_class_code(character)) or 'ARCANA')
             except Exception:
                 list_combo.set('ARCANA')
@@ -6293,10 +7527,7 @@ class DeDToolGUI:
             self.mercenary_tree.tag_configure('oddrow', background='white')
             self.mercenary_tree.tag_configure('evenrow', background='#f0f0f0')
             
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_mercenari WHERE pg_id = %s", (pg_id,))
-            mercenaries = cursor.fetchall()
-            cursor.close()
+            mercenaries = self.get_character_rows(pg_id, 'pc_mercenari')
             
             for i, merc in enumerate(mercenaries):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
@@ -6705,10 +7936,12 @@ class DeDToolGUI:
             if fixed_expense_id:
                 cursor.execute("""
                     UPDATE fixed_expenses
-                    SET pg_id = %s, description = %s, amount = %s,
+                    SET next_due_day = IF(frequency = %s AND next_due_day IS NOT NULL, next_due_day, %s),
+                        pg_id = %s, description = %s, amount = %s,
                         frequency = %s, source_bank_id = %s
                     WHERE id = %s AND pg_id = %s
-                """, (pg_id, description, cost, frequency, bank_id, fixed_expense_id, pg_id))
+                """, (frequency, self._current_next_due_day(frequency),
+                      pg_id, description, cost, frequency, bank_id, fixed_expense_id, pg_id))
                 if cursor.rowcount == 0:
                     cursor.execute(
                         "SELECT id FROM fixed_expenses WHERE id = %s AND pg_id = %s",
@@ -6719,9 +7952,9 @@ class DeDToolGUI:
             if not fixed_expense_id:
                 cursor.execute("""
                     INSERT INTO fixed_expenses
-                        (pg_id, description, amount, frequency, source_bank_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (pg_id, description, cost, frequency, bank_id))
+                        (pg_id, description, amount, frequency, source_bank_id, next_due_day)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pg_id, description, cost, frequency, bank_id, self._current_next_due_day(frequency)))
                 fixed_expense_id = cursor.lastrowid
         elif fixed_expense_id:
             cursor.execute("DELETE FROM fixed_expenses WHERE id = %s AND pg_id = %s", (fixed_expense_id, pg_id))
@@ -6775,10 +8008,7 @@ class DeDToolGUI:
             self.advisor_tree.tag_configure('oddrow', background='white')
             self.advisor_tree.tag_configure('evenrow', background='#f0f0f0')
             
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_consiglieri WHERE pg_id = %s", (pg_id,))
-            advisors = cursor.fetchall()
-            cursor.close()
+            advisors = self.get_character_rows(pg_id, 'pc_consiglieri')
             
             for i, adv in enumerate(advisors):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
@@ -7265,10 +8495,12 @@ class DeDToolGUI:
             if fixed_expense_id:
                 cursor.execute("""
                     UPDATE fixed_expenses
-                    SET pg_id = %s, description = %s, amount = %s,
+                    SET next_due_day = IF(frequency = %s AND next_due_day IS NOT NULL, next_due_day, %s),
+                        pg_id = %s, description = %s, amount = %s,
                         frequency = %s, source_bank_id = %s
                     WHERE id = %s AND pg_id = %s
-                """, (pg_id, description, cost, frequency, bank_id, fixed_expense_id, pg_id))
+                """, (frequency, self._current_next_due_day(frequency),
+                      pg_id, description, cost, frequency, bank_id, fixed_expense_id, pg_id))
                 if cursor.rowcount == 0:
                     cursor.execute(
                         "SELECT id FROM fixed_expenses WHERE id = %s AND pg_id = %s",
@@ -7279,9 +8511,9 @@ class DeDToolGUI:
             if not fixed_expense_id:
                 cursor.execute("""
                     INSERT INTO fixed_expenses
-                        (pg_id, description, amount, frequency, source_bank_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (pg_id, description, cost, frequency, bank_id))
+                        (pg_id, description, amount, frequency, source_bank_id, next_due_day)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pg_id, description, cost, frequency, bank_id, self._current_next_due_day(frequency)))
                 fixed_expense_id = cursor.lastrowid
         elif fixed_expense_id:
             cursor.execute("DELETE FROM fixed_expenses WHERE id = %s AND pg_id = %s", (fixed_expense_id, pg_id))
@@ -7352,10 +8584,10 @@ class DeDToolGUI:
             self.specialist_tree.tag_configure('oddrow', background='white')
             self.specialist_tree.tag_configure('evenrow', background='#f0f0f0')
             
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_specialisti WHERE pg_id = %s ORDER BY tipo, nome", (pg_id,))
-            specialists = cursor.fetchall()
-            cursor.close()
+            specialists = sorted(
+                self.get_character_rows(pg_id, 'pc_specialisti'),
+                key=lambda r: (self._sql_sort_key(r.get('tipo')), self._sql_sort_key(r.get('nome')))
+            )
             
             for i, spec in enumerate(specialists):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
@@ -7711,10 +8943,12 @@ class DeDToolGUI:
             if fixed_expense_id:
                 cursor.execute("""
                     UPDATE fixed_expenses
-                    SET pg_id = %s, description = %s, amount = %s,
+                    SET next_due_day = IF(frequency = %s AND next_due_day IS NOT NULL, next_due_day, %s),
+                        pg_id = %s, description = %s, amount = %s,
                         frequency = %s, source_bank_id = %s
                     WHERE id = %s AND pg_id = %s
-                """, (pg_id, description, cost, frequency, bank_id, fixed_expense_id, pg_id))
+                """, (frequency, self._current_next_due_day(frequency),
+                      pg_id, description, cost, frequency, bank_id, fixed_expense_id, pg_id))
                 if cursor.rowcount == 0:
                     cursor.execute(
                         "SELECT id FROM fixed_expenses WHERE id = %s AND pg_id = %s",
@@ -7725,9 +8959,9 @@ class DeDToolGUI:
             if not fixed_expense_id:
                 cursor.execute("""
                     INSERT INTO fixed_expenses
-                        (pg_id, description, amount, frequency, source_bank_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (pg_id, description, cost, frequency, bank_id))
+                        (pg_id, description, amount, frequency, source_bank_id, next_due_day)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pg_id, description, cost, frequency, bank_id, self._current_next_due_day(frequency)))
                 fixed_expense_id = cursor.lastrowid
         elif fixed_expense_id:
             cursor.execute("DELETE FROM fixed_expenses WHERE id = %s AND pg_id = %s", (fixed_expense_id, pg_id))
@@ -7793,23 +9027,18 @@ class DeDToolGUI:
             tree.tag_configure('oddrow', background='white')
             tree.tag_configure('evenrow', background='#f0f0f0')
             
-            cursor = self.db.cursor()
-            direction = 'DESC' if getattr(self, 'scroll_sort_reverse', False) else 'ASC'
+            reverse = bool(getattr(self, 'scroll_sort_reverse', False))
             sort_column = getattr(self, 'scroll_sort_column', 'nome')
+            scrolls = sorted(
+                self.get_character_rows(pg_id, 'pc_pergamene'),
+                key=lambda r: (self._sql_sort_key(r.get('nome') or ''), r['id'])
+            )
             if sort_column == 'tipo':
-                order_sql = f"COALESCE(tipo, '') {direction}, COALESCE(nome, '') ASC, id ASC"
+                scrolls.sort(key=lambda r: self._sql_sort_key(r.get('tipo') or ''), reverse=reverse)
             elif sort_column == 'trasportata':
-                order_sql = f"trasportata {direction}, COALESCE(nome, '') ASC, id ASC"
-            else:
-                order_sql = f"COALESCE(nome, '') {direction}, id ASC"
-            cursor.execute(f"""
-                SELECT *
-                FROM pc_pergamene
-                WHERE pg_id = %s
-                ORDER BY {order_sql}
-            """, (pg_id,))
-            scrolls = cursor.fetchall()
-            cursor.close()
+                scrolls.sort(key=lambda r: self._sql_sort_key(r.get('trasportata')), reverse=reverse)
+            elif reverse:
+                scrolls.sort(key=lambda r: self._sql_sort_key(r.get('nome') or ''), reverse=True)
             
             for i, scroll in enumerate(scrolls):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
@@ -8282,23 +9511,17 @@ class DeDToolGUI:
             tree.tag_configure('oddrow', background='white')
             tree.tag_configure('evenrow', background='#f0f0f0')
             is_dm = self.current_user and self.current_user.get('role') == 'DM'
-            direction = 'DESC' if getattr(self, 'action_sort_reverse', False) else 'ASC'
+            reverse = bool(getattr(self, 'action_sort_reverse', False))
             sort_column = getattr(self, 'action_sort_column', 'azione')
-            if sort_column == 'tipo':
-                order_sql = f"COALESCE(tipo, '') {direction}, COALESCE(azione, '') ASC, id ASC"
-            elif sort_column == 'stato':
-                order_sql = f"COALESCE(stato, '') {direction}, COALESCE(azione, '') ASC, id ASC"
-            else:
-                order_sql = f"COALESCE(azione, '') {direction}, id ASC"
-            query = f"SELECT * FROM pc_azioni_speciali WHERE pg_id = %s"
-            params = [pg_id]
-            if not is_dm:
-                query += " AND visible_to_player = 1"
-            query += f" ORDER BY {order_sql}"
-            cursor = self.db.cursor()
-            cursor.execute(query, params)
-            actions = cursor.fetchall()
-            cursor.close()
+            actions = [
+                action for action in self.get_character_rows(pg_id, 'pc_azioni_speciali')
+                if is_dm or action.get('visible_to_player') == 1
+            ]
+            actions.sort(key=lambda r: (self._sql_sort_key(r.get('azione') or ''), r['id']))
+            if sort_column in ('tipo', 'stato'):
+                actions.sort(key=lambda r: self._sql_sort_key(r.get(sort_column) or ''), reverse=reverse)
+            elif reverse:
+                actions.sort(key=lambda r: self._sql_sort_key(r.get('azione') or ''), reverse=True)
 
             for i, action in enumerate(actions):
                 tag = 'evenrow' if i % 2 == 0 else 'oddrow'
@@ -8514,21 +9737,47 @@ class DeDToolGUI:
         except Exception as e:
             messagebox.showerror("Errore", f"Errore eliminazione azione speciale: {e}")
 
-    def check_nuovo_diario(self):
-        """Controlla se esiste una nuova versione del diario su GitHub."""
+    def _fetch_remote_diario_version(self):
+        """Legge da GitHub la versione pubblicata del diario (fase di avvio in background)."""
+        import requests
         VERSION_URL = "https://raw.githubusercontent.com/MaxTrevi/DeD-Tool/main/diario_version.txt"
-        try:
-            versione_locale = self.current_user.get('diario_version', "0.0.0")
+        response = requests.get(VERSION_URL, timeout=3)
+        response.raise_for_status()
+        return response.text.strip()
 
-            response = requests.get(VERSION_URL, timeout=3)
-            response.raise_for_status()
-            ultima_versione_online = response.text.strip()
+    def _on_remote_diario_version(self, version):
+        self._remote_diario_version = version
+        if self.current_user:
+            self._refresh_diario_badge()
 
-            return self._is_remote_version_newer(ultima_versione_online, versione_locale)
+    def check_nuovo_diario(self):
+        """Controlla se esiste una nuova versione del diario (versione remota letta all'avvio)."""
+        try:
+            if self._remote_diario_version is None:
+                return False
+            versione_locale = self.current_user.get('diario_version', "0.0.0")
+            return self._is_remote_version_newer(self._remote_diario_version, versione_locale)
 
         except Exception:
             return False
 
+    def _refresh_diario_badge(self):
+        """Se la versione remota arriva a menu già aperto, mette il pulsante Diario lampeggiante."""
+        plain_btn = getattr(self, '_diario_plain_button', None)
+        if not plain_btn or not plain_btn.winfo_exists() or not self.check_nuovo_diario():
+            return
+        info = plain_btn.grid_info()
+        sidebar = plain_btn.master
+        plain_btn.destroy()
+        self._diario_plain_button = None
+
+        btn = tk.Button(sidebar, text="📘 Diario ⭐ NUOVO ⭐", command=self.download_diary, width=23,
+                        bg='SystemButtonFace', fg='black', font=('Arial', 9))
+        btn.grid(row=info['row'], column=info['column'], padx=10, pady=3)
+        self.diario_has_new_version = True
+        self.diario_button = btn
+        self.start_diario_blink()
+
     def _parse_version_tuple(self, version):
         """Converte una versione tipo 0.2.4 in tupla numerica confrontabile."""
         try:
@@ -8549,6 +9798,7 @@ class DeDToolGUI:
     def download_diary(self):
         """Scarica il diario della campagna"""
         try:
+            import requests
             VERSION_URL = "https://raw.githubusercontent.com/MaxTrevi/DeD-Tool/main/diario_version.txt"
             PDF_URL = "https://raw.githubusercontent.com/MaxTrevi/DeD-Tool/main/Diario_Campagna.pdf"
             
@@ -9264,30 +10514,18 @@ class DeDToolGUI:
             if hasattr(self, attr):
                 setattr(self, attr, None)
 
-    def send_email_notification(self, to_email, subject, body):
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 465  # SSL
-
-        sender_email = self.SMTP_EMAIL
-        app_password = self.SMTP_PASSWORD
-
-        if not sender_email or not app_password:
+    def send_email_notification(self, to_email, subject, body, on_status=None):
+        """
+        Accoda l'email nella coda persistente e ritorna subito: l'invio avviene sul thread
+        dell'EmailOutbox. Restituisce l'id del messaggio o None se la configurazione manca.
+        """
+        if not self.SMTP_EMAIL or (not self.SMTP_PASSWORD and self.email_outbox.use_ssl):
             print("❌ Email o password non trovate nel file .env_sec")
-            return
-
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = sender_email
-        msg["To"] = to_email
-        msg.set_content(body)
+            return None
 
-        try:
-            with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
-                server.login(sender_email, app_password)
-                server.send_message(msg)
-            print(f"📧 Email inviata con successo a {to_email}")
-        except Exception as e:
-            print(f"❌ Errore durante l'invio email a {to_email}: {e}")
+        msg_id = self.email_outbox.enqueue(to_email, subject, body, on_status)
+        print(f"📧 Email per {to_email} accodata")
+        return msg_id
 
     def treeview_sort_column(self, tree, col, reverse):
         """Ordina le colonne di una Treeview cliccando sull’intestazione"""
@@ -9506,6 +10744,9 @@ class DeDToolGUI:
                     WHERE id=%s
                 """, (name, player_id, char_id))
                 self.db.commit()
+                snapshot = self.get_character_snapshot(char_id)
+                if snapshot and snapshot.character:
+                    snapshot.character.update({'name': name, 'user_id': player_id})
                 
                 messagebox.showinfo("Successo", "Personaggio aggiornato!")
                 dialog.destroy()
@@ -9643,6 +10884,12 @@ class DeDToolGUI:
                 command=self.export_to_excel
             ).pack(side='left', padx=5)
 
+            ttk.Button(
+                btn_frame_row2,
+                text="🧮 Riconcilia Saldi",
+                command=self.reconcile_bank_balances
+            ).pack(side='left', padx=5)
+
         # Lista banche
         self.show_banks_list()
     
@@ -10081,42 +11328,76 @@ class DeDToolGUI:
             # utente ha chiuso il dialog o non ha selezionato nulla
             return
 
-        # Ora carichiamo le transazioni con le JOIN come nel tuo script originale
-        try:
-            cursor.execute("""
-                SELECT 
-                    t.operation_type, t.amount, t.reason, t.timestamp,
-                    pc.name AS pg_name,
-                    u.username AS user_name,
-                    b2.name AS target_bank_name
-                FROM bank_transactions t
-                LEFT JOIN player_characters pc ON t.pg_id = pc.id
-                LEFT JOIN users u ON t.user_id = u.id
-                LEFT JOIN banks b2 ON t.target_bank_id = b2.id
-                WHERE t.bank_id = %s
-                ORDER BY t.timestamp DESC
-            """, (bank_id,))
-            transactions = cursor.fetchall()
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore query transazioni: {e}")
-            return
-
-        # Costruisco la finestra con Treeview per mostrare lo storico
+        # Storico a pagine: keyset su (timestamp, id) con filtri lato server
         dialog = tk.Toplevel(self.root)
         dialog.title(f"Storico - {bank_name or ''}")
-        dialog.geometry("900x420")
-
+        dialog.geometry("900x460")
+
+        filter_frame = ttk.Frame(dialog)
+        filter_frame.pack(fill='x', padx=10, pady=(10, 0))
+        ttk.Label(filter_frame, text="Operazione:").pack(side='left')
+        op_var = tk.StringVar(value="Tutte")
+        ttk.Combobox(filter_frame, textvariable=op_var, width=22,
+                     values=("Tutte",) + self.BANK_OPERATION_TYPES).pack(side='left', padx=5)
+        ttk.Label(filter_frame, text="Dal (AAAA-MM-GG):").pack(side='left', padx=(10, 0))
+        from_entry = ttk.Entry(filter_frame, width=12)
+        from_entry.pack(side='left', padx=5)
+        ttk.Label(filter_frame, text="Al:").pack(side='left', padx=(10, 0))
+        to_entry = ttk.Entry(filter_frame, width=12)
+        to_entry.pack(side='left', padx=5)
+
+        tree_frame = ttk.Frame(dialog)
+        tree_frame.pack(fill='both', expand=True, padx=10, pady=10)
         cols = ('Data/Time', 'Operazione', 'Importo', 'PG', 'Giocatore', 'Motivo', 'Destinazione')
-        hist_tree = ttk.Treeview(dialog, columns=cols, show='headings', height=18)
+        hist_tree = ttk.Treeview(tree_frame, columns=cols, show='headings', height=18)
         for c in cols:
             hist_tree.heading(c, text=c)
             hist_tree.column(c, width=120 if c != 'Motivo' and c != 'Destinazione' else 220)
-        hist_tree.pack(fill='both', expand=True, padx=10, pady=10)
+        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=hist_tree.yview)
+        hist_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
 
-        if not transactions:
-            # messaggio vuoto ma mostriamo la finestra per coerenza
-            messagebox.showinfo("Informazione", "Nessuna transazione trovata per la banca selezionata.")
-        else:
+        status_label = ttk.Label(dialog, text="", style='Info.TLabel')
+        status_label.pack()
+
+        page_size = self.BANK_HISTORY_PAGE_SIZE
+        page = {'filters': None, 'last_key': None, 'has_more': False, 'loading': False, 'count': 0}
+
+        def read_filters():
+            op = op_var.get().strip()
+            filters = {'operation_type': None if op in ("", "Tutte") else op}
+            for key, entry in (('date_from', from_entry), ('date_to', to_entry)):
+                text = entry.get().strip()
+                filters[key] = datetime.strptime(text, "%Y-%m-%d").date() if text else None
+            return filters
+
+        def update_status():
+            if not page['count']:
+                status_label.config(text="Nessuna transazione trovata per la banca e i filtri selezionati.")
+            elif page['has_more']:
+                status_label.config(text=f"{page['count']} operazioni caricate - scorri per caricarne altre")
+            else:
+                status_label.config(text=f"{page['count']} operazioni")
+            more_btn.config(state='normal' if page['has_more'] else 'disabled')
+
+        def load_next_page():
+            if page['loading'] or not page['has_more'] or not hist_tree.winfo_exists():
+                return
+            page['loading'] = True
+            try:
+                # una riga in più dice se esiste una pagina successiva
+                transactions = self._fetch_bank_history_page(
+                    bank_id, page['filters'], page['last_key'], page_size + 1
+                )
+            except Exception as e:
+                page['has_more'] = False
+                messagebox.showerror("Errore", f"Errore query transazioni: {e}", parent=dialog)
+                return
+            finally:
+                page['loading'] = False
+
+            page['has_more'] = len(transactions) > page_size
+            transactions = transactions[:page_size]
             for tx in transactions:
                 ts = tx.get('timestamp')
                 # formatto timestamp in stringa leggibile
@@ -10132,6 +11413,253 @@ class DeDToolGUI:
                 motivo = tx.get('reason') or ''
                 dest = tx.get('target_bank_name') or ''
                 hist_tree.insert('', 'end', values=(ts_str, oper, amt_str, pg, usern, motivo, dest))
+            if transactions:
+                page['last_key'] = (transactions[-1]['timestamp'], transactions[-1]['id'])
+            page['count'] += len(transactions)
+            update_status()
+
+        def reload():
+            try:
+                filters = read_filters()
+            except ValueError:
+                messagebox.showerror("Errore", "Data non valida: usa il formato AAAA-MM-GG", parent=dialog)
+                return
+            hist_tree.delete(*hist_tree.get_children())
+            page.update(filters=filters, last_key=None, has_more=True, count=0)
+            load_next_page()
+
+        def on_tree_scroll(first, last):
+            scrollbar.set(first, last)
+            # Scorrimento virtuale: vicino al fondo della lista si legge la pagina successiva
+            if float(last) >= 0.9 and page['has_more'] and not page['loading']:
+                dialog.after_idle(load_next_page)
+
+        hist_tree.configure(yscrollcommand=on_tree_scroll)
+        ttk.Button(filter_frame, text="🔍 Filtra", command=reload).pack(side='left', padx=10)
+
+        buttons_frame = ttk.Frame(dialog)
+        buttons_frame.pack(pady=6)
+        more_btn = ttk.Button(buttons_frame, text="⬇️ Carica altre", command=load_next_page)
+        more_btn.pack(side='left', padx=5)
+        ttk.Button(buttons_frame, text="Chiudi", command=dialog.destroy).pack(side='left', padx=5)
+
+        reload()
+
+    def _fetch_bank_history_page(self, bank_id, filters=None, after_key=None, limit=200):
+        """
+        Legge una pagina dello storico di una banca, dalla operazione più recente.
+        Paginazione keyset su (timestamp, id): after_key è la chiave dell'ultima riga già
+        mostrata, quindi ogni pagina scorre solo le righe che le servono sull'indice
+        bank_transactions(bank_id, timestamp, id) invece di ripartire da OFFSET.
+        filters: operation_type, date_from e date_to (date comprese); None = nessun filtro.
+        """
+        filters = filters or {}
+        where = ["t.bank_id = %s"]
+        params = [bank_id]
+        if filters.get('operation_type'):
+            where.append("t.operation_type = %s")
+            params.append(filters['operation_type'])
+        if filters.get('date_from'):
+            where.append("t.timestamp >= %s")
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            where.append("t.timestamp < %s")
+            params.append(filters['date_to'] + timedelta(days=1))
+        if after_key:
+            last_ts, last_id = after_key
+            where.append("(t.timestamp < %s OR (t.timestamp = %s AND t.id < %s))")
+            params.extend([last_ts, last_ts, last_id])
+        params.append(int(limit))
+
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT 
+                    t.id, t.operation_type, t.amount, t.reason, t.timestamp,
+                    pc.name AS pg_name,
+                    u.username AS user_name,
+                    b2.name AS target_bank_name
+                FROM bank_transactions t
+                LEFT JOIN player_characters pc ON t.pg_id = pc.id
+                LEFT JOIN users u ON t.user_id = u.id
+                LEFT JOIN banks b2 ON t.target_bank_id = b2.id
+                WHERE {' AND '.join(where)}
+                ORDER BY t.timestamp DESC, t.id DESC
+                LIMIT %s
+            """, tuple(params))
+            return cursor.fetchall() or []
+        finally:
+            cursor.close()
+
+    def snapshot_bank_balances(self, cursor, absolute_day):
+        """
+        Registra in bank_balance_snapshots il saldo di ogni banca al giorno assoluto indicato.
+        Il saldo atteso si ricalcola in modo incrementale: saldo dell'ultimo snapshot della
+        banca piu' i soli movimenti con id successivo a quello registrato allora. La differenza
+        con current_balance (drift) resta salvata nella riga; il primo snapshot di una banca
+        fa da base e non ha saldo atteso. Non fa commit: gira nella transazione del chiamante.
+        Restituisce le righe registrate come dict (bank_id, name, balance, expected, drift).
+        """
+        signed_amount = (
+            f"CASE WHEN t.operation_type IN ({', '.join(['%s'] * len(self.BANK_CREDIT_OPERATIONS))}) THEN t.amount "
+            f"WHEN t.operation_type IN ({', '.join(['%s'] * len(self.BANK_DEBIT_OPERATIONS))}) THEN -t.amount "
+            f"ELSE 0 END"
+        )
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS last_id FROM bank_transactions")
+        last_tx_id = int((cursor.fetchone() or {}).get('last_id') or 0)
+
+        cursor.execute(f"""
+            SELECT b.id, b.name, b.current_balance,
+                   s.balance AS snapshot_balance,
+                   (SELECT COALESCE(SUM({signed_amount}), 0)
+                    FROM bank_transactions t
+                    WHERE t.bank_id = b.id
+                      AND t.id > s.last_transaction_id AND t.id <= %s) AS ledger_delta
+            FROM banks b
+            LEFT JOIN bank_balance_snapshots s
+              ON s.bank_id = b.id
+             AND s.absolute_day = (SELECT MAX(s2.absolute_day)
+                                   FROM bank_balance_snapshots s2
+                                   WHERE s2.bank_id = b.id)
+            ORDER BY b.name
+        """, self.BANK_CREDIT_OPERATIONS + self.BANK_DEBIT_OPERATIONS + (last_tx_id,))
+
+        snapshots = []
+        for row in cursor.fetchall() or []:
+            balance = round(float(row.get('current_balance') or 0.0), 2)
+            expected = drift = None
+            if row.get('snapshot_balance') is not None:
+                expected = round(float(row['snapshot_balance']) + float(row.get('ledger_delta') or 0.0), 2)
+                drift = round(balance - expected, 2)
+            snapshots.append({
+                'bank_id': row['id'], 'name': row.get('name', 'N/A'),
+                'balance': balance, 'expected': expected, 'drift': drift,
+            })
+        if not snapshots:
+            return snapshots
+
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, NOW())"] * len(snapshots))
+        params = []
+        for snap in snapshots:
+            params.extend([snap['bank_id'], absolute_day, snap['balance'], snap['expected'], snap['drift'], last_tx_id])
+        # Un secondo snapshot nello stesso giorno somma il nuovo drift a quello gia' registrato
+        cursor.execute(f"""
+            INSERT INTO bank_balance_snapshots
+            (bank_id, absolute_day, balance, expected_balance, drift, last_transaction_id, created_at)
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE
+                drift = CASE WHEN drift IS NULL THEN VALUES(drift) ELSE drift + COALESCE(VALUES(drift), 0) END,
+                balance = VALUES(balance),
+                expected_balance = VALUES(expected_balance),
+                last_transaction_id = VALUES(last_transaction_id),
+                created_at = VALUES(created_at)
+        """, params)
+        return snapshots
+
+    def get_bank_balance_at(self, bank_id, absolute_day):
+        """
+        Saldo di una banca a un giorno Mystara: ultimo snapshot con absolute_day <= giorno
+        richiesto, letto con una sola ricerca sulla chiave (bank_id, absolute_day).
+        Restituisce il dict della riga (balance, absolute_day, drift) oppure None.
+        """
+        cursor = self.db.cursor()
+        try:
+            cursor.execute("""
+                SELECT balance, absolute_day, drift
+                FROM bank_balance_snapshots
+                WHERE bank_id = %s AND absolute_day <= %s
+                ORDER BY absolute_day DESC
+                LIMIT 1
+            """, (bank_id, int(absolute_day)))
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def reconcile_bank_balances(self):
+        """
+        Riconciliazione saldi (DM): registra lo snapshot dei saldi alla data di gioco corrente,
+        confronta ogni saldo con quello ricalcolato dai movimenti e segnala le differenze.
+        """
+        abs_day = self.date_to_absolute_day(self.game_date)
+        cursor = self.db.cursor()
+        try:
+            cursor.execute("START TRANSACTION")
+            snapshots = self.snapshot_bank_balances(cursor, abs_day)
+            self.db.commit()
+        except Exception as e:
+            try:
+                self.db.rollback()
+            except:
+                pass
+            messagebox.showerror(
+                "Errore",
+                f"Errore riconciliazione saldi: {e}\n\n"
+                "Verifica di aver eseguito lo script .github/docs/bank_balance_snapshots.sql"
+            )
+            return
+        finally:
+            try:
+                cursor.close()
+            except:
+                pass
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Riconciliazione Saldi")
+        dialog.geometry("760x480")
+
+        drifted = [s for s in snapshots if s['drift']]
+        if drifted:
+            summary = f"⚠️ {len(drifted)} banche con saldo diverso da quello ricalcolato dai movimenti"
+        else:
+            summary = "✅ Tutti i saldi coincidono con i movimenti registrati"
+        ttk.Label(dialog, text=f"{summary} - {self.convert_date_to_ded_format(self.game_date)}",
+                  style='Info.TLabel').pack(pady=(10, 5))
+
+        cols = ('Banca', 'Saldo', 'Saldo da movimenti', 'Differenza')
+        tree = ttk.Treeview(dialog, columns=cols, show='headings', height=14)
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=260 if c == 'Banca' else 150)
+        tree.tag_configure('drift', foreground='red')
+        for snap in snapshots:
+            expected = f"{snap['expected']:.2f} MO" if snap['expected'] is not None else "primo snapshot"
+            drift = f"{snap['drift']:+.2f} MO" if snap['drift'] else ""
+            tree.insert('', 'end', iid=str(snap['bank_id']),
+                        values=(snap['name'], f"{snap['balance']:.2f} MO", expected, drift),
+                        tags=('drift',) if snap['drift'] else ())
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+
+        # Saldo della banca selezionata a una data di gioco (dagli snapshot)
+        at_frame = ttk.Frame(dialog)
+        at_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(at_frame, text="Saldo alla data di gioco (AAAA-MM-GG):").pack(side='left')
+        date_entry = ttk.Entry(at_frame, width=12)
+        date_entry.insert(0, str(self.game_date))
+        date_entry.pack(side='left', padx=5)
+        result_label = ttk.Label(at_frame, text="")
+
+        def show_balance_at():
+            if not tree.selection():
+                messagebox.showwarning("Avviso", "Seleziona una banca", parent=dialog)
+                return
+            try:
+                day = self.date_to_absolute_day(datetime.strptime(date_entry.get().strip(), "%Y-%m-%d").date())
+            except ValueError:
+                messagebox.showerror("Errore", "Data non valida: usa il formato AAAA-MM-GG", parent=dialog)
+                return
+            try:
+                row = self.get_bank_balance_at(int(tree.selection()[0]), day)
+            except Exception as e:
+                messagebox.showerror("Errore", f"Errore lettura snapshot: {e}", parent=dialog)
+                return
+            if not row:
+                result_label.config(text="Nessuno snapshot registrato entro quella data")
+                return
+            snap_date = self.convert_date_to_ded_format(self.absolute_day_to_date(row['absolute_day']))
+            result_label.config(text=f"{float(row['balance']):.2f} MO (snapshot del {snap_date})")
+
+        ttk.Button(at_frame, text="🔍 Mostra", command=show_balance_at).pack(side='left', padx=5)
+        result_label.pack(side='left', padx=10)
 
         ttk.Button(dialog, text="Chiudi", command=dialog.destroy).pack(pady=6)
     
@@ -10227,77 +11755,6 @@ class DeDToolGUI:
         
         ttk.Button(dialog, text=f"💰 Esegui {title}", command=execute_transaction).pack(pady=20)
 
-    def apply_annual_bank_interest(self):
-        """Applica interessi annuali su tutte le banche con current_balance > 0 (uso tasso annuale)."""
-        try:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT b.id, b.name, b.current_balance, b.annual_interest,
-                       b.pg_id, COALESCE(pc.user_id, b.user_id) AS owner_user_id
-                FROM banks b
-                LEFT JOIN player_characters pc ON b.pg_id = pc.id
-            """)
-            banks = cursor.fetchall() or []
-            if not banks:
-                self.append_time_log("Nessuna banca trovata per il calcolo interessi annuali.")
-                try:
-                    cursor.close()
-                except:
-                    pass
-                return
-
-            self.append_time_log("📅 Fine anno Mystara → Calcolo interessi annuali:")
-            for bank in banks:
-                bank_id = bank.get('id')
-                name = bank.get('name', 'N/A')
-                balance = float(bank.get('current_balance') or 0.0)
-                rate = float(bank.get('annual_interest') or 0.0)
-                if balance <= 0 or rate <= 0:
-                    self.append_time_log(f" - Banca '{name}': saldo {balance:.2f} → nessun interesse (saldo negativo o tasso nullo).")
-                    continue
-                interest = balance * (rate / 100.0)
-                try:
-                    cursor.execute("START TRANSACTION")
-                    cursor.execute(
-                        "UPDATE banks SET current_balance = current_balance + %s WHERE id = %s",
-                        (interest, bank_id)
-                    )
-                    cursor.execute("""
-                        INSERT INTO bank_transactions
-                        (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                    """, (
-                        bank.get('pg_id'),
-                        bank.get('owner_user_id'),
-                        bank_id,
-                        'INTERESSE_ANNUALE',
-                        interest,
-                        f"Interesse annuale {rate:.2f}% su saldo {balance:.2f} MO"
-                    ))
-                    self.db.commit()
-                    new_balance = balance + interest
-                    self.append_time_log(f" - 💰 '{name}': {balance:.2f} → {new_balance:.2f} (interessi {interest:.2f})")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f" - Errore aggiornamento banca '{name}': {e}")
-            try:
-                cursor.close()
-            except:
-                pass
-
-            # ricarica GUI banche se presente
-            try:
-                if hasattr(self, 'tree_banks'):
-                    self.load_banks(self.tree_banks)
-            except Exception as e:
-                self.append_time_log(f"Impossibile ricaricare GUI banche: {e}")
-
-        except Exception as e:
-            self.append_time_log(f"Errore apply_annual_bank_interest: {e}")
-
     def show_bank_items_dialog(self):
         bank_id = None
         pg_id = None
@@ -13023,6 +14480,32 @@ class DeDToolGUI:
         options_box.pack(fill='both', expand=False, padx=10, pady=5)
 
         # --- Funzione per generare opzioni ---
+        generation = {'cancel': None}
+
+        def use_fallback_options(reason):
+            print(f"⚠️ {reason}")
+            messagebox.showinfo("Info", "Generazione AI non disponibile — verranno usate opzioni di esempio.")
+            options_box.delete(0, tk.END)
+
+            fallback_options = [
+                {"option": "Il seguace trova un alleato imprevisto ma deve pagare un tributo.", "extra_months": 1, "extra_cost": 50.0},
+                {"option": "Il seguace affronta un ostacolo naturale e perde tempo prezioso.", "extra_months": 2, "extra_cost": 0.0},
+                {"option": "L’imprevisto si rivela fatale: il compito fallisce.", "extra_months": 0, "extra_cost": 0.0, "fail": True}
+            ]
+
+            for idx, opt in enumerate(fallback_options, 1):
+                display = f"{idx}. {opt['option']} (+{opt.get('extra_months',0)} mesi, +{opt.get('extra_cost',0):.2f} MO)"
+                if opt.get("fail"):
+                    display += " ⚠️ Fallimento"
+                options_box.insert(tk.END, display)
+
+            options_box.ai_options = fallback_options
+
+        def generation_finished(status):
+            generation['cancel'] = None
+            generate_btn.config(state='normal')
+            cancel_btn.config(state='disabled')
+
         def generate_options():
             text = desc.get('1.0', 'end').strip()
             if not text:
@@ -13030,33 +14513,28 @@ class DeDToolGUI:
                 return
 
             options_box.delete(0, tk.END)
+            if not self.get_ai_client():
+                use_fallback_options("LM Studio non disponibile, uso fallback locale.")
+                return
 
-            try:
-                if self.client:
-                    self.generate_ai_options_for_event(text, options_box)
-                else:
-                    raise Exception("LM Studio non disponibile, uso fallback locale.")
-
-            except Exception as e:
-                print(f"⚠️ {e}")
-                messagebox.showinfo("Info", "Generazione AI non disponibile — verranno usate opzioni di esempio.")
-
-                fallback_options = [
-                    {"option": "Il seguace trova un alleato imprevisto ma deve pagare un tributo.", "extra_months": 1, "extra_cost": 50.0},
-                    {"option": "Il seguace affronta un ostacolo naturale e perde tempo prezioso.", "extra_months": 2, "extra_cost": 0.0},
-                    {"option": "L’imprevisto si rivela fatale: il compito fallisce.", "extra_months": 0, "extra_cost": 0.0, "fail": True}
-                ]
+            generate_btn.config(state='disabled')
+            cancel_btn.config(state='normal')
+            generation['cancel'] = self.generate_ai_options_for_event(
+                text, options_box, on_finished=generation_finished
+            )
 
-                for idx, opt in enumerate(fallback_options, 1):
-                    display = f"{idx}. {opt['option']} (+{opt.get('extra_months',0)} mesi, +{opt.get('extra_cost',0):.2f} MO)"
-                    if opt.get("fail"):
-                        display += " ⚠️ Fallimento"
-                    options_box.insert(tk.END, display)
+        def cancel_generation():
+            if generation['cancel']:
+                generation['cancel'].set()
 
-                options_box.ai_options = fallback_options
-
-        # --- Pulsante per generare le opzioni AI ---
-        ttk.Button(dialog, text="✨ Genera Opzioni (AI)", command=generate_options).pack(pady=5)
+        # --- Pulsanti per generare/annullare le opzioni AI ---
+        generate_frame = ttk.Frame(dialog)
+        generate_frame.pack(pady=5)
+        generate_btn = ttk.Button(generate_frame, text="✨ Genera Opzioni (AI)", command=generate_options)
+        generate_btn.pack(side='left', padx=4)
+        cancel_btn = ttk.Button(generate_frame, text="⏹ Annulla Generazione", command=cancel_generation, state='disabled')
+        cancel_btn.pack(side='left', padx=4)
+        dialog.bind("<Destroy>", lambda e: cancel_generation() if e.widget == dialog else None)
 
         # --- Modifica Opzioni ---
         def edit_options():
@@ -13183,8 +14661,15 @@ class DeDToolGUI:
                                 body += "\n"
 
                             body += "\nRispondi a questa email scrivendo solo ad esempio: SCELTA: 2\n\nBuon gioco!"
-                            self.send_email_notification(email, subject, body)
-                            messagebox.showinfo("Successo", f"📧 Email inviata al giocatore {pg_name}")
+                            def on_email_status(msg_id, status, error, pg_name=pg_name):
+                                if status == "failed":
+                                    messagebox.showwarning(
+                                        "Email non inviata",
+                                        f"L'email dell'imprevisto per {pg_name} non e' stata consegnata:\n{error}"
+                                    )
+
+                            if self.send_email_notification(email, subject, body, on_email_status):
+                                messagebox.showinfo("Successo", f"📧 Email al giocatore {pg_name} in coda di invio")
 
                 messagebox.showinfo("Successo", "Imprevisto salvato correttamente.")
                 dialog.destroy()
@@ -13194,23 +14679,8 @@ class DeDToolGUI:
 
         ttk.Button(dialog, text="💾 Salva Imprevisto", command=save_event).pack(pady=10)
 
-    def generate_ai_options_for_event(self, description, listbox):
-        """
-        Genera opzioni AI in formato JSON (option, extra_months, extra_cost, fail)
-        e le popola nella ListBox.
-        """
-        listbox.delete(0, tk.END)
-
-        if not description:
-            messagebox.showwarning("Attenzione", "Inserisci una descrizione dell'imprevisto.")
-            return
-
-        try:
-            # ✅ Usa self.client invece di client
-            if not self.client:
-                raise Exception("Client AI (LM Studio) non inizializzato o non disponibile.")
-
-            prompt = f"""L'imprevisto è: "{description}". Crea 3 opzioni fantasy che il giocatore può scegliere.
+    def _ai_options_prompt(self, description):
+        return f"""L'imprevisto è: "{description}". Crea 3 opzioni fantasy che il giocatore può scegliere.
     Ogni opzione deve contenere:
     - una breve descrizione (campo 'option')
     - un numero di mesi extra (campo 'extra_months')
@@ -13224,40 +14694,228 @@ class DeDToolGUI:
     ]
     """
 
-            # ✅ Richiesta al modello AI
-            response = self.client.chat.completions.create(
-                model="mistral",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=400
-            )
+    def _ai_options_cache_key(self, description):
+        """Chiave della cache: hash di versione prompt, modello e descrizione normalizzata."""
+        normalized = " ".join((description or "").split()).casefold()
+        raw = f"{self.AI_OPTIONS_PROMPT_VERSION}\n{self.AI_OPTIONS_MODEL}\n{normalized}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _get_ai_options_cache(self):
+        cache = getattr(self, '_ai_options_cache', None)
+        if cache is None:
+            cache = {}
+            if os.path.exists(self.AI_OPTIONS_CACHE_FILE):
+                try:
+                    with open(self.AI_OPTIONS_CACHE_FILE, "r", encoding="utf-8") as f:
+                        cache = json.load(f)
+                except Exception as e:
+                    print(f"⚠️ Cache opzioni AI non leggibile: {e}")
+            self._ai_options_cache = cache
+        return cache
 
-            content = response.choices[0].message.content
+    def _store_ai_options_cache(self, key, options):
+        cache = self._get_ai_options_cache()
+        cache[key] = options
+        try:
+            tmp_path = self.AI_OPTIONS_CACHE_FILE + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.AI_OPTIONS_CACHE_FILE)
+        except Exception as e:
+            print(f"⚠️ Salvataggio cache opzioni AI non riuscito: {e}")
+
+    def _parse_streamed_ai_options(self, text):
+        """Oggetti JSON completi {...} gia' arrivati nel testo parziale, in ordine (per lo streaming)."""
+        options = []
+        depth = 0
+        start = None
+        in_string = False
+        escaped = False
+        for i, ch in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                continue
+            if ch == '"':
+                in_string = True
+            elif ch == '{':
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif ch == '}' and depth > 0:
+                depth -= 1
+                if depth == 0 and start is not None:
+                    try:
+                        obj = json.loads(text[start:i + 1])
+                    except json.JSONDecodeError:
+                        obj = None
+                    if isinstance(obj, dict) and "option" in obj:
+                        options.append(obj)
+                    start = None
+        return options
+
+    def _ai_option_display(self, idx, opt):
+        display = f"{idx}. {opt['option']} (+{opt.get('extra_months',0)} mesi, +{float(opt.get('extra_cost',0) or 0):.2f} MO)"
+        if opt.get("fail"):
+            display += " ⚠️ Fallimento"
+        return display
+
+    def get_ai_client(self):
+        """Client LM Studio creato al primo uso (openai si importa solo qui)."""
+        if self.client is None:
+            try:
+                from openai import OpenAI
+                self.client = OpenAI(
+                    base_url="http://localhost:1234/v1",  # porta LM Studio
+                    api_key="lmstudio"
+                )
+            except Exception as e:
+                print(f"❌ Errore inizializzazione client LM Studio: {e}")
+        return self.client
 
-            # 🔹 Rimuove eventuali blocchi markdown come ```json ... ```
-            cleaned = re.sub(r"```(?:json)?(.*?)```", r"\1", content, flags=re.DOTALL).strip()
+    def generate_ai_options_for_event(self, description, listbox, on_finished=None):
+        """
+        Genera opzioni AI in formato JSON (option, extra_months, extra_cost, fail)
+        e le popola nella ListBox.
+        La richiesta a LM Studio gira su un thread separato in streaming: le opzioni compaiono
+        appena complete. Restituisce un threading.Event che annulla la generazione se impostato.
+        Le risposte valide vengono salvate in una cache indicizzata per descrizione e versione prompt.
+        on_finished(status) riceve 'done', 'cached', 'cancelled' o 'error' sul thread Tk.
+        """
+        listbox.delete(0, tk.END)
+        listbox.ai_options = []
+        cancel_event = threading.Event()
 
-            # 🔹 Parsing del JSON
-            data = json.loads(cleaned)
+        def finish(status):
+            if on_finished:
+                try:
+                    on_finished(status)
+                except Exception:
+                    pass
 
-            # 🔹 Validazione struttura
-            if isinstance(data, list) and all("option" in o for o in data):
-                for idx, opt in enumerate(data, 1):
-                    display = f"{idx}. {opt['option']} (+{opt.get('extra_months',0)} mesi, +{opt.get('extra_cost',0):.2f} MO)"
-                    if opt.get("fail"):
-                        display += " ⚠️ Fallimento"
-                    listbox.insert(tk.END, display)
-                listbox.ai_options = data
-            else:
-                messagebox.showwarning("Attenzione", "Formato JSON non valido generato dall'AI.")
-                listbox.ai_options = []
+        if not description:
+            messagebox.showwarning("Attenzione", "Inserisci una descrizione dell'imprevisto.")
+            finish('error')
+            return cancel_event
+
+        cache_key = self._ai_options_cache_key(description)
+        cached = self._get_ai_options_cache().get(cache_key)
+        if cached:
+            for idx, opt in enumerate(cached, 1):
+                listbox.insert(tk.END, self._ai_option_display(idx, opt))
+            listbox.ai_options = [dict(opt) for opt in cached]
+            finish('cached')
+            return cancel_event
+
+        if not self.get_ai_client():
+            messagebox.showerror("Errore generazione AI", "Client AI (LM Studio) non inizializzato o non disponibile.")
+            finish('error')
+            return cancel_event
+
+        events = queue.Queue()
+        prompt = self._ai_options_prompt(description)
+
+        def worker():
+            content = ""
+            stream = None
+            try:
+                # ✅ Richiesta al modello AI in streaming
+                stream = self.client.chat.completions.create(
+                    model=self.AI_OPTIONS_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=400,
+                    stream=True
+                )
+                if cancel_event.is_set():
+                    # Annullato durante l'attesa del primo token: la finestra ha gia' chiuso la generazione
+                    return
+                sent = 0
+                for chunk in stream:
+                    if cancel_event.is_set():
+                        events.put(('cancelled', None))
+                        return
+                    if not chunk.choices:
+                        continue
+                    content += chunk.choices[0].delta.content or ""
+                    partial = self._parse_streamed_ai_options(content)
+                    for opt in partial[sent:]:
+                        events.put(('option', opt))
+                    sent = len(partial)
+                events.put(('done', content))
+            except Exception as e:
+                events.put(('cancelled', None) if cancel_event.is_set() else ('error', str(e)))
+            finally:
+                if stream is not None:
+                    try:
+                        stream.close()
+                    except Exception:
+                        pass
+
+        def poll():
+            try:
+                alive = listbox.winfo_exists()
+            except tk.TclError:
+                alive = False
+            if not alive:
+                cancel_event.set()
+                return
+            while True:
+                if cancel_event.is_set():
+                    # Annullamento immediato anche senza nuovi chunk dal modello: gli eventi
+                    # successivi del worker restano nella coda e vengono ignorati
+                    finish('cancelled')
+                    return
+                try:
+                    kind, payload = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'option':
+                    listbox.ai_options.append(payload)
+                    listbox.insert(tk.END, self._ai_option_display(len(listbox.ai_options), payload))
+                    continue
+                if kind == 'done':
+                    self._complete_ai_options(payload, listbox, cache_key)
+                elif kind == 'error':
+                    messagebox.showerror("Errore generazione AI", payload)
+                finish(kind)
+                return
+            listbox.after(100, poll)
+
+        threading.Thread(target=worker, name="ai-options", daemon=True).start()
+        listbox.after(100, poll)
+        return cancel_event
+
+    def _complete_ai_options(self, content, listbox, cache_key):
+        """Validazione finale della risposta completa: sostituisce le opzioni parziali e aggiorna la cache."""
+        # 🔹 Rimuove eventuali blocchi markdown come ```json ... ```
+        cleaned = re.sub(r"```(?:json)?(.*?)```", r"\1", content, flags=re.DOTALL).strip()
 
+        try:
+            # 🔹 Parsing del JSON
+            data = json.loads(cleaned)
         except json.JSONDecodeError:
+            data = None
+
+        # 🔹 Validazione struttura
+        if isinstance(data, list) and data and all(isinstance(o, dict) and "option" in o for o in data):
+            listbox.delete(0, tk.END)
+            for idx, opt in enumerate(data, 1):
+                listbox.insert(tk.END, self._ai_option_display(idx, opt))
+            listbox.ai_options = data
+            self._store_ai_options_cache(cache_key, data)
+        elif listbox.ai_options:
+            # JSON finale incompleto ma opzioni valide ricevute in streaming: si tengono senza cache
+            messagebox.showwarning("Attenzione", "Risposta AI incompleta: mantenute le opzioni ricevute.")
+        elif data is None:
             messagebox.showerror("Errore", f"Impossibile interpretare il JSON generato dall'AI:\n{content}")
             listbox.ai_options = []
-
-        except Exception as e:
-            messagebox.showerror("Errore generazione AI", str(e))
+        else:
+            messagebox.showwarning("Attenzione", "Formato JSON non valido generato dall'AI.")
             listbox.ai_options = []
 
     def remove_objective_event(self):
@@ -13507,9 +15165,9 @@ class DeDToolGUI:
                     bank_id = bank_combo.bank_data[bank_combo.current()]['id']
                 
                 cursor.execute("""
-                    INSERT INTO economic_activities (pg_id, description, income, frequency, destination_bank_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (pg_id, description, income, frequency, bank_id))
+                    INSERT INTO economic_activities (pg_id, description, income, frequency, destination_bank_id, next_due_day)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pg_id, description, income, frequency, bank_id, self._current_next_due_day(frequency)))
                 self.db.commit()
                 
                 messagebox.showinfo("Successo", "Attività economica aggiunta!")
@@ -13608,9 +15266,11 @@ class DeDToolGUI:
 
                 cursor.execute("""
                     UPDATE economic_activities 
-                    SET description=%s, income=%s, frequency=%s, destination_bank_id=%s
+                    SET next_due_day=IF(frequency=%s AND next_due_day IS NOT NULL, next_due_day, %s),
+                        description=%s, income=%s, frequency=%s, destination_bank_id=%s
                     WHERE id=%s
-                """, (desc.get().strip(), float(inc.get()), freq.get(), selected_bank_id, aid))
+                """, (freq.get(), self._current_next_due_day(freq.get()),
+                      desc.get().strip(), float(inc.get()), freq.get(), selected_bank_id, aid))
                 self.db.commit()
                 messagebox.showinfo("Successo", "Attività aggiornata!")
                 dialog.destroy()
@@ -13868,9 +15528,9 @@ class DeDToolGUI:
                 bank_id = bank_data[bank_combo.current()]['id'] if bank_combo.current() >= 0 and bank_data else None
 
                 cursor.execute("""
-                    INSERT INTO fixed_expenses (pg_id, description, amount, frequency, source_bank_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (pg_id, description, amount, frequency, bank_id))
+                    INSERT INTO fixed_expenses (pg_id, description, amount, frequency, source_bank_id, next_due_day)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pg_id, description, amount, frequency, bank_id, self._current_next_due_day(frequency)))
                 self.db.commit()
 
                 messagebox.showinfo("Successo", "Spesa fissa aggiunta!")
@@ -13997,9 +15657,11 @@ class DeDToolGUI:
 
                 cursor.execute("""
                     UPDATE fixed_expenses
-                    SET description=%s, amount=%s, frequency=%s, pg_id=%s, source_bank_id=%s
+                    SET next_due_day=IF(frequency=%s AND next_due_day IS NOT NULL, next_due_day, %s),
+                        description=%s, amount=%s, frequency=%s, pg_id=%s, source_bank_id=%s
                     WHERE id=%s
-                """, (new_desc, new_amount, new_freq, new_pg_id, new_bank_id, exp['id']))
+                """, (new_freq, self._current_next_due_day(new_freq),
+                      new_desc, new_amount, new_freq, new_pg_id, new_bank_id, exp['id']))
                 self.db.commit()
 
                 messagebox.showinfo("Successo", "Spesa aggiornata con successo.")
@@ -14313,63 +15975,362 @@ class DeDToolGUI:
         ttk.Button(btn_frame, text="💾 Crea Backup", 
                   command=self.create_backup_action, 
                   width=20).pack(pady=10)
+        ttk.Button(btn_frame, text="➕ Backup Incrementale", 
+                  command=self.create_incremental_backup_action, 
+                  width=20).pack(pady=10)
         ttk.Button(btn_frame, text="♻️ Ripristina Backup", 
                   command=self.restore_backup_action, 
                   width=20).pack(pady=10)
     
     def create_backup_action(self):
-        """Crea un backup del database"""
+        """
+        Crea un backup completo del database in una cartella dedicata.
+        Ogni tabella viene letta con cursore lato server (SSDictCursor) e scritta riga per riga
+        in JSON Lines compresso gzip; tabelle diverse vengono salvate in parallelo su connessioni
+        del pool. Il manifest finale riporta righe e checksum SHA-256 di ogni tabella e, per le
+        tabelle DELTA_BACKUP_TABLES, i marcatori usati dai backup incrementali successivi.
+        """
         if not messagebox.askyesno("Conferma", "Creare un backup del database?"):
             return
-        
+        self._run_backup()
+
+    def create_incremental_backup_action(self):
+        """
+        Crea un backup incrementale rispetto all'ultimo backup in 'backups'.
+        Le tabelle DELTA_BACKUP_TABLES salvano solo i blocchi di id nuovi o modificati;
+        le altre tabelle (piccole) vengono salvate per intero.
+        """
+        parent_dir = self._find_latest_backup_dir("backups")
+        parent_manifest = self._read_backup_manifest(parent_dir) if parent_dir else None
+        if not parent_manifest or not all(
+            parent_manifest.get('tables', {}).get(table, {}).get('chunks') is not None
+            for table in self.DELTA_BACKUP_TABLES
+        ):
+            messagebox.showwarning(
+                "Avviso",
+                "Nessun backup di riferimento con marcatori incrementali.\nCreare prima un backup completo."
+            )
+            return
+        if not messagebox.askyesno(
+            "Conferma",
+            f"Creare un backup incrementale rispetto a '{os.path.basename(parent_dir)}'?"
+        ):
+            return
+        self._run_backup(parent_dir, parent_manifest)
+
+    def _run_backup(self, parent_dir=None, parent_manifest=None):
+        """Esegue un backup completo (parent_dir None) o incrementale rispetto a parent_dir."""
         try:
-            backup_dir = "backups"
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            suffix = "_delta" if parent_dir else ""
+            backup_dir = os.path.join("backups", f"backup_{timestamp}{suffix}")
+            os.makedirs(backup_dir, exist_ok=True)
             
+            started = datetime.now()
             tables = self.get_backup_table_names()
             
-            cursor = self.db.cursor()
-            
-            for table in tables:
-                cursor.execute(f"SELECT * FROM {table}")
-                data = cursor.fetchall()
-                
-                # Conversione sicura per JSON
-                converted_data = []
-                for row in data:
-                    converted_row = {}
-                    for k, v in row.items():
-                        if isinstance(v, Decimal):
-                            converted_row[k] = float(v)
-                        elif isinstance(v, (date, datetime)):
-                            converted_row[k] = v.isoformat()
-                        elif isinstance(v, bytes):
-                            try:
-                                converted_row[k] = v.decode("utf-8")
-                            except:
-                                converted_row[k] = v.hex()
-                        else:
-                            converted_row[k] = v
-                    converted_data.append(converted_row)
-                
-                filename = os.path.join(backup_dir, f"{table}_backup_{timestamp}.json")
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(converted_data, f, ensure_ascii=False, indent=4)
+            # Marcatori letti prima del dump: righe scritte nel frattempo ricadono nel delta successivo
+            markers = {
+                table: self._backup_table_markers(table)
+                for table in self.DELTA_BACKUP_TABLES if table in tables
+            }
+            filters = {}
+            replace_chunks = {}
+            if parent_manifest:
+                for table, marker in markers.items():
+                    parent_chunks = parent_manifest['tables'][table]['chunks']
+                    changed = sorted(
+                        int(chunk) for chunk in set(marker['chunks']) | set(parent_chunks)
+                        if marker['chunks'].get(chunk) != parent_chunks.get(chunk)
+                    )
+                    replace_chunks[table] = changed
+                    filters[table] = self._chunk_ranges_filter(changed, marker['chunk_size'])
+            
+            manifest_tables = self._dump_backup_tables(tables, backup_dir, filters)
+            for table, marker in markers.items():
+                manifest_tables[table].update(marker)
+                if table in replace_chunks:
+                    manifest_tables[table]['mode'] = "chunks"
+                    manifest_tables[table]['replace_chunks'] = replace_chunks[table]
+            
+            manifest = {
+                "format": "jsonl.gz",
+                "format_version": self.BACKUP_FORMAT_VERSION,
+                "app_version": __VERSION__,
+                "created_at": datetime.now().isoformat(),
+                "backup_type": "delta" if parent_dir else "full",
+                "parent": os.path.basename(parent_dir) if parent_dir else None,
+                "tables": {table: manifest_tables[table] for table in tables},
+            }
+            self._write_backup_manifest(backup_dir, manifest)
             
-            messagebox.showinfo("Successo", f"Backup creato nella cartella '{backup_dir}'")
+            total_rows = sum(info['rows'] for info in manifest_tables.values())
+            elapsed = (datetime.now() - started).total_seconds()
+            messagebox.showinfo(
+                "Successo",
+                f"Backup {'incrementale ' if parent_dir else ''}creato nella cartella '{backup_dir}'\n"
+                f"Tabelle: {len(tables)} - Righe: {total_rows} - Tempo: {elapsed:.1f}s"
+            )
             
         except Exception as e:
             messagebox.showerror("Errore", f"Errore durante il backup: {e}")
+
+    def _backup_table_markers(self, table):
+        """
+        Marcatori di modifica di una tabella con chiave id: id massimo (high-water) e, per ogni
+        blocco di DELTA_CHUNK_SIZE id, numero di righe e checksum CRC32 calcolati sul server.
+        Un blocco con marcatore diverso dal backup precedente contiene righe nuove, modificate o cancellate.
+        """
+        conn, cursor = self.safe_cursor()
+        try:
+            cursor.execute(f"SHOW COLUMNS FROM {table}")
+            columns = [row['Field'] for row in cursor.fetchall()]
+            row_expr = "CONCAT_WS('#', {}, {})".format(
+                ", ".join(f"`{col}`" for col in columns),
+                ", ".join(f"ISNULL(`{col}`)" for col in columns)
+            )
+            cursor.execute(f"""
+                SELECT FLOOR(id / %s) AS chunk, COUNT(*) AS row_count, BIT_XOR(CRC32({row_expr})) AS crc
+                FROM {table}
+                GROUP BY chunk
+            """, (self.DELTA_CHUNK_SIZE,))
+            chunks = {
+                str(int(row['chunk'])): f"{row['row_count']}:{row['crc']}"
+                for row in cursor.fetchall()
+            }
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) AS max_id FROM {table}")
+            high_water = int(cursor.fetchone()['max_id'] or 0)
+        finally:
+            self.close_connection(conn, cursor)
+        return {"key": "id", "high_water": high_water, "chunk_size": self.DELTA_CHUNK_SIZE, "chunks": chunks}
+
+    def _chunk_ranges_filter(self, chunks, chunk_size):
+        """Condizione WHERE sugli intervalli di id dei blocchi (blocchi consecutivi uniti in un solo intervallo)."""
+        if not chunks:
+            return " WHERE 1 = 0", ()
+        ranges = []
+        for chunk in chunks:
+            if ranges and ranges[-1][1] == chunk:
+                ranges[-1][1] = chunk + 1
+            else:
+                ranges.append([chunk, chunk + 1])
+        where_sql = " WHERE " + " OR ".join("(id >= %s AND id < %s)" for _ in ranges)
+        params = tuple(value for start, end in ranges for value in (start * chunk_size, end * chunk_size))
+        return where_sql, params
+
+    def _read_backup_manifest(self, backup_dir):
+        manifest_path = os.path.join(backup_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _find_latest_backup_dir(self, root_dir):
+        """Cartella backup piu' recente con manifest (i backup incompleti non hanno manifest)."""
+        if not os.path.isdir(root_dir):
+            return None
+        candidates = [
+            entry.path for entry in os.scandir(root_dir)
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "manifest.json"))
+        ]
+        return max(candidates, key=lambda path: os.path.getmtime(os.path.join(path, "manifest.json")), default=None)
+
+    def _backup_json_value(self, v):
+        """Conversione sicura per JSON dei valori letti dal DB."""
+        if isinstance(v, Decimal):
+            return float(v)
+        if isinstance(v, (date, datetime)):
+            return v.isoformat()
+        if isinstance(v, timedelta):
+            return str(v)
+        if isinstance(v, bytes):
+            try:
+                return v.decode("utf-8")
+            except UnicodeDecodeError:
+                return v.hex()
+        return v
+
+    def _dump_backup_tables(self, tables, backup_dir, filters=None):
+        """
+        Salva le tabelle in parallelo (una connessione del pool per worker). Restituisce le voci del manifest.
+        filters[table] = (where_sql, params) limita le righe salvate (backup incrementale).
+        """
+        filters = filters or {}
+        if not self._pool_initialized:
+            self.init_connection_pool()
+        workers = self.BACKUP_PARALLEL_WORKERS if getattr(self, 'connection_pool', None) else 1
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                table: executor.submit(self._dump_backup_table, table, backup_dir, *filters.get(table, ("", ())))
+                for table in tables
+            }
+            for table, future in futures.items():
+                results[table] = future.result()
+        return results
+
+    def _dump_backup_table(self, table, backup_dir, where_sql="", params=()):
+        """Scrive una tabella in {table}.jsonl.gz in streaming; restituisce righe, checksum e colonne."""
+        filename = f"{table}.jsonl.gz"
+        digest = hashlib.sha256()
+        rows = 0
+        columns = []
+        conn = self.get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+        try:
+            cursor.execute(f"SELECT * FROM {table}{where_sql}", params)
+            columns = [col[0] for col in cursor.description or []]
+            with gzip.open(os.path.join(backup_dir, filename), 'wt', encoding='utf-8', newline='\n') as f:
+                for row in cursor:
+                    line = json.dumps(
+                        {k: self._backup_json_value(v) for k, v in row.items()},
+                        ensure_ascii=False, separators=(',', ':')
+                    ) + "\n"
+                    f.write(line)
+                    digest.update(line.encode('utf-8'))
+                    rows += 1
+        finally:
+            self.close_connection(conn, cursor)
+        return {"file": filename, "rows": rows, "sha256": digest.hexdigest(), "columns": columns}
+
+    def _iter_backup_rows(self, path, digest=None):
+        """
+        Righe di un file di backup: JSON Lines gzip (formato attuale) o lista JSON (backup precedenti).
+        Se digest e' passato viene aggiornato con le righe lette, per il confronto con il manifest.
+        """
+        if path.endswith(".jsonl.gz"):
+            with gzip.open(path, 'rt', encoding='utf-8', newline='\n') as f:
+                for line in f:
+                    if digest is not None:
+                        digest.update(line.encode('utf-8'))
+                    if line.strip():
+                        yield json.loads(line)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+
+    def _write_backup_manifest(self, backup_dir, manifest):
+        """Scrive manifest.json per ultimo: una cartella senza manifest e' un backup incompleto."""
+        path = os.path.join(backup_dir, "manifest.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
     
-    def restore_backup_action(self):
-        """Ripristina un backup"""
-        messagebox.showinfo("In Sviluppo", 
-                          "Funzionalità ripristino backup in fase di implementazione GUI.\n"
-                          "Utilizzare lo script Python originale per il restore.")
-    
+    def _group_rows_by(self, rows, key):
+        """Raggruppa le righe in un dict chiave -> lista, mantenendo l'ordine di lettura."""
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row.get(key), []).append(row)
+        return grouped
+
+    def build_status_model(self, cursor):
+        """
+        Modello dello Stato Campagna condiviso da show_status ed export_status_to_txt.
+        Ogni tabella viene letta con una sola query per tutti i PG visibili e poi raggruppata
+        una volta in indici dict -> lista (per pg_id, follower_id, objective_id, id banca):
+        la visualizzazione per PG legge dagli indici invece di ripercorrere tutte le righe.
+        """
+        if self.current_user and self.current_user['role'] == 'GIOCATORE':
+            cursor.execute("""
+                SELECT pc.id, pc.name, pc.user_id, pc.pf_attuali, pc.pf_massimi, u.username
+                FROM player_characters pc
+                LEFT JOIN users u ON pc.user_id = u.id
+                WHERE pc.user_id = %s
+            """, (self.current_user['id'],))
+        else:
+            cursor.execute("""
+                SELECT pc.id, pc.name, pc.user_id, pc.pf_attuali, pc.pf_massimi, u.username
+                FROM player_characters pc
+                LEFT JOIN users u ON pc.user_id = u.id
+            """)
+        model = {'pgs': cursor.fetchall() or []}
+        if not model['pgs']:
+            return model
+
+        pg_ids = [pg['id'] for pg in model['pgs']]
+        placeholders = ",".join(["%s"] * len(pg_ids))
+
+        cursor.execute(f"SELECT * FROM banks WHERE pg_id IN ({placeholders})", pg_ids)
+        all_banks = cursor.fetchall() or []
+        model['banks_by_pg'] = self._group_rows_by(all_banks, 'pg_id')
+        model['bank_names'] = {bank['id']: bank['name'] for bank in all_banks}
+
+        cursor.execute(f"SELECT * FROM followers WHERE pg_id IN ({placeholders})", pg_ids)
+        model['followers_by_pg'] = self._group_rows_by(cursor.fetchall() or [], 'pg_id')
+
+        cursor.execute(f"SELECT * FROM economic_activities WHERE pg_id IN ({placeholders})", pg_ids)
+        model['activities_by_pg'] = self._group_rows_by(cursor.fetchall() or [], 'pg_id')
+
+        cursor.execute(f"SELECT * FROM fixed_expenses WHERE pg_id IN ({placeholders})", pg_ids)
+        model['expenses_by_pg'] = self._group_rows_by(cursor.fetchall() or [], 'pg_id')
+
+        cursor.execute(f"SELECT * FROM bank_items WHERE pg_id IN ({placeholders})", pg_ids)
+        model['bank_items_by_pg'] = self._group_rows_by(cursor.fetchall() or [], 'pg_id')
+
+        cursor.execute("""
+            SELECT fo.*, b.name AS bank_name, f.pg_id
+            FROM follower_objectives fo
+            LEFT JOIN followers f ON fo.follower_id = f.id
+            LEFT JOIN banks b ON fo.bank_id = b.id
+            WHERE f.pg_id IN ({})
+        """.format(placeholders), pg_ids)
+        all_objectives = cursor.fetchall() or []
+        model['objectives_by_follower'] = self._group_rows_by(all_objectives, 'follower_id')
+
+        objective_ids = [obj['id'] for obj in all_objectives]
+        all_events = []
+        if objective_ids:
+            obj_placeholders = ",".join(["%s"] * len(objective_ids))
+            cursor.execute(f"""
+                SELECT *
+                FROM follower_objective_events
+                WHERE objective_id IN ({obj_placeholders})
+                ORDER BY event_date DESC, id DESC
+            """, objective_ids)
+            all_events = cursor.fetchall() or []
+        model['events_by_objective'] = self._group_rows_by(all_events, 'objective_id')
+
+        # Tabelle della Scheda Personaggio: se mancano lo stato si mostra comunque
+        optional_queries = (
+            ('status_effects_by_pg', f"""
+                SELECT *
+                FROM pc_status_effects
+                WHERE pg_id IN ({placeholders}) AND is_active = 1
+                ORDER BY pg_id, end_absolute_day, effect_name
+            """),
+            ('open_journal_by_pg', f"""
+                SELECT *
+                FROM pc_journal_entries
+                WHERE pg_id IN ({placeholders})
+                  AND entry_type IN ('MISSIONE','INDIZIO','OGGETTO_MISSIONE')
+                  AND COALESCE(status, 'APERTO') IN ('APERTO','IN_CORSO')
+                ORDER BY pg_id, updated_at DESC
+            """),
+            ('properties_by_pg', f"""
+                SELECT *
+                FROM pc_possedimenti
+                WHERE pg_id IN ({placeholders})
+                ORDER BY pg_id, tipo, possedimento
+            """),
+            ('rule_overrides_by_pg', f"""
+                SELECT *
+                FROM pc_rule_overrides
+                WHERE pg_id IN ({placeholders}) AND is_active = 1
+                ORDER BY pg_id, override_scope, field_name
+            """),
+        )
+        for model_key, query in optional_queries:
+            try:
+                cursor.execute(query, pg_ids)
+                rows = cursor.fetchall() or []
+            except Exception:
+                rows = []
+            model[model_key] = self._group_rows_by(rows, 'pg_id')
+
+        return model
+
     def show_status(self):
         """Mostra lo stato della campagna come nel vecchio sistema"""
         self.clear_content()
@@ -14417,21 +16378,9 @@ class DeDToolGUI:
             ttk.Label(date_frame, text=self.convert_date_to_ded_format(self.game_date),
                      font=('Arial', 12, 'bold')).pack()
 
-            # 1. PGs e utente associato
-            if self.current_user and self.current_user['role'] == 'GIOCATORE':
-                cursor.execute("""
-                    SELECT pc.id, pc.name, pc.user_id, pc.pf_attuali, pc.pf_massimi, u.username
-                    FROM player_characters pc
-                    LEFT JOIN users u ON pc.user_id = u.id
-                    WHERE pc.user_id = %s
-                """, (self.current_user['id'],))
-            else:
-                cursor.execute("""
-                    SELECT pc.id, pc.name, pc.user_id, pc.pf_attuali, pc.pf_massimi, u.username
-                    FROM player_characters pc
-                    LEFT JOIN users u ON pc.user_id = u.id
-                """)
-            all_pgs = cursor.fetchall()
+            # 1. PGs e dati collegati, raggruppati una volta per chiave
+            model = self.build_status_model(cursor)
+            all_pgs = model['pgs']
             num_pgs = len(all_pgs)
 
             if not all_pgs:
@@ -14442,93 +16391,6 @@ class DeDToolGUI:
 
             pgs_to_display = all_pgs
 
-            # Recupera tutte le altre tabelle
-            pg_ids = [pg['id'] for pg in pgs_to_display]
-            placeholders = ",".join(["%s"] * len(pg_ids))
-
-            cursor.execute(f"SELECT * FROM banks WHERE pg_id IN ({placeholders})", pg_ids)
-            all_banks = cursor.fetchall()
-
-            cursor.execute(f"SELECT * FROM followers WHERE pg_id IN ({placeholders})", pg_ids)
-            all_followers = cursor.fetchall()
-
-            cursor.execute(f"SELECT * FROM economic_activities WHERE pg_id IN ({placeholders})", pg_ids)
-            all_activities = cursor.fetchall()
-
-            cursor.execute(f"SELECT * FROM fixed_expenses WHERE pg_id IN ({placeholders})", pg_ids)
-            all_expenses = cursor.fetchall()
-
-            cursor.execute(f"SELECT * FROM bank_items WHERE pg_id IN ({placeholders})", pg_ids)
-            all_bank_items = cursor.fetchall()
-
-            cursor.execute("""
-                SELECT fo.*, b.name AS bank_name, f.pg_id
-                FROM follower_objectives fo
-                LEFT JOIN followers f ON fo.follower_id = f.id
-                LEFT JOIN banks b ON fo.bank_id = b.id
-                WHERE f.pg_id IN ({})
-            """.format(placeholders), pg_ids)
-            all_objectives = cursor.fetchall()
-
-            objective_ids = [obj['id'] for obj in all_objectives]
-            if objective_ids:
-                obj_placeholders = ",".join(["%s"] * len(objective_ids))
-                cursor.execute(f"""
-                    SELECT *
-                    FROM follower_objective_events
-                    WHERE objective_id IN ({obj_placeholders})
-                    ORDER BY event_date DESC, id DESC
-                """, objective_ids)
-                all_events = cursor.fetchall()
-            else:
-                all_events = []
-
-            try:
-                cursor.execute(f"""
-                    SELECT *
-                    FROM pc_status_effects
-                    WHERE pg_id IN ({placeholders}) AND is_active = 1
-                    ORDER BY pg_id, end_absolute_day, effect_name
-                """, pg_ids)
-                all_status_effects = cursor.fetchall()
-            except Exception:
-                all_status_effects = []
-
-            try:
-                cursor.execute(f"""
-                    SELECT *
-                    FROM pc_journal_entries
-                    WHERE pg_id IN ({placeholders})
-                      AND entry_type IN ('MISSIONE','INDIZIO','OGGETTO_MISSIONE')
-                      AND COALESCE(status, 'APERTO') IN ('APERTO','IN_CORSO')
-                    ORDER BY pg_id, updated_at DESC
-                """, pg_ids)
-                all_open_journal = cursor.fetchall()
-            except Exception:
-                all_open_journal = []
-
-            try:
-                cursor.execute(f"""
-                    SELECT *
-                    FROM pc_possedimenti
-                    WHERE pg_id IN ({placeholders})
-                    ORDER BY pg_id, tipo, possedimento
-                """, pg_ids)
-                all_properties = cursor.fetchall()
-            except Exception:
-                all_properties = []
-
-            try:
-                cursor.execute(f"""
-                    SELECT *
-                    FROM pc_rule_overrides
-                    WHERE pg_id IN ({placeholders}) AND is_active = 1
-                    ORDER BY pg_id, override_scope, field_name
-                """, pg_ids)
-                all_rule_overrides = cursor.fetchall()
-            except Exception:
-                all_rule_overrides = []
-
             # Info generale
             general_frame = ttk.LabelFrame(scrollable_frame, text="📈 Informazioni Generali", padding=10)
             general_frame.pack(fill='x', padx=10, pady=5)
@@ -14542,7 +16404,7 @@ class DeDToolGUI:
                 pg_frame.pack(fill='x', padx=10, pady=5)
 
                 # Fondi
-                pg_banks = [b for b in all_banks if b['pg_id'] == pg['id']]
+                pg_banks = model['banks_by_pg'].get(pg['id'], [])
                 total_funds = sum(float(b['current_balance']) for b in pg_banks)
                 
                 funds_label = ttk.Label(pg_frame, text=f"💰 Fondi totali: {total_funds:.2f} MO (suddivisi in {len(pg_banks)} conti)")
@@ -14554,7 +16416,7 @@ class DeDToolGUI:
                 else:
                     ttk.Label(pg_frame, text="   Nessun conto bancario.").pack(anchor='w')
 
-                pg_bank_items = [item for item in all_bank_items if item['pg_id'] == pg['id']]
+                pg_bank_items = model['bank_items_by_pg'].get(pg['id'], [])
                 items_label = ttk.Label(pg_frame, text=f"📦 Oggetti in banca ({len(pg_bank_items)})")
                 items_label.pack(anchor='w', pady=(10, 0))
                 if pg_bank_items:
@@ -14571,7 +16433,7 @@ class DeDToolGUI:
                     ttk.Label(pg_frame, text="   Nessun oggetto in banca.").pack(anchor='w')
 
                 # Seguaci e obiettivi
-                pg_followers = [f for f in all_followers if f['pg_id'] == pg['id']]
+                pg_followers = model['followers_by_pg'].get(pg['id'], [])
                 followers_label = ttk.Label(pg_frame, text=f"🛡️ Seguaci totali: {len(pg_followers)}")
                 followers_label.pack(anchor='w', pady=(10, 0))
                 
@@ -14580,7 +16442,7 @@ class DeDToolGUI:
                         ttk.Label(pg_frame, text=f"   • {follower['name']} ({follower['description']})", 
                                  font=('Arial', 9, 'bold')).pack(anchor='w')
                         
-                        follower_objectives = [obj for obj in all_objectives if obj['follower_id'] == follower['id']]
+                        follower_objectives = model['objectives_by_follower'].get(follower['id'], [])
                         if follower_objectives:
                             ttk.Label(pg_frame, text="     Obiettivi:").pack(anchor='w')
                             for obj in follower_objectives:
@@ -14590,7 +16452,7 @@ class DeDToolGUI:
                                           f"Progresso: {float(obj['progress_percentage']):.1f}%, "
                                           f"Costo: {float(obj['total_cost']):.2f} MO (Banca: {bank_name})")
                                 ttk.Label(pg_frame, text=obj_text, font=('Arial', 8)).pack(anchor='w')
-                                objective_events = [event for event in all_events if event['objective_id'] == obj['id']]
+                                objective_events = model['events_by_objective'].get(obj['id'], [])
                                 if objective_events:
                                     ttk.Label(pg_frame, text=f"         Imprevisti: {len(objective_events)}").pack(anchor='w')
                                     for event in objective_events:
@@ -14606,7 +16468,7 @@ class DeDToolGUI:
                 else:
                     ttk.Label(pg_frame, text="   Nessun seguace.").pack(anchor='w')
 
-                pg_effects = [e for e in all_status_effects if e['pg_id'] == pg['id']]
+                pg_effects = model['status_effects_by_pg'].get(pg['id'], [])
                 if pg_effects:
                     ttk.Label(pg_frame, text=f"Stati attivi: {len(pg_effects)}", font=('Arial', 9, 'bold')).pack(anchor='w', pady=(10, 0))
                     for effect in pg_effects:
@@ -14620,13 +16482,13 @@ class DeDToolGUI:
                 if low_hp:
                     ttk.Label(pg_frame, text=f"Avviso PF bassi: {pg.get('pf_attuali')}/{pg.get('pf_massimi')}", foreground='darkred').pack(anchor='w')
 
-                pg_journal = [j for j in all_open_journal if j['pg_id'] == pg['id']]
+                pg_journal = model['open_journal_by_pg'].get(pg['id'], [])
                 if pg_journal:
                     ttk.Label(pg_frame, text=f"Missioni/indizi aperti: {len(pg_journal)}", font=('Arial', 9, 'bold')).pack(anchor='w', pady=(10, 0))
                     for entry in pg_journal[:5]:
                         ttk.Label(pg_frame, text=f"   - {entry.get('entry_type')}: {entry.get('title')} [{entry.get('status') or 'APERTO'}]", font=('Arial', 8)).pack(anchor='w')
 
-                pg_properties = [p for p in all_properties if p['pg_id'] == pg['id']]
+                pg_properties = model['properties_by_pg'].get(pg['id'], [])
                 if pg_properties:
                     ttk.Label(pg_frame, text=f"Possedimenti logistici: {len(pg_properties)}", font=('Arial', 9, 'bold')).pack(anchor='w', pady=(10, 0))
                     for prop in pg_properties[:5]:
@@ -14638,12 +16500,12 @@ class DeDToolGUI:
                         suffix = f" ({', '.join(money_bits)})" if money_bits else ""
                         ttk.Label(pg_frame, text=f"   - {prop.get('possedimento')} - {prop.get('stato') or 'stato n/d'}{suffix}", font=('Arial', 8)).pack(anchor='w')
 
-                pg_overrides = [o for o in all_rule_overrides if o['pg_id'] == pg['id']]
+                pg_overrides = model['rule_overrides_by_pg'].get(pg['id'], [])
                 if pg_overrides:
                     ttk.Label(pg_frame, text=f"Override DM attivi: {len(pg_overrides)}", foreground='darkorange').pack(anchor='w', pady=(10, 0))
 
                 # Attività Economiche
-                pg_activities = [a for a in all_activities if a['pg_id'] == pg['id']]
+                pg_activities = model['activities_by_pg'].get(pg['id'], [])
                 activities_label = ttk.Label(pg_frame, text=f"⚒️ Attività Economiche ({len(pg_activities)} attive)")
                 activities_label.pack(anchor='w', pady=(10, 0))
                 
@@ -14653,21 +16515,20 @@ class DeDToolGUI:
                         if not bank_id:
                             ttk.Label(pg_frame, text=f"   ⚠️ Attività '{activity.get('description', 'Sconosciuta')}' senza banca associata.").pack(anchor='w')
                             continue
-                        bank = next((b for b in all_banks if b['id'] == bank_id), None)
-                        bank_name = bank['name'] if bank else 'N/A'
+                        bank_name = model['bank_names'].get(bank_id, 'N/A')
                         activity_text = f"   • {activity['description']} → {float(activity['income']):.2f} MO ({activity['frequency']}) → Banca: {bank_name}"
                         ttk.Label(pg_frame, text=activity_text).pack(anchor='w')
                 else:
                     ttk.Label(pg_frame, text="   Nessuna attività economica.").pack(anchor='w')
 
                 # Spese Fisse
-                pg_expenses = [e for e in all_expenses if e['pg_id'] == pg['id']]
+                pg_expenses = model['expenses_by_pg'].get(pg['id'], [])
                 expenses_label = ttk.Label(pg_frame, text=f"💰 Spese Fisse ({len(pg_expenses)} attive)")
                 expenses_label.pack(anchor='w', pady=(10, 0))
                 
                 if pg_expenses:
                     for expense in pg_expenses:
-                        bank_name = next((b['name'] for b in all_banks if b['id'] == expense['source_bank_id']), 'N/A')
+                        bank_name = model['bank_names'].get(expense['source_bank_id'], 'N/A')
                         expense_text = f"   • '{expense['description']}' (-{float(expense['amount']):.2f} MO {expense['frequency']}, da: {bank_name})"
                         ttk.Label(pg_frame, text=expense_text).pack(anchor='w')
                 else:
@@ -14708,21 +16569,9 @@ class DeDToolGUI:
                 f.write(f"📅 Data di Gioco: {self.convert_date_to_ded_format(self.game_date)}\n")
                 f.write(f"Data esportazione: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
                 
-                # PGs e utente associato
-                if self.current_user and self.current_user['role'] == 'GIOCATORE':
-                    cursor.execute("""
-                        SELECT pc.id, pc.name, pc.user_id, u.username
-                        FROM player_characters pc
-                        LEFT JOIN users u ON pc.user_id = u.id
-                        WHERE pc.user_id = %s
-                    """, (self.current_user['id'],))
-                else:
-                    cursor.execute("""
-                        SELECT pc.id, pc.name, pc.user_id, u.username
-                        FROM player_characters pc
-                        LEFT JOIN users u ON pc.user_id = u.id
-                    """)
-                all_pgs = cursor.fetchall()
+                # PGs e dati collegati, raggruppati una volta per chiave
+                model = self.build_status_model(cursor)
+                all_pgs = model['pgs']
                 num_pgs = len(all_pgs)
                 
                 if not all_pgs:
@@ -14733,47 +16582,6 @@ class DeDToolGUI:
                 
                 pgs_to_display = all_pgs
                 
-                # Recupera tutte le altre tabelle
-                pg_ids = [pg['id'] for pg in pgs_to_display]
-                placeholders = ",".join(["%s"] * len(pg_ids))
-
-                cursor.execute(f"SELECT * FROM banks WHERE pg_id IN ({placeholders})", pg_ids)
-                all_banks = cursor.fetchall()
-                
-                cursor.execute(f"SELECT * FROM followers WHERE pg_id IN ({placeholders})", pg_ids)
-                all_followers = cursor.fetchall()
-                
-                cursor.execute(f"SELECT * FROM economic_activities WHERE pg_id IN ({placeholders})", pg_ids)
-                all_activities = cursor.fetchall()
-                
-                cursor.execute(f"SELECT * FROM fixed_expenses WHERE pg_id IN ({placeholders})", pg_ids)
-                all_expenses = cursor.fetchall()
-
-                cursor.execute(f"SELECT * FROM bank_items WHERE pg_id IN ({placeholders})", pg_ids)
-                all_bank_items = cursor.fetchall()
-                
-                cursor.execute("""
-                    SELECT fo.*, b.name AS bank_name, f.pg_id
-                    FROM follower_objectives fo
-                    LEFT JOIN followers f ON fo.follower_id = f.id
-                    LEFT JOIN banks b ON fo.bank_id = b.id
-                    WHERE f.pg_id IN ({})
-                """.format(placeholders), pg_ids)
-                all_objectives = cursor.fetchall()
-
-                objective_ids = [obj['id'] for obj in all_objectives]
-                if objective_ids:
-                    obj_placeholders = ",".join(["%s"] * len(objective_ids))
-                    cursor.execute(f"""
-                        SELECT *
-                        FROM follower_objective_events
-                        WHERE objective_id IN ({obj_placeholders})
-                        ORDER BY event_date DESC, id DESC
-                    """, objective_ids)
-                    all_events = cursor.fetchall()
-                else:
-                    all_events = []
-                
                 # Info generale
                 f.write("-" * 80 + "\n")
                 f.write("📈 INFORMAZIONI GENERALI\n")
@@ -14787,7 +16595,7 @@ class DeDToolGUI:
                     f.write("=" * 80 + "\n\n")
                     
                     # Fondi
-                    pg_banks = [b for b in all_banks if b['pg_id'] == pg['id']]
+                    pg_banks = model['banks_by_pg'].get(pg['id'], [])
                     total_funds = sum(float(b['current_balance']) for b in pg_banks)
                     
                     f.write(f"💰 FONDI TOTALI: {total_funds:.2f} MO (suddivisi in {len(pg_banks)} conti)\n")
@@ -14798,7 +16606,7 @@ class DeDToolGUI:
                         f.write("   Nessun conto bancario.\n")
                     f.write("\n")
 
-                    pg_bank_items = [item for item in all_bank_items if item['pg_id'] == pg['id']]
+                    pg_bank_items = model['bank_items_by_pg'].get(pg['id'], [])
                     f.write(f"📦 OGGETTI IN BANCA ({len(pg_bank_items)})\n")
                     if pg_bank_items:
                         for item in pg_bank_items:
@@ -14814,14 +16622,14 @@ class DeDToolGUI:
                     f.write("\n")
                     
                     # Seguaci e obiettivi
-                    pg_followers = [f for f in all_followers if f['pg_id'] == pg['id']]
+                    pg_followers = model['followers_by_pg'].get(pg['id'], [])
                     f.write(f"🛡️ SEGUACI TOTALI: {len(pg_followers)}\n")
                     
                     if pg_followers:
                         for follower in pg_followers:
                             f.write(f"   • {follower['name']} ({follower['description']})\n")
                             
-                            follower_objectives = [obj for obj in all_objectives if obj['follower_id'] == follower['id']]
+                            follower_objectives = model['objectives_by_follower'].get(follower['id'], [])
                             if follower_objectives:
                                 f.write("     Obiettivi:\n")
                                 for obj in follower_objectives:
@@ -14830,7 +16638,7 @@ class DeDToolGUI:
                                     f.write(f"       - '{obj['name']}': Stato: {status_name}, "
                                            f"Progresso: {float(obj['progress_percentage']):.1f}%, "
                                            f"Costo: {float(obj['total_cost']):.2f} MO (Banca: {bank_name})\n")
-                                    objective_events = [event for event in all_events if event['objective_id'] == obj['id']]
+                                    objective_events = model['events_by_objective'].get(obj['id'], [])
                                     if objective_events:
                                         f.write(f"         Imprevisti: {len(objective_events)}\n")
                                         for event in objective_events:
@@ -14847,7 +16655,7 @@ class DeDToolGUI:
                     f.write("\n")
                     
                     # Attività Economiche
-                    pg_activities = [a for a in all_activities if a['pg_id'] == pg['id']]
+                    pg_activities = model['activities_by_pg'].get(pg['id'], [])
                     f.write(f"⚒️ ATTIVITÀ ECONOMICHE ({len(pg_activities)} attive)\n")
                     
                     if pg_activities:
@@ -14856,8 +16664,7 @@ class DeDToolGUI:
                             if not bank_id:
                                 f.write(f"   ⚠️ Attività '{activity.get('description', 'Sconosciuta')}' senza banca associata.\n")
                                 continue
-                            bank = next((b for b in all_banks if b['id'] == bank_id), None)
-                            bank_name = bank['name'] if bank else 'N/A'
+                            bank_name = model['bank_names'].get(bank_id, 'N/A')
                             f.write(f"   • {activity['description']} → {float(activity['income']):.2f} MO "
                                    f"({activity['frequency']}) → Banca: {bank_name}\n")
                     else:
@@ -14865,12 +16672,12 @@ class DeDToolGUI:
                     f.write("\n")
                     
                     # Spese Fisse
-                    pg_expenses = [e for e in all_expenses if e['pg_id'] == pg['id']]
+                    pg_expenses = model['expenses_by_pg'].get(pg['id'], [])
                     f.write(f"💰 SPESE FISSE ({len(pg_expenses)} attive)\n")
                     
                     if pg_expenses:
                         for expense in pg_expenses:
-                            bank_name = next((b['name'] for b in all_banks if b['id'] == expense['source_bank_id']), 'N/A')
+                            bank_name = model['bank_names'].get(expense['source_bank_id'], 'N/A')
                             f.write(f"   • '{expense['description']}' (-{float(expense['amount']):.2f} MO "
                                    f"{expense['frequency']}, da: {bank_name})\n")
                     else:
@@ -14909,7 +16716,15 @@ class DeDToolGUI:
         ]
 
     def restore_backup_action(self):
-        """Ripristina un backup JSON creato dal menu Backup."""
+        """
+        Ripristina un backup creato dal menu Backup.
+        Se la cartella scelta e' un backup incrementale viene ricostruita la catena
+        backup completo + incrementali fino a quello scelto.
+        Le righe vengono caricate a blocchi in tabelle di appoggio ({tabella}__restore) e solo
+        a caricamento completo e verificato sostituiscono i dati reali in un'unica transazione.
+        Il giornale restore_journal.json nella cartella del backup registra tabelle e blocchi
+        completati: un ripristino interrotto puo' riprendere da li'.
+        """
         if not messagebox.askyesno(
             "Conferma ripristino",
             "Il ripristino sostituisce i dati delle tabelle trovate nel backup selezionato.\n\n"
@@ -14919,35 +16734,66 @@ class DeDToolGUI:
         backup_dir = filedialog.askdirectory(title="Seleziona cartella backup")
         if not backup_dir:
             return
+        try:
+            backup_chain = self._index_backup_chain(backup_dir)
+        except Exception as e:
+            messagebox.showerror("Errore", f"Backup non leggibile: {e}")
+            return
+        tables = [
+            table for table in self.get_backup_table_names()
+            if any(table in backup_index for backup_index in backup_chain)
+        ]
+        if not tables:
+            messagebox.showwarning("Avviso", "Nessun file di backup trovato nella cartella selezionata.")
+            return
+
+        journal_path = os.path.join(backup_dir, "restore_journal.json")
+        journal = None
+        if os.path.exists(journal_path):
+            try:
+                with open(journal_path, "r", encoding="utf-8") as f:
+                    journal = json.load(f)
+            except Exception:
+                journal = None
+            if journal and not messagebox.askyesno(
+                "Ripristino interrotto",
+                "Questo backup ha un ripristino interrotto.\n\n"
+                "Riprendere dall'ultima tabella e dall'ultimo blocco completati?\n"
+                "(No = ricomincia da capo)"
+            ):
+                journal = None
+        if journal is None:
+            journal = {"started_at": datetime.now().isoformat(), "phase": "staging", "tables": {}}
+            self._write_restore_journal(journal_path, journal)
+
         cursor = None
         try:
             cursor = self.db.cursor()
             cursor.execute("SET FOREIGN_KEY_CHECKS=0")
-            restored = []
-            for table in reversed(self.get_backup_table_names()):
-                files = [
-                    os.path.join(backup_dir, name)
-                    for name in os.listdir(backup_dir)
-                    if name.startswith(f"{table}_backup_") and name.endswith(".json")
-                ]
-                if not files:
-                    continue
-                latest_file = max(files, key=os.path.getmtime)
-                with open(latest_file, "r", encoding="utf-8") as f:
-                    rows = json.load(f)
+            for table in tables:
+                entries = [backup_index[table] for backup_index in backup_chain if table in backup_index]
+                self._stage_backup_table(cursor, table, entries, journal, journal_path)
+
+            # Sostituzione atomica: tutte le tabelle o nessuna
+            cursor.execute("START TRANSACTION")
+            for table in tables:
                 cursor.execute(f"DELETE FROM {table}")
-                if rows:
-                    columns = list(rows[0].keys())
-                    column_clause = ", ".join(f"`{col}`" for col in columns)
-                    value_clause = ", ".join([f"%({col})s" for col in columns])
-                    cursor.executemany(
-                        f"INSERT INTO {table} ({column_clause}) VALUES ({value_clause})",
-                        rows
-                    )
-                restored.append(table)
-            cursor.execute("SET FOREIGN_KEY_CHECKS=1")
+                cursor.execute(f"INSERT INTO {table} SELECT * FROM {table}{self.RESTORE_STAGING_SUFFIX}")
             self.db.commit()
-            messagebox.showinfo("Successo", f"Ripristino completato.\nTabelle ripristinate: {len(restored)}")
+            journal['phase'] = "swapped"
+            self._write_restore_journal(journal_path, journal)
+
+            for table in tables:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}{self.RESTORE_STAGING_SUFFIX}")
+            cursor.execute("SET FOREIGN_KEY_CHECKS=1")
+            os.remove(journal_path)
+            self.invalidate_rule_cache()
+            restored_rows = sum(journal['tables'][table].get('rows_total', 0) for table in tables)
+            chain_info = f"\nBackup applicati: {len(backup_chain)}" if len(backup_chain) > 1 else ""
+            messagebox.showinfo(
+                "Successo",
+                f"Ripristino completato.\nTabelle ripristinate: {len(tables)} - Righe: {restored_rows}{chain_info}"
+            )
         except Exception as e:
             try:
                 self.db.rollback()
@@ -14955,24 +16801,171 @@ class DeDToolGUI:
                     cursor.execute("SET FOREIGN_KEY_CHECKS=1")
             except Exception:
                 pass
-            messagebox.showerror("Errore", f"Errore durante il ripristino: {e}")
+            messagebox.showerror(
+                "Errore",
+                f"Errore durante il ripristino: {e}\n\n"
+                "I dati attuali non sono stati sostituiti. Rieseguendo il ripristino dalla stessa "
+                "cartella si puo' riprendere dal punto raggiunto."
+            )
         finally:
             if cursor:
                 cursor.close()
 
-    def get_current_absolute_day(self):
-        try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT absolute_day FROM game_state ORDER BY id LIMIT 1")
-            row = cursor.fetchone()
-            cursor.close()
-            return int(row.get('absolute_day') or 0) if row else 0
-        except Exception:
-            return 0
-
-    def get_active_status_effects(self, pg_id, include_hidden=False):
-        """Restituisce gli effetti attivi del PG, filtrando quelli nascosti per i giocatori."""
-        try:
+    def _index_backup_chain(self, backup_dir):
+        """
+        Indici della catena di backup da applicare in ordine: backup completo, poi gli incrementali
+        fino a backup_dir (seguendo il campo 'parent' dei manifest, cartelle sorelle).
+        """
+        chain = [self._index_backup_dir(backup_dir)]
+        manifest = self._read_backup_manifest(backup_dir)
+        current_dir = backup_dir
+        while manifest and manifest.get('backup_type') == "delta":
+            parent_dir = os.path.join(os.path.dirname(os.path.normpath(current_dir)), manifest['parent'])
+            manifest = self._read_backup_manifest(parent_dir)
+            if manifest is None:
+                raise FileNotFoundError(f"backup di riferimento '{parent_dir}' mancante o incompleto")
+            chain.insert(0, self._index_backup_dir(parent_dir))
+            current_dir = parent_dir
+        return chain
+
+    def _index_backup_dir(self, backup_dir):
+        """
+        Indicizza una sola volta i file della cartella backup: {tabella: {path, rows, sha256, columns, ...}}.
+        Usa manifest.json se presente, altrimenti il file {tabella}_backup_*.json piu' recente.
+        """
+        manifest = self._read_backup_manifest(backup_dir)
+        if manifest is not None:
+            return {
+                table: {
+                    'path': os.path.join(backup_dir, info['file']),
+                    'rows': info.get('rows'),
+                    'sha256': info.get('sha256'),
+                    'columns': info.get('columns') or [],
+                    'mode': info.get('mode', "full"),
+                    'chunk_size': info.get('chunk_size'),
+                    'replace_chunks': info.get('replace_chunks') or [],
+                }
+                for table, info in manifest.get('tables', {}).items()
+            }
+
+        index = {}
+        for entry in os.scandir(backup_dir):
+            if not entry.is_file() or not entry.name.endswith(".json") or "_backup_" not in entry.name:
+                continue
+            table = entry.name.split("_backup_", 1)[0]
+            mtime = entry.stat().st_mtime
+            if table not in index or mtime > index[table]['mtime']:
+                index[table] = {
+                    'path': entry.path, 'rows': None, 'sha256': None, 'columns': [],
+                    'mode': "full", 'mtime': mtime,
+                }
+        return index
+
+    def _write_restore_journal(self, journal_path, journal):
+        tmp_path = journal_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(journal, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, journal_path)
+
+    def _stage_backup_table(self, cursor, table, entries, journal, journal_path):
+        """
+        Carica nella tabella di appoggio i file della catena (entries: completo, poi incrementali)
+        a blocchi di RESTORE_BATCH_SIZE righe, aggiornando il giornale dopo ogni blocco.
+        Un file incrementale prima cancella i blocchi di id da sostituire, poi inserisce le righe.
+        Verifica righe e checksum del manifest.
+        """
+        staging = f"{table}{self.RESTORE_STAGING_SUFFIX}"
+        state = journal['tables'].get(table) or {}
+        if state.get('status') == "staged":
+            return
+        step = int(state.get('step') or 0) if state.get('status') == "loading" else 0
+        rows_done = int(state.get('rows_done') or 0) if state.get('status') == "loading" else 0
+        if step or rows_done:
+            cursor.execute("SHOW TABLES LIKE %s", (staging,))
+            if not cursor.fetchone():
+                step, rows_done = 0, 0
+
+        if step == 0 and rows_done == 0:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(f"CREATE TABLE {staging} LIKE {table}")
+        rows_total = int(state.get('rows_total') or 0) if (step or rows_done) else 0
+        journal['tables'][table] = {"status": "loading", "step": step, "rows_done": rows_done, "rows_total": rows_total}
+        self._write_restore_journal(journal_path, journal)
+
+        cursor.execute(f"SHOW COLUMNS FROM {staging}")
+        staging_columns = {row['Field'] for row in cursor.fetchall()}
+
+        for step_index in range(step, len(entries)):
+            entry = entries[step_index]
+            if step_index != step:
+                journal['tables'][table].update({"step": step_index, "rows_done": 0})
+                self._write_restore_journal(journal_path, journal)
+                rows_done = 0
+
+            if step_index > 0 and rows_done == 0:
+                # Le cancellazioni si ripetono senza danni se il passo viene ripreso prima del primo blocco
+                if entry.get('mode') == "chunks":
+                    where_sql, params = self._chunk_ranges_filter(entry['replace_chunks'], entry['chunk_size'])
+                    if entry['replace_chunks']:
+                        cursor.execute(f"DELETE FROM {staging}{where_sql}", params)
+                else:
+                    cursor.execute(f"DELETE FROM {staging}")
+
+            self._load_backup_file(cursor, table, staging, staging_columns, entry, rows_done, journal, journal_path)
+
+        journal['tables'][table]['status'] = "staged"
+        self._write_restore_journal(journal_path, journal)
+
+    def _load_backup_file(self, cursor, table, staging, staging_columns, entry, rows_done, journal, journal_path):
+        """Inserisce le righe di un file di backup nella tabella di appoggio saltando le prime rows_done."""
+        digest = hashlib.sha256() if entry.get('sha256') else None
+        columns = [col for col in entry.get('columns') or [] if col in staging_columns]
+        insert_sql = None
+        batch = []
+        position = 0
+
+        def flush():
+            cursor.executemany(insert_sql, batch)
+            journal['tables'][table]['rows_done'] += len(batch)
+            journal['tables'][table]['rows_total'] += len(batch)
+            self._write_restore_journal(journal_path, journal)
+            batch.clear()
+
+        for row in self._iter_backup_rows(entry['path'], digest):
+            position += 1
+            if position <= rows_done:
+                continue
+            if insert_sql is None:
+                if not columns:
+                    columns = [col for col in row.keys() if col in staging_columns]
+                insert_sql = (
+                    f"INSERT INTO {staging} ({', '.join(f'`{col}`' for col in columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(columns))})"
+                )
+            batch.append(tuple(row.get(col) for col in columns))
+            if len(batch) >= self.RESTORE_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+
+        if entry.get('rows') is not None and position != entry['rows']:
+            raise ValueError(f"{table}: righe nel file {position}, attese dal manifest {entry['rows']}")
+        if digest is not None and digest.hexdigest() != entry['sha256']:
+            raise ValueError(f"{table}: checksum del file diverso da quello del manifest")
+
+    def get_current_absolute_day(self):
+        try:
+            cursor = self.db.cursor()
+            cursor.execute("SELECT absolute_day FROM game_state ORDER BY id LIMIT 1")
+            row = cursor.fetchone()
+            cursor.close()
+            return int(row.get('absolute_day') or 0) if row else 0
+        except Exception:
+            return 0
+
+    def get_active_status_effects(self, pg_id, include_hidden=False):
+        """Restituisce gli effetti attivi del PG, filtrando quelli nascosti per i giocatori."""
+        try:
             cursor = self.db.cursor()
             query = """
                 SELECT *
@@ -14990,6 +16983,22 @@ class DeDToolGUI:
         except Exception:
             return []
 
+    def expire_status_effects(self, cursor, absolute_day):
+        """
+        Disattiva in un solo UPDATE gli effetti attivi che terminano entro absolute_day
+        (usa l'indice (is_active, end_absolute_day)); gli effetti senza fine restano attivi.
+        Non esegue commit: fa parte della transazione dell'avanzamento del tempo.
+        Restituisce il numero di effetti disattivati.
+        """
+        cursor.execute("""
+            UPDATE pc_status_effects
+            SET is_active = 0
+            WHERE is_active = 1
+              AND end_absolute_day IS NOT NULL
+              AND end_absolute_day <= %s
+        """, (absolute_day,))
+        return cursor.rowcount
+
     def calculate_follower_limits(self, pg_id):
         try:
             cursor = self.db.cursor()
@@ -15411,6 +17420,7 @@ class DeDToolGUI:
 
         # Imposta data manualmente
         ttk.Button(time_frame, text="📅 Imposta Data Manualmente", command=self.set_date_manually_dialog).pack(pady=6)
+        ttk.Button(time_frame, text="🔮 Anteprima Avanzamento", command=self.time_advance_preview_dialog).pack(pady=(0, 6))
 
         # Frame eventi / azioni (solo DM)
         if self.current_user and self.current_user.get('role') == 'DM':
@@ -15434,6 +17444,8 @@ class DeDToolGUI:
         self.time_log_text.configure(yscrollcommand=log_scroll.set)
         self.time_log_text.pack(side='left', fill='both', expand=True)
         log_scroll.pack(side='right', fill='y')
+        # Mostra le ultime righe già registrate; le nuove arrivano a blocchi dal buffer
+        self.time_log.attach(self.time_log_text)
 
         # Lista imprevisti pendenti
         right_frame = ttk.LabelFrame(main_frame, text="Imprevisti in Sospeso", padding=6)
@@ -15476,596 +17488,800 @@ class DeDToolGUI:
             return
         self.advance_months(months)
 
-    def _check_year_change(self, old_date, new_date):
+    def time_advance_preview_dialog(self):
+        """Chiede un numero di giorni e mostra l'anteprima dell'avanzamento (solo DM)."""
+        if not self.current_user or self.current_user.get('role') != 'DM':
+            messagebox.showwarning("Avviso", "Solo un DM può consultare l'anteprima del tempo.")
+            return
+        days = simpledialog.askinteger(
+            "Anteprima Avanzamento",
+            "Giorni da simulare (es. 336 = 1 anno):",
+            parent=self.root, minvalue=1, maxvalue=self.DAYS_PER_YEAR * 50
+        )
+        if days:
+            self.show_time_advance_preview(days, on_confirm=lambda: self.advance_days(days))
+
+    def show_time_advance_preview(self, days, on_confirm=None):
         """
-        Controlla il cambio di ANNO Mystara (non l'anno gregoriano).
-        Se l'anno Mystara cambia chiama apply_annual_bank_interest().
-        Usa il calcolo anno coerente con absolute_day ed EPOCH_DATE.
+        Mostra l'anteprima di un avanzamento di N giorni (project_time_advance):
+        saldi per banca con curva giornaliera, primo giorno di saldo insufficiente
+        e obiettivi che si completano. Con on_confirm il pulsante Avanza esegue
+        l'avanzamento reale; chiudendo la finestra non viene scritto nulla.
         """
         try:
-            # validazione input
-            if not old_date or not new_date:
-                return
-
-            # normalizza date
-            if isinstance(old_date, datetime):
-                old_date = old_date.date()
-            if isinstance(new_date, datetime):
-                new_date = new_date.date()
+            projection = self.project_time_advance(days)
+        except Exception as e:
+            messagebox.showerror("Errore", f"Errore anteprima avanzamento: {e}")
+            return
 
-            # calcolo anni Mystara in modo coerente
-            old_abs = self.date_to_absolute_day(old_date)
-            new_abs = self.date_to_absolute_day(new_date)
+        fmt_day = lambda abs_day: self.convert_date_to_ded_format(self.absolute_day_to_date(abs_day)) if abs_day is not None else '-'
+        start_abs = projection['start_abs_day']
 
-            base_year = getattr(self, "EPOCH_DATE", date(1, 1, 1)).year
-            old_y = base_year + (old_abs // self.DAYS_PER_YEAR)
-            new_y = base_year + (new_abs // self.DAYS_PER_YEAR)
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Anteprima Avanzamento Tempo")
+        dialog.geometry("900x650")
 
-            # confronto
-            if new_y != old_y:
-                self.append_time_log(
-                    f"🔄 Cambio anno Mystara rilevato: {old_y} → {new_y}"
-                )
-                try:
-                    self.apply_annual_bank_interest()
-                except Exception as e:
-                    self.append_time_log(
-                        f"Errore apply_annual_bank_interest: {e}"
-                    )
+        ttk.Label(
+            dialog,
+            text=f"Simulazione di {days} giorni: {fmt_day(start_abs)} → {fmt_day(projection['end_abs_day'])} "
+                 f"({projection['movements']} movimenti previsti, nessuna modifica salvata)",
+            font=('Arial', 10, 'bold')
+        ).pack(pady=6, padx=10, anchor='w')
+
+        banks_frame = ttk.LabelFrame(dialog, text="Banche", padding=6)
+        banks_frame.pack(fill='both', expand=True, padx=10, pady=4)
+        columns = ('name', 'start', 'end', 'min', 'min_day', 'insufficient')
+        bank_tree = ttk.Treeview(banks_frame, columns=columns, show='headings', height=8)
+        for col, heading, width in (
+            ('name', 'Banca', 180), ('start', 'Saldo Attuale', 110), ('end', 'Saldo Finale', 110),
+            ('min', 'Saldo Minimo', 110), ('min_day', 'Giorno Minimo', 140), ('insufficient', 'Primo Saldo Insufficiente', 170),
+        ):
+            bank_tree.heading(col, text=heading)
+            bank_tree.column(col, width=width, anchor='w' if col == 'name' else 'e')
+        bank_tree.tag_configure('insufficient', foreground='red')
+        bank_scroll = ttk.Scrollbar(banks_frame, orient='vertical', command=bank_tree.yview)
+        bank_tree.configure(yscrollcommand=bank_scroll.set)
+        bank_tree.pack(side='left', fill='both', expand=True)
+        bank_scroll.pack(side='right', fill='y')
+
+        for bank in sorted(projection['banks'].values(), key=lambda b: str(b['name'])):
+            insufficient_day = bank['first_insufficient_day']
+            bank_tree.insert('', 'end', iid=str(bank['id']), values=(
+                bank['name'],
+                f"{bank['start_balance']:.2f}",
+                f"{bank['end_balance']:.2f}",
+                f"{bank['min_balance']:.2f}",
+                fmt_day(bank['min_day']),
+                fmt_day(insufficient_day),
+            ), tags=('insufficient',) if insufficient_day is not None else ())
+
+        chart_frame = ttk.LabelFrame(dialog, text="Andamento saldo (banca selezionata)", padding=6)
+        chart_frame.pack(fill='x', padx=10, pady=4)
+        canvas = tk.Canvas(chart_frame, height=160, background='white')
+        canvas.pack(fill='x', expand=True)
+
+        def draw_curve(event=None):
+            canvas.delete('all')
+            selection = bank_tree.selection()
+            if not selection:
+                canvas.create_text(10, 10, anchor='nw', text="Seleziona una banca per vedere la curva dei saldi.")
+                return
+            bank = projection['banks'][int(selection[0])]
+            curve = [bank['start_balance']] + projection['curves'][bank['id']]
+            width = max(canvas.winfo_width(), 200)
+            height = int(canvas['height'])
+            pad = 20
+            low, high = min(min(curve), 0.0), max(max(curve), 0.0)
+            span = (high - low) or 1.0
+            to_y = lambda value: height - pad - (value - low) / span * (height - 2 * pad)
+            # Un punto per pixel: le curve lunghe vengono campionate sulla larghezza del grafico
+            step = max(1, len(curve) // (width - 2 * pad))
+            points = []
+            for index in range(0, len(curve), step):
+                points.extend((pad + index * (width - 2 * pad) / max(len(curve) - 1, 1), to_y(curve[index])))
+            canvas.create_line(pad, to_y(0.0), width - pad, to_y(0.0), fill='grey', dash=(2, 2))
+            if len(points) >= 4:
+                canvas.create_line(*points, fill='navy')
+            if bank['first_insufficient_day'] is not None:
+                x = pad + (bank['first_insufficient_day'] - start_abs) * (width - 2 * pad) / max(len(curve) - 1, 1)
+                canvas.create_line(x, pad, x, height - pad, fill='red')
+            canvas.create_text(pad, 4, anchor='nw', text=f"max {high:.2f} MO")
+            canvas.create_text(pad, height - 4, anchor='sw', text=f"min {low:.2f} MO")
+
+        bank_tree.bind('<<TreeviewSelect>>', draw_curve)
+        canvas.bind('<Configure>', draw_curve)
+
+        objectives_frame = ttk.LabelFrame(dialog, text="Obiettivi completati nell'intervallo", padding=6)
+        objectives_frame.pack(fill='x', padx=10, pady=4)
+        objectives_tree = ttk.Treeview(objectives_frame, columns=('name', 'day'), show='headings', height=5)
+        objectives_tree.heading('name', text='Obiettivo')
+        objectives_tree.heading('day', text='Completamento')
+        objectives_tree.column('name', width=400)
+        objectives_tree.column('day', width=200)
+        objectives_tree.pack(fill='x')
+        for day, obj_id, name in projection['objective_completions']:
+            objectives_tree.insert('', 'end', values=(name, fmt_day(day)))
 
-        except Exception as e:
-            self.append_time_log(f"Errore _check_year_change: {e}")
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(pady=8)
+        if on_confirm:
+            def confirm():
+                dialog.destroy()
+                on_confirm()
+            ttk.Button(btn_frame, text=f"⏩ Avanza di {days} giorni", command=confirm).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Chiudi", command=dialog.destroy).pack(side='left', padx=5)
 
-    def advance_days(self, days=1):
+    def advance_days(self, days=1, label=None):
         """
         Avanza il tempo di N giorni secondo Mystara (mantiene game_date come date).
-        Aggiorna game_state (game_date + absolute_day) via _update_game_state_date.
-        Applica gli eventi giornalieri e gli imprevisti ogni giorno.
+        Il lavoro gira su un thread con una connessione propria del pool: carica una sola
+        volta attività, spese, obiettivi e saldi, simula l'intervallo in memoria giorno per
+        giorno e scrive il risultato in un'unica transazione (movimenti in blocco + game_state).
+        La finestra di avanzamento mostra giorno, data Mystara e denaro movimentato; Annulla
+        ferma la simulazione alla fine del giorno in corso e registra solo i giorni completati,
+        così game_state resta coerente con movimenti e saldi.
         """
         try:
-            for i in range(days):
-                # salva data precedente coerente come date
-                old_date = self.game_date
-                if isinstance(old_date, datetime):
-                    old_date = old_date.date()
-
-                # incrementa di un giorno (mantieni self.game_date come date)
-                if isinstance(self.game_date, datetime):
-                    self.game_date = (self.game_date + timedelta(days=1)).date()
-                elif isinstance(self.game_date, date):
-                    self.game_date = self.game_date + timedelta(days=1)
-                else:
-                    self.game_date = datetime.strptime(str(self.game_date), "%Y-%m-%d").date() + timedelta(days=1)
-
-                # AGGIORNAMENTO CRITICO: Salva immediatamente nel database
-                self._update_game_state_date(self.game_date)
+            days = int(days)
+            if days <= 0:
+                return
+            if self._time_advance is not None:
+                messagebox.showwarning("Avviso", "Un avanzamento del tempo è già in corso.")
+                return
 
-                # controllo cambio anno Mystara (usa absolute_day -> anno Mystara)
-                try:
-                    self._check_year_change(old_date, self.game_date)
-                except Exception as e:
-                    self.append_time_log(f"Errore controllo cambio anno: {e}")
+            old_date = self.game_date
+            if isinstance(old_date, datetime):
+                old_date = old_date.date()
+            elif not isinstance(old_date, date):
+                old_date = datetime.strptime(str(old_date), "%Y-%m-%d").date()
 
-                self.append_time_log(f"Data avanzata a {self.convert_date_to_ded_format(self.game_date)} (giorno {i+1}/{days})")
+            start_abs = self.date_to_absolute_day(old_date)
+        except Exception as e:
+            messagebox.showerror("Errore", f"Errore avanzamento giorni: {e}")
+            self.append_time_log(f"Errore avanzamento giorni: {e}")
+            return
 
-                # Applica eventi giornalieri
-                try:
-                    self._apply_daily_events()
-                except Exception as e:
-                    self.append_time_log(f"Errore applicazione eventi giornalieri: {e}")
+        progress = queue.Queue()
+        cancel = threading.Event()
 
-            # Applica imprevisti SOLO UNA VOLTA alla fine di tutti i giorni
+        def worker():
+            conn = cursor = None
             try:
-                self.apply_unhandled_objective_events()
-            except Exception as e:
-                self.append_time_log(f"Errore apply_unhandled_objective_events dopo daily: {e}")
+                conn = self._open_time_advance_connection()
+                cursor = conn.cursor()
+                progress.put(('phase', "Caricamento di saldi, attività, spese e obiettivi..."))
+                state = self._load_time_advance_state(cursor, start_abs + days)
 
-            # Aggiorna grafica (data nel menu principale, ecc.)
-            if hasattr(self, 'date_label'):
-                try:
-                    self.date_label.config(text=self.convert_date_to_ded_format(self.game_date))
-                except:
-                    pass
+                moved = {'amount': 0.0, 'rows': 0}
 
-            # ricarica tab obiettivi se presente
-            try:
-                if hasattr(self, 'objectives_tree') and hasattr(self, 'load_objectives_list'):
-                    self.load_objectives_list(self.objectives_tree)
-            except Exception as e:
-                self.append_time_log(f"Impossibile aggiornare lista obiettivi GUI: {e}")
+                def on_day(abs_day, banks, ledger):
+                    for row in ledger[moved['rows']:]:
+                        moved['amount'] += abs(row[4] or 0.0)
+                    moved['rows'] = len(ledger)
+                    progress.put(('day', abs_day - start_abs, abs_day, moved['amount']))
 
-            # aggiorna lista imprevisti
-            try:
-                self.load_pending_events()
+                result = self._simulate_time_advance(
+                    state, start_abs, days, on_day=on_day, should_stop=cancel.is_set
+                )
+                progress.put(('phase', "Scrittura sul database..."))
+                self._write_time_advance_result(cursor, result, conn)
+                progress.put(('done', result, None))
             except Exception as e:
-                self.append_time_log(f"Errore aggiornamento imprevisti GUI: {e}")
+                progress.put(('done', None, e))
+            finally:
+                self.close_connection(conn, cursor)
+
+        self._time_advance = {
+            'days': days,
+            'label': label or f"{days} giorni",
+            'start_abs': start_abs,
+            'progress': progress,
+            'cancel': cancel,
+            'dialog': self._open_time_advance_dialog(days, cancel),
+        }
+        threading.Thread(target=worker, name="time-advance", daemon=True).start()
+        self.root.after(self.TIME_ADVANCE_POLL_MS, self._poll_time_advance)
 
-            messagebox.showinfo("Successo", f"Avanzati {days} giorni. Data: {self.convert_date_to_ded_format(self.game_date)}")
+    def _open_time_advance_connection(self):
+        """Connessione dedicata al thread dell'avanzamento: dal pool o, senza pool, una nuova."""
+        if not self._pool_initialized:
+            self.init_connection_pool(fallback=False)
+        conn = self.get_db_connection()
+        if conn is self.db:
+            # La connessione principale resta al thread Tk: non va condivisa tra thread
+            conn = self._open_database_connection()
+        return conn
+
+    def _open_time_advance_dialog(self, days, cancel):
+        """Finestra di avanzamento (modale) con barra, giorno, data, denaro movimentato e Annulla."""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Avanzamento Tempo")
+        dialog.geometry("420x200")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+
+        phase_var = tk.StringVar(value="Avvio...")
+        day_var = tk.StringVar(value=f"Giorno 0 di {days}")
+        date_var = tk.StringVar(value=f"Data: {self.convert_date_to_ded_format(self.game_date)}")
+        money_var = tk.StringVar(value="Denaro movimentato: 0.00 MO")
+
+        ttk.Label(dialog, textvariable=phase_var, font=('Arial', 10, 'bold')).pack(pady=(12, 4))
+        bar = ttk.Progressbar(dialog, maximum=days, length=360, mode='determinate')
+        bar.pack(pady=4)
+        ttk.Label(dialog, textvariable=day_var).pack()
+        ttk.Label(dialog, textvariable=date_var).pack()
+        ttk.Label(dialog, textvariable=money_var).pack()
+
+        def request_cancel():
+            cancel.set()
+            cancel_button.configure(state='disabled', text="Annullamento a fine giornata...")
+
+        cancel_button = ttk.Button(dialog, text="Annulla", command=request_cancel)
+        cancel_button.pack(pady=10)
+        dialog.protocol("WM_DELETE_WINDOW", request_cancel)
+        dialog.grab_set()
 
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore avanzamento giorni: {e}")
-            self.append_time_log(f"Errore avanzamento giorni: {e}")
+        dialog.progress_widgets = {
+            'phase': phase_var, 'day': day_var, 'date': date_var, 'money': money_var,
+            'bar': bar, 'cancel': cancel_button,
+        }
+        return dialog
 
-    def advance_weeks(self, weeks=1):
-        """Avanza settimane Mystara (7 giorni ogni settimana)."""
+    def _poll_time_advance(self):
+        """Legge i progressi del thread di avanzamento (sul thread Tk) e aggiorna la finestra."""
+        advance = self._time_advance
+        if advance is None:
+            return
+        widgets = advance['dialog'].progress_widgets
+        phase = None
+        latest_day = None
+        done = None
+        while True:
+            try:
+                message = advance['progress'].get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == 'phase':
+                phase = message[1]
+            elif message[0] == 'day':
+                phase = "Simulazione in corso..."
+                latest_day = message
+            elif message[0] == 'done':
+                done = message
+
+        if phase:
+            widgets['phase'].set(phase)
+        if latest_day:
+            # Solo l'ultimo giorno ricevuto: la finestra si aggiorna al ritmo del timer
+            _kind, day_index, abs_day, moved = latest_day
+            widgets['bar'].configure(value=day_index)
+            widgets['day'].set(f"Giorno {day_index} di {advance['days']}")
+            widgets['date'].set(f"Data: {self.convert_date_to_ded_format(self.absolute_day_to_date(abs_day))}")
+            widgets['money'].set(f"Denaro movimentato: {moved:.2f} MO")
+
+        if done:
+            self._finish_time_advance(done[1], done[2])
+        else:
+            self.root.after(self.TIME_ADVANCE_POLL_MS, self._poll_time_advance)
+
+    def _finish_time_advance(self, result, error):
+        """Chiude la finestra di avanzamento e aggiorna data, imprevisti e GUI (sul thread Tk)."""
+        advance, self._time_advance = self._time_advance, None
         try:
-            for w in range(weeks):
-                self.append_time_log(f"📅 Settimana {w+1}/{weeks} — avanzamento 7 giorni")
+            advance['dialog'].grab_release()
+            advance['dialog'].destroy()
+        except tk.TclError:
+            pass
 
-                # Avanza 7 giorni in una volta sola
-                self.advance_days(7)
+        if error is not None:
+            messagebox.showerror("Errore", f"Errore avanzamento giorni: {error}")
+            self.append_time_log(f"Errore avanzamento giorni: {error}")
+            return
 
-                # EVENTI SETTIMANALI
-                try:
-                    self._apply_weekly_events()
-                except Exception as e:
-                    self.append_time_log(f"Errore eventi settimanali: {e}")
+        self.game_date = self.absolute_day_to_date(result['end_abs_day'])
+        days_done = result['end_abs_day'] - advance['start_abs']
 
-            # Aggiorna GUI
-            if hasattr(self, "date_label"):
-                self.date_label.config(text=self.convert_date_to_ded_format(self.game_date))
+        # Applica imprevisti SOLO UNA VOLTA alla fine di tutti i giorni
+        try:
+            self.apply_unhandled_objective_events()
+        except Exception as e:
+            self.append_time_log(f"Errore apply_unhandled_objective_events dopo daily: {e}")
 
-            messagebox.showinfo(
-                "Successo",
-                f"Avanzate {weeks} settimane. Data: {self.convert_date_to_ded_format(self.game_date)}"
-            )
+        # Aggiorna grafica (data nel menu principale, ecc.)
+        if hasattr(self, 'date_label'):
+            try:
+                self.date_label.config(text=self.convert_date_to_ded_format(self.game_date))
+            except:
+                pass
 
+        # ricarica tab obiettivi se presente
+        try:
+            if hasattr(self, 'objectives_tree') and hasattr(self, 'load_objectives_list'):
+                self.load_objectives_list(self.objectives_tree)
         except Exception as e:
-            messagebox.showerror("Errore", f"Errore avanzamento settimane: {e}")
-            self.append_time_log(f"Errore advance_weeks: {e}")
+            self.append_time_log(f"Impossibile aggiornare lista obiettivi GUI: {e}")
 
-    def advance_months(self, months=1):
-        """Avanza mesi Mystara, 28 giorni ciascuno."""
+        # aggiorna lista imprevisti
         try:
-            total_days = months * self.DAYS_PER_MONTH
-            self.append_time_log(f"📆 Avanzamento Mystara: {months} mese/i → {total_days} giorni")
-
-            # Avanza tutti i giorni in una volta
-            self.advance_days(total_days)
-
-            for month_index in range(months):
-                self.append_time_log(f"→ Applico eventi mensili Mystara ({month_index + 1}/{months})")
-                try:
-                    self._apply_monthly_events()
-                except Exception as e:
-                    self.append_time_log(f"Errore eventi mensili mese {month_index + 1}: {e}")
+            self.load_pending_events()
+        except Exception as e:
+            self.append_time_log(f"Errore aggiornamento imprevisti GUI: {e}")
 
+        current = self.convert_date_to_ded_format(self.game_date)
+        if days_done < advance['days']:
             messagebox.showinfo(
-                "Successo",
-                f"Avanzati {months} mesi Mystara. Data: {self.convert_date_to_ded_format(self.game_date)}"
+                "Avanzamento annullato",
+                f"Avanzamento interrotto dopo {days_done} giorni su {advance['days']}.\n"
+                f"I giorni completati sono stati registrati. Data: {current}"
             )
+        else:
+            messagebox.showinfo("Successo", f"Avanzamento di {advance['label']} completato. Data: {current}")
 
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore avanzamento mesi: {e}")
-            self.append_time_log(f"Errore advance_months: {e}")
+    def _load_time_advance_state(self, cursor, end_abs_day):
+        """
+        Legge in un colpo solo lo stato necessario al motore del tempo:
+        banche con saldo e tasso, attività e spese giornaliere, attività e spese
+        settimanali/mensili in scadenza entro end_abs_day, obiettivi in corso.
+        """
+        cursor.execute("""
+            SELECT b.id, b.name, b.current_balance, b.annual_interest,
+                   b.pg_id, COALESCE(pc.user_id, b.user_id) AS owner_user_id
+            FROM banks b
+            LEFT JOIN player_characters pc ON b.pg_id = pc.id
+        """)
+        banks = {}
+        for row in cursor.fetchall() or []:
+            banks[row['id']] = {
+                'id': row['id'],
+                'name': row.get('name', 'N/A'),
+                'balance': float(row.get('current_balance') or 0.0),
+                'rate': float(row.get('annual_interest') or 0.0),
+                'pg_id': row.get('pg_id'),
+                'owner_user_id': row.get('owner_user_id'),
+            }
 
-    def _apply_daily_events(self):
-        """Applica eventi giornalieri (attività, spese, progress obiettivi 1/30)."""
-        self.append_time_log("Applicazione eventi giornalieri...")
-        try:
-            cursor = self.db.cursor()
+        # Confronto diretto su frequency (senza LOWER) per usare l'indice (frequency, next_due_day)
+        cursor.execute("""
+            SELECT ea.*, pc.user_id
+            FROM economic_activities ea
+            LEFT JOIN player_characters pc ON ea.pg_id = pc.id
+            WHERE ea.frequency = 'giornaliera'
+        """)
+        activities = cursor.fetchall() or []
 
-            # Attività economiche giornaliere
-            cursor.execute("""
-                SELECT ea.*, pc.user_id
-                FROM economic_activities ea
-                LEFT JOIN banks b ON ea.destination_bank_id = b.id
-                LEFT JOIN player_characters pc ON ea.pg_id = pc.id
-            """)
-            activities = cursor.fetchall() or []
-            for activity in activities:
-                if str(activity.get('frequency', '')).lower() != 'giornaliera':
-                    continue
-                dest_bank_id = activity.get('destination_bank_id')
-                if not dest_bank_id:
-                    self.append_time_log(f"  Attività '{activity.get('description','?')}' senza banca: guadagno non applicato")
-                    continue
-                income = float(activity.get('income') or 0.0)
-                try:
-                    cursor.execute("START TRANSACTION")
-                    cursor.execute("UPDATE banks SET current_balance = current_balance + %s WHERE id = %s", (income, dest_bank_id))
-                    cursor.execute("""
-                        INSERT INTO bank_transactions
-                        (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                    """, (
-                        activity.get('pg_id'),
-                        activity.get('user_id'),
-                        dest_bank_id,
-                        'ATTIVITA_ECONOMICA',
-                        income,
-                        f"Attività giornaliera: {activity.get('description', '')}"
-                    ))
-                    self.db.commit()
-                    self.append_time_log(f"  Guadagno giornaliero {income:.2f} MO -> banca id {dest_bank_id}")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f"  Errore aggiornamento banca per attività {activity.get('description')}: {e}")
+        cursor.execute("""
+            SELECT fe.*, pc.user_id
+            FROM fixed_expenses fe
+            LEFT JOIN player_characters pc ON fe.pg_id = pc.id
+            WHERE fe.frequency = 'giornaliera'
+        """)
+        expenses = cursor.fetchall() or []
 
-            # Spese fisse giornaliere
-            cursor.execute("""
-                SELECT fe.*, pc.user_id
-                FROM fixed_expenses fe
-                LEFT JOIN banks b ON fe.source_bank_id = b.id
-                LEFT JOIN player_characters pc ON fe.pg_id = pc.id
-            """)
-            expenses = cursor.fetchall() or []
-            for expense in expenses:
-                if str(expense.get('frequency', '')).lower() != 'giornaliera':
-                    continue
-                src_bank_id = expense.get('source_bank_id')
-                if not src_bank_id:
-                    self.append_time_log(f"  Spesa '{expense.get('description','?')}' senza banca: non applicata")
-                    continue
-                amount = float(expense.get('amount') or 0.0)
-                try:
-                    cursor.execute("START TRANSACTION")
-                    cursor.execute(
-                        "UPDATE banks SET current_balance = current_balance - %s WHERE id = %s AND current_balance >= %s",
-                        (amount, src_bank_id, amount)
-                    )
-                    if cursor.rowcount == 0:
-                        self.db.rollback()
-                        self.append_time_log(f"  Saldo insufficiente per '{expense.get('description')}' (banca id {src_bank_id})")
-                        continue
-                    cursor.execute("""
-                        INSERT INTO bank_transactions
-                        (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                    """, (
-                        expense.get('pg_id'),
-                        expense.get('user_id'),
-                        src_bank_id,
-                        'SPESA_FISSA',
-                        amount,
-                        f"Spesa fissa giornaliera: {expense.get('description', '')}"
-                    ))
-                    self.db.commit()
-                    self.append_time_log(f"  Spesa giornaliera {amount:.2f} MO prelevata da banca id {src_bank_id}")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f"  Errore applicazione spesa '{expense.get('description')}': {e}")
+        # Settimanali e mensili: solo le righe che scadono dentro l'intervallo simulato
+        cursor.execute("""
+            SELECT ea.*, pc.user_id
+            FROM economic_activities ea
+            LEFT JOIN player_characters pc ON ea.pg_id = pc.id
+            WHERE ea.frequency IN ('settimanale', 'mensile')
+              AND (ea.next_due_day IS NULL OR ea.next_due_day <= %s)
+        """, (end_abs_day,))
+        periodic_activities = cursor.fetchall() or []
 
-            # Applica 1/28 di mese sugli obiettivi
-            self._apply_objective_progress(frazione_mensile=1/28.0, etichetta='giornaliero')
+        cursor.execute("""
+            SELECT fe.*, pc.user_id
+            FROM fixed_expenses fe
+            LEFT JOIN player_characters pc ON fe.pg_id = pc.id
+            WHERE fe.frequency IN ('settimanale', 'mensile')
+              AND (fe.next_due_day IS NULL OR fe.next_due_day <= %s)
+        """, (end_abs_day,))
+        periodic_expenses = cursor.fetchall() or []
 
-        except Exception as e:
-            self.append_time_log(f"Errore in _apply_daily_events: {e}")
-        finally:
-            try:
-                cursor.close()
-            except:
-                pass
+        cursor.execute("""
+            SELECT fo.*, f.pg_id, pc.user_id
+            FROM follower_objectives fo
+            LEFT JOIN followers f ON fo.follower_id = f.id
+            LEFT JOIN player_characters pc ON f.pg_id = pc.id
+            WHERE fo.status = %s
+        """, (self.OBJECTIVE_STATUS['IN_CORSO'],))
+        objectives = []
+        for row in cursor.fetchall() or []:
+            obj = dict(row)
+            obj['progress_percentage'] = float(obj.get('progress_percentage') or 0.0)
+            objectives.append(obj)
 
-    def _apply_weekly_events(self):
-        """Applica eventi settimanali e 1/4 mese sugli obiettivi."""
-        self.append_time_log("Applicazione eventi settimanali...")
-        try:
-            cursor = self.db.cursor()
+        return {
+            'banks': banks,
+            'activities': activities,
+            'expenses': expenses,
+            'periodic_activities': periodic_activities,
+            'periodic_expenses': periodic_expenses,
+            'objectives': objectives,
+        }
 
-            # Attività economiche settimanali
-            cursor.execute("""
-                SELECT ea.*, pc.user_id
-                FROM economic_activities ea
-                LEFT JOIN banks b ON ea.destination_bank_id = b.id
-                LEFT JOIN player_characters pc ON ea.pg_id = pc.id
-            """)
-            activities = cursor.fetchall() or []
-            for activity in activities:
-                if str(activity.get('frequency', '')).lower() != 'settimanale':
-                    continue
-                dest_bank_id = activity.get('destination_bank_id')
-                if not dest_bank_id:
-                    self.append_time_log(f"  Attività '{activity.get('description','?')}' senza banca: guadagno non applicato")
-                    continue
-                income = float(activity.get('income') or 0.0)
-                try:
-                    cursor.execute("START TRANSACTION")
-                    cursor.execute("UPDATE banks SET current_balance = current_balance + %s WHERE id = %s", (income, dest_bank_id))
-                    cursor.execute("""
-                        INSERT INTO bank_transactions
-                        (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                    """, (
-                        activity.get('pg_id'),
-                        activity.get('user_id'),
-                        dest_bank_id,
-                        'ATTIVITA_ECONOMICA',
-                        income,
-                        f"Attività settimanale: {activity.get('description', '')}"
-                    ))
-                    self.db.commit()
-                    self.append_time_log(f"  Guadagno settimanale {income:.2f} MO -> banca id {dest_bank_id}")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f"  Errore update banca attività settimanale: {e}")
+    def _simulate_time_advance(self, state, start_abs_day, days, log=None, on_day=None, should_stop=None):
+        """
+        Simula in memoria N giorni Mystara a partire da start_abs_day.
+        Mantiene la semantica giorno per giorno del motore originale: interessi al
+        cambio anno, poi attività, spese (solo con saldo sufficiente) e avanzamento
+        obiettivi di 1/28 di mese. Attività e spese settimanali/mensili scattano nel
+        giorno di scadenza (next_due_day) e vengono ripianificate alla successiva.
+        Non scrive nulla sul database; log=False disattiva il log (anteprima),
+        on_day(abs_day, banks, ledger), se indicato, viene chiamato a fine di ogni giorno
+        e should_stop() prima di iniziarne uno nuovo: se restituisce True la simulazione
+        si ferma al confine del giorno e il risultato copre solo i giorni completati.
+        Restituisce movimenti, variazioni di saldo, stato finale degli obiettivi,
+        nuove scadenze delle ricorrenze e primo giorno di saldo insufficiente per banca.
+        """
+        verbose = log is not False
+        if log is None:
+            log = self.append_time_log
+
+        banks = state['banks']
+        objectives = [obj for obj in state['objectives']
+                      if obj.get('status') == self.OBJECTIVE_STATUS['IN_CORSO']]
+
+        ledger = []
+        deltas = {}
+        objective_updates = {}
+        insufficient = {}
+        frazione_mensile = 1 / 28.0
+        fallback_user_id = self.current_user.get('id') if self.current_user else None
+
+        def prepare(table, row, bank_key, amount_key, label):
+            """Importo, banca e causale di una ricorrenza non cambiano tra un giorno e l'altro."""
+            frequency = str(row.get('frequency') or 'giornaliera').lower()
+            bank_id = row.get(bank_key)
+            due = row.get('next_due_day')
+            return {
+                'key': (table, row['id']),
+                'frequency': frequency,
+                'period': self.RECURRING_PERIODS.get(frequency, 1),
+                'due': int(due) if due is not None else self._next_due_day(frequency, start_abs_day),
+                'bank_id': bank_id,
+                'bank': banks.get(bank_id),
+                'amount': float(row.get(amount_key) or 0.0),
+                'pg_id': row.get('pg_id'),
+                'user_id': row.get('user_id'),
+                'description': row.get('description', ''),
+                'reason': f"{label} {frequency}: {row.get('description', '')}",
+            }
 
-            # Spese fisse settimanali
-            cursor.execute("""
-                SELECT fe.*, pc.user_id
-                FROM fixed_expenses fe
-                LEFT JOIN banks b ON fe.source_bank_id = b.id
-                LEFT JOIN player_characters pc ON fe.pg_id = pc.id
-            """)
-            expenses = cursor.fetchall() or []
-            for expense in expenses:
-                if str(expense.get('frequency', '')).lower() != 'settimanale':
-                    continue
-                src_bank_id = expense.get('source_bank_id')
-                if not src_bank_id:
-                    self.append_time_log(f"  Spesa '{expense.get('description','?')}' senza banca: non applicata")
-                    continue
-                amount = float(expense.get('amount') or 0.0)
-                try:
-                    cursor.execute("START TRANSACTION")
-                    cursor.execute(
-                        "UPDATE banks SET current_balance = current_balance - %s WHERE id = %s AND current_balance >= %s",
-                        (amount, src_bank_id, amount)
-                    )
-                    if cursor.rowcount == 0:
-                        self.db.rollback()
-                        self.append_time_log(f"  Saldo insufficiente per spesa '{expense.get('description')}' (banca id {src_bank_id})")
+        activities = [prepare('economic_activities', row, 'destination_bank_id', 'income', "Attività")
+                      for row in state['activities']]
+        expenses = [prepare('fixed_expenses', row, 'source_bank_id', 'amount', "Spesa fissa")
+                    for row in state['expenses']]
+        periodic_activities = [prepare('economic_activities', row, 'destination_bank_id', 'income', "Attività")
+                               for row in state.get('periodic_activities', [])]
+        periodic_expenses = [prepare('fixed_expenses', row, 'source_bank_id', 'amount', "Spesa fissa")
+                             for row in state.get('periodic_expenses', [])]
+
+        def due_items(items, day):
+            """Ricorrenze in scadenza nel giorno, già ripianificate alla scadenza successiva."""
+            due = []
+            for item in items:
+                if item['due'] <= day:
+                    item['due'] = (day // item['period'] + 1) * item['period']
+                    due.append(item)
+            return due
+
+        def move(bank_id, amount):
+            deltas[bank_id] = deltas.get(bank_id, 0.0) + amount
+            if bank_id in banks:
+                banks[bank_id]['balance'] += amount
+
+        abs_day = start_abs_day
+        for i in range(days):
+            if should_stop and should_stop():
+                if verbose:
+                    log(f"⏹️ Avanzamento interrotto dopo {i} giorni su {days}.")
+                break
+            prev_abs = abs_day
+            abs_day += 1
+
+            old_y = prev_abs // self.DAYS_PER_YEAR
+            new_y = abs_day // self.DAYS_PER_YEAR
+            if new_y != old_y:
+                base_year = getattr(self, "EPOCH_DATE", date(1, 1, 1)).year
+                if verbose:
+                    log(f"🔄 Cambio anno Mystara rilevato: {base_year + old_y} → {base_year + new_y}")
+                credited = 0
+                total_interest = 0.0
+                for bank in banks.values():
+                    balance = bank['balance']
+                    rate = bank['rate']
+                    if balance <= 0 or rate <= 0:
                         continue
-                    cursor.execute("""
-                        INSERT INTO bank_transactions
-                        (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                    """, (
-                        expense.get('pg_id'),
-                        expense.get('user_id'),
-                        src_bank_id,
-                        'SPESA_FISSA',
-                        amount,
-                        f"Spesa fissa settimanale: {expense.get('description', '')}"
+                    interest = balance * (rate / 100.0)
+                    ledger.append((
+                        bank['pg_id'], bank['owner_user_id'], bank['id'], 'INTERESSE_ANNUALE', interest,
+                        f"Interesse annuale {rate:.2f}% su saldo {balance:.2f} MO"
                     ))
-                    self.db.commit()
-                    self.append_time_log(f"  Spesa settimanale {amount:.2f} MO prelevata da banca id {src_bank_id}")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f"  Errore applicazione spesa settimanale: {e}")
-
-            # Gli obiettivi avanzano gia' giorno per giorno dentro advance_days().
-            # Non applicare qui un ulteriore avanzamento settimanale, altrimenti
-            # avanzare di una settimana raddoppia progresso e costi.
-
-        except Exception as e:
-            self.append_time_log(f"Errore in _apply_weekly_events: {e}")
-        finally:
-            try:
-                cursor.close()
-            except:
-                pass
-
-    def _apply_monthly_events(self):
-        """Applica eventi mensili (spese/attività mensili e progress 1 mese)."""
-        self.append_time_log("Applicazione eventi mensili...")
-        try:
-            cursor = self.db.cursor()
-
-            # Spese mensili
-            cursor.execute("""
-                SELECT fe.*, pc.user_id
-                FROM fixed_expenses fe
-                LEFT JOIN banks b ON fe.source_bank_id = b.id
-                LEFT JOIN player_characters pc ON fe.pg_id = pc.id
-            """)
-            fixed_expenses = cursor.fetchall() or []
-            for expense in fixed_expenses:
-                if str(expense.get('frequency', '')).lower() != 'mensile':
+                    move(bank['id'], interest)
+                    credited += 1
+                    total_interest += interest
+                if verbose:
+                    log(f"📅 Fine anno Mystara → interessi annuali: {credited} banche, totale accreditato {total_interest:.2f} MO")
+
+            if verbose:
+                log(f"Data avanzata a {self.convert_date_to_ded_format(self.absolute_day_to_date(abs_day))} (giorno {i+1}/{days})")
+
+            # Attività economiche: giornaliere più settimanali/mensili in scadenza oggi
+            for item in activities + due_items(periodic_activities, abs_day):
+                dest_bank_id = item['bank_id']
+                if not dest_bank_id:
+                    if verbose:
+                        log(f"  Attività '{item['description'] or '?'}' senza banca: guadagno non applicato")
                     continue
-                src_bank_id = expense.get('source_bank_id')
+                income = item['amount']
+                ledger.append((
+                    item['pg_id'], item['user_id'], dest_bank_id, 'ATTIVITA_ECONOMICA', income, item['reason']
+                ))
+                deltas[dest_bank_id] = deltas.get(dest_bank_id, 0.0) + income
+                if item['bank']:
+                    item['bank']['balance'] += income
+                if verbose:
+                    log(f"  Guadagno {income:.2f} MO ({item['frequency']}) -> banca id {dest_bank_id}")
+
+            # Spese fisse: giornaliere più settimanali/mensili in scadenza oggi
+            for item in expenses + due_items(periodic_expenses, abs_day):
+                src_bank_id = item['bank_id']
                 if not src_bank_id:
-                    self.append_time_log(f"  Spesa '{expense.get('description','?')}' senza banca: non applicata")
+                    if verbose:
+                        log(f"  Spesa '{item['description'] or '?'}' senza banca: non applicata")
                     continue
-                amount = float(expense.get('amount') or 0.0)
-                try:
-                    cursor.execute("START TRANSACTION")
-                    cursor.execute(
-                        "UPDATE banks SET current_balance = current_balance - %s WHERE id = %s AND current_balance >= %s",
-                        (amount, src_bank_id, amount)
-                    )
-                    if cursor.rowcount == 0:
-                        self.db.rollback()
-                        self.append_time_log(f"  Saldo insufficiente per spesa mensile '{expense.get('description')}' (banca id {src_bank_id})")
-                        continue
-                    cursor.execute("""
-                        INSERT INTO bank_transactions
-                        (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                    """, (
-                        expense.get('pg_id'),
-                        expense.get('user_id'),
-                        src_bank_id,
-                        'SPESA_FISSA',
-                        amount,
-                        f"Spesa fissa mensile: {expense.get('description', '')}"
-                    ))
-                    self.db.commit()
-                    self.append_time_log(f"  Spesa mensile {amount:.2f} MO prelevata da banca id {src_bank_id}")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f"  Errore applicazione spesa mensile: {e}")
-
-            # Attività mensili
-            cursor.execute("""
-                SELECT ea.*, pc.user_id
-                FROM economic_activities ea
-                LEFT JOIN banks b ON ea.destination_bank_id = b.id
-                LEFT JOIN player_characters pc ON ea.pg_id = pc.id
-            """)
-            activities = cursor.fetchall() or []
-            for activity in activities:
-                if str(activity.get('frequency', '')).lower() != 'mensile':
-                    continue
-                dest_bank_id = activity.get('destination_bank_id')
-                if not dest_bank_id:
-                    self.append_time_log(f"  Attività '{activity.get('description','?')}' senza banca: guadagno non applicato")
+                amount = item['amount']
+                bank = item['bank']
+                if not bank or bank['balance'] < amount:
+                    if bank and src_bank_id not in insufficient:
+                        insufficient[src_bank_id] = abs_day
+                    if verbose:
+                        log(f"  Saldo insufficiente per '{item['description']}' (banca id {src_bank_id})")
                     continue
-                income = float(activity.get('income') or 0.0)
-                try:
-                    cursor.execute("START TRANSACTION")
-                    cursor.execute("UPDATE banks SET current_balance = current_balance + %s WHERE id = %s", (income, dest_bank_id))
-                    cursor.execute("""
-                        INSERT INTO bank_transactions
-                        (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                    """, (
-                        activity.get('pg_id'),
-                        activity.get('user_id'),
-                        dest_bank_id,
-                        'ATTIVITA_ECONOMICA',
-                        income,
-                        f"Attività mensile: {activity.get('description', '')}"
-                    ))
-                    self.db.commit()
-                    self.append_time_log(f"  Guadagno mensile {income:.2f} MO -> banca id {dest_bank_id}")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f"  Errore update banca per attività mensile: {e}")
-
-            # Gli obiettivi avanzano gia' giorno per giorno dentro advance_days().
-            # Non applicare qui un ulteriore avanzamento mensile, altrimenti
-            # avanzare di un mese raddoppia progresso e costi.
-
-        except Exception as e:
-            self.append_time_log(f"Errore in _apply_monthly_events: {e}")
-        finally:
-            try:
-                cursor.close()
-            except:
-                pass
-
-    def _apply_objective_progress(self, frazione_mensile=1.0, etichetta='periodico'):
-        """
-        Applica progresso obiettivi basato sulla frazione di mese passata.
-        Aggiorna progress_percentage e preleva il costo dalla banca collegata.
-        """
-        self.append_time_log(f"Applicazione avanzamento obiettivi ({etichetta}) — frazione_mensile={frazione_mensile}")
-        try:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT fo.*, f.pg_id, pc.user_id
-                FROM follower_objectives fo
-                LEFT JOIN followers f ON fo.follower_id = f.id
-                LEFT JOIN player_characters pc ON f.pg_id = pc.id
-                WHERE fo.status = %s
-            """, (self.OBJECTIVE_STATUS['IN_CORSO'],))
-            objectives = cursor.fetchall() or []
+                ledger.append((
+                    item['pg_id'], item['user_id'], src_bank_id, 'SPESA_FISSA', amount, item['reason']
+                ))
+                deltas[src_bank_id] = deltas.get(src_bank_id, 0.0) - amount
+                bank['balance'] -= amount
+                if verbose:
+                    log(f"  Spesa {item['frequency']} {amount:.2f} MO prelevata da banca id {src_bank_id}")
 
+            # Applica 1/28 di mese sugli obiettivi
             for obj in objectives:
-                obj_id = obj.get('id')
+                if obj.get('status') != self.OBJECTIVE_STATUS['IN_CORSO']:
+                    continue
                 name = obj.get('name', 'Sconosciuto')
                 bank_id = obj.get('bank_id')
-                pg_id = obj.get('pg_id')
-                user_id = obj.get('user_id') or (self.current_user.get('id') if self.current_user else None)
                 estimated_months = int(obj.get('estimated_months') or 0)
                 total_cost = float(obj.get('total_cost') or 0.0)
-                progress_pct = float(obj.get('progress_percentage') or 0.0)
+                progress_pct = obj['progress_percentage']
 
-                duration_months = estimated_months
-                if duration_months <= 0 or estimated_months <= 0:
-                    self.append_time_log(f"  Obiettivo '{name}' ha mesi non validi, ignorato.")
+                if estimated_months <= 0:
+                    if verbose:
+                        log(f"  Obiettivo '{name}' ha mesi non validi, ignorato.")
                     continue
 
-                progress_per_month = (100.0 / duration_months) if duration_months > 0 else 0.0
-
-                progress_to_apply = progress_per_month * float(frazione_mensile)
+                progress_to_apply = (100.0 / estimated_months) * frazione_mensile
                 new_progress = min(progress_pct + progress_to_apply, 100.0)
                 actual_progress_delta = max(new_progress - progress_pct, 0.0)
                 cost_to_apply = total_cost * (actual_progress_delta / 100.0)
 
                 if not bank_id:
-                    self.append_time_log(f"  Obiettivo '{name}' senza banca; costo non applicato.")
+                    if verbose:
+                        log(f"  Obiettivo '{name}' senza banca; costo non applicato.")
                     continue
 
-                cursor.execute("SELECT current_balance FROM banks WHERE id = %s", (bank_id,))
-                bank = cursor.fetchone()
+                bank = banks.get(bank_id)
                 if not bank:
-                    self.append_time_log(f"  Obiettivo '{name}' collegato a banca non trovata (id {bank_id}).")
+                    if verbose:
+                        log(f"  Obiettivo '{name}' collegato a banca non trovata (id {bank_id}).")
                     continue
 
-                current_balance = float(bank.get('current_balance') or 0.0)
-
-                if cost_to_apply > 0 and current_balance < cost_to_apply:
-                    self.append_time_log(f"  Saldo insufficiente per obiettivo '{name}' (necessario {cost_to_apply:.2f}, disponibile {current_balance:.2f})")
+                if cost_to_apply > 0 and bank['balance'] < cost_to_apply:
+                    if bank_id not in insufficient:
+                        insufficient[bank_id] = abs_day
+                    if verbose:
+                        log(f"  Saldo insufficiente per obiettivo '{name}' (necessario {cost_to_apply:.2f}, disponibile {bank['balance']:.2f})")
                     continue
 
                 new_status = obj.get('status')
                 if new_progress >= 100.0:
                     new_status = self.OBJECTIVE_STATUS['COMPLETATO']
 
-                try:
-                    cursor.execute("START TRANSACTION")
+                if cost_to_apply > 0:
+                    ledger.append((
+                        obj.get('pg_id'), obj.get('user_id') or fallback_user_id, bank_id, 'COSTO_OBIETTIVO', cost_to_apply,
+                        f"Avanzamento obiettivo '{name}' {progress_pct:.2f}% -> {new_progress:.2f}%"
+                    ))
+                    move(bank_id, -cost_to_apply)
+                    if verbose:
+                        log(
+                            f"  Prelevati {cost_to_apply:.2f} MO per obiettivo '{name}' "
+                            f"({progress_pct:.2f}% -> {new_progress:.2f}%, banca id {bank_id})"
+                        )
+                elif verbose:
+                    log(f"  Obiettivo '{name}' senza costo da applicare in questo avanzamento.")
+
+                obj['progress_percentage'] = new_progress
+                obj['status'] = new_status
+                objective_updates[obj['id']] = (new_progress, new_status, abs_day)
+                if verbose:
+                    log(f"  Obiettivo '{name}': {progress_pct:.1f}% -> {new_progress:.1f}% (status: {self.OBJECTIVE_STATUS_REV.get(new_status,new_status)})")
+
+            if on_day:
+                on_day(abs_day, banks, ledger)
+
+        return {
+            'start_abs_day': start_abs_day,
+            'end_abs_day': abs_day,
+            'ledger': ledger,
+            'deltas': deltas,
+            'objectives': objective_updates,
+            'schedule': {item['key']: item['due'] for item in periodic_activities + periodic_expenses},
+            'insufficient': insufficient,
+        }
+
+    def project_time_advance(self, days):
+        """
+        Anteprima in sola lettura di un avanzamento di N giorni: carica lo stato come
+        advance_days e lo simula in memoria senza log e senza scrivere sul database.
+        Restituisce per ogni banca la curva dei saldi giornalieri (saldo a fine giorno),
+        minimo, saldo finale e primo giorno con saldo insufficiente, più il giorno di
+        completamento degli obiettivi che si concludono nell'intervallo.
+        """
+        days = int(days)
+        start_abs = self.date_to_absolute_day(self.game_date)
+
+        cursor = self.db.cursor()
+        try:
+            state = self._load_time_advance_state(cursor, start_abs + days)
+        finally:
+            try:
+                cursor.close()
+            except:
+                pass
+
+        bank_ids = list(state['banks'])
+        curves = {bank_id: [] for bank_id in bank_ids}
+        start_balances = {bank_id: bank['balance'] for bank_id, bank in state['banks'].items()}
+        objective_names = {obj['id']: obj.get('name', 'Sconosciuto') for obj in state['objectives']}
+
+        def record(abs_day, banks, ledger):
+            for bank_id in bank_ids:
+                curves[bank_id].append(banks[bank_id]['balance'])
+
+        result = self._simulate_time_advance(state, start_abs, days, log=False, on_day=record)
+
+        banks = {}
+        for bank_id in bank_ids:
+            curve = curves[bank_id]
+            min_index = min(range(len(curve)), key=curve.__getitem__) if curve else None
+            banks[bank_id] = {
+                'id': bank_id,
+                'name': state['banks'][bank_id]['name'],
+                'start_balance': start_balances[bank_id],
+                'end_balance': curve[-1] if curve else start_balances[bank_id],
+                'min_balance': curve[min_index] if curve else start_balances[bank_id],
+                'min_day': start_abs + 1 + min_index if curve else None,
+                'first_insufficient_day': result['insufficient'].get(bank_id),
+            }
 
-                    if cost_to_apply > 0:
-                        new_balance = current_balance - cost_to_apply
-                        cursor.execute("UPDATE banks SET current_balance = %s WHERE id = %s", (new_balance, bank_id))
-                        cursor.execute("""
-                            INSERT INTO bank_transactions
-                            (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
-                            VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                        """, (
-                            pg_id,
-                            user_id,
-                            bank_id,
-                            'COSTO_OBIETTIVO',
-                            cost_to_apply,
-                            f"Avanzamento obiettivo '{name}' {progress_pct:.2f}% -> {new_progress:.2f}%"
-                        ))
+        completions = sorted(
+            (day, obj_id, objective_names.get(obj_id, 'Sconosciuto'))
+            for obj_id, (_progress, status, day) in result['objectives'].items()
+            if status == self.OBJECTIVE_STATUS['COMPLETATO']
+        )
 
-                    cursor.execute("""
-                        UPDATE follower_objectives
-                        SET progress_percentage = %s, status = %s
-                        WHERE id = %s
-                    """, (new_progress, new_status, obj_id))
-                    self.db.commit()
-                    if cost_to_apply > 0:
-                        self.append_time_log(
-                            f"  Prelevati {cost_to_apply:.2f} MO per obiettivo '{name}' "
-                            f"({progress_pct:.2f}% -> {new_progress:.2f}%, banca id {bank_id})"
-                        )
-                    else:
-                        self.append_time_log(f"  Obiettivo '{name}' senza costo da applicare in questo avanzamento.")
-                    self.append_time_log(f"  Obiettivo '{name}': {progress_pct:.1f}% -> {new_progress:.1f}% (status: {self.OBJECTIVE_STATUS_REV.get(new_status,new_status)})")
-                    # se completato, aggiorna GUI obiettivi
-                    if new_status == self.OBJECTIVE_STATUS['COMPLETATO']:
-                        try:
-                            if hasattr(self, 'objectives_tree') and hasattr(self, 'load_objectives_list'):
-                                self.load_objectives_list(self.objectives_tree)
-                        except Exception as e:
-                            self.append_time_log(f"  Impossibile ricaricare GUI obiettivi: {e}")
-                except Exception as e:
-                    try:
-                        self.db.rollback()
-                    except:
-                        pass
-                    self.append_time_log(f"  Errore aggiornamento obiettivo '{name}': {e}")
+        return {
+            'start_abs_day': start_abs,
+            'end_abs_day': result['end_abs_day'],
+            'banks': banks,
+            'curves': curves,
+            'objective_completions': completions,
+            'movements': len(result['ledger']),
+        }
 
-        except Exception as e:
-            self.append_time_log(f"Errore in _apply_objective_progress: {e}")
-        finally:
+    def _bulk_insert_bank_transactions(self, cursor, rows, chunk_size=500):
+        """
+        Inserisce movimenti bancari con INSERT multi-riga a blocchi.
+        Ogni riga è (pg_id, user_id, bank_id, operation_type, amount, reason);
+        il timestamp è NOW() lato server come negli inserimenti singoli.
+        """
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, NOW())"] * len(chunk))
+            params = [value for row in chunk for value in row]
+            cursor.execute(f"""
+                INSERT INTO bank_transactions
+                (pg_id, user_id, bank_id, operation_type, amount, reason, timestamp)
+                VALUES {placeholders}
+            """, params)
+
+    def _write_time_advance_result(self, cursor, result, conn=None):
+        """
+        Scrive il risultato di _simulate_time_advance in un'unica transazione sulla
+        connessione del cursore (conn; self.db se non indicata).
+        """
+        db = conn or self.db
+        new_date = self.absolute_day_to_date(result['end_abs_day'])
+        try:
+            cursor.execute("START TRANSACTION")
+            self._bulk_insert_bank_transactions(cursor, result['ledger'])
+            bank_rows = [(delta, bank_id) for bank_id, delta in result['deltas'].items() if delta]
+            if bank_rows:
+                cursor.executemany(
+                    "UPDATE banks SET current_balance = current_balance + %s WHERE id = %s",
+                    bank_rows
+                )
+            objective_rows = [
+                (progress, status, obj_id)
+                for obj_id, (progress, status, _day) in result['objectives'].items()
+            ]
+            if objective_rows:
+                cursor.executemany("""
+                    UPDATE follower_objectives
+                    SET progress_percentage = %s, status = %s
+                    WHERE id = %s
+                """, objective_rows)
+            # Scadenze: il bucket giornaliero in blocco, le ricorrenze toccate riga per riga
+            for table in ('economic_activities', 'fixed_expenses'):
+                cursor.execute(
+                    f"UPDATE {table} SET next_due_day = %s WHERE frequency = 'giornaliera'",
+                    (result['end_abs_day'] + 1,)
+                )
+            schedule_rows = {}
+            for (table, row_id), due_day in result.get('schedule', {}).items():
+                schedule_rows.setdefault(table, []).append((due_day, row_id))
+            for table, rows in schedule_rows.items():
+                cursor.executemany(f"UPDATE {table} SET next_due_day = %s WHERE id = %s", rows)
+            # Effetti di stato scaduti entro il nuovo giorno: un solo UPDATE set-based
+            expired = 0
             try:
-                cursor.close()
+                expired = self.expire_status_effects(cursor, result['end_abs_day'])
+            except Exception as e:
+                self.append_time_log(f"Scadenza effetti di stato non applicata: {e}")
+            # Snapshot dei saldi al nuovo giorno: se la tabella manca l'avanzamento prosegue
+            drifted = []
+            try:
+                drifted = [s for s in self.snapshot_bank_balances(cursor, result['end_abs_day']) if s['drift']]
+            except Exception as e:
+                self.append_time_log(f"Snapshot saldi non registrato: {e}")
+            cursor.execute(
+                "UPDATE game_state SET game_date = %s, absolute_day = %s WHERE id = 1",
+                (new_date.strftime("%Y-%m-%d"), result['end_abs_day'])
+            )
+            db.commit()
+        except Exception:
+            try:
+                db.rollback()
             except:
                 pass
+            raise
+
+        self.append_time_log(
+            f"Avanzamento registrato: {len(result['ledger'])} movimenti, "
+            f"{len(result['deltas'])} banche, {len(result['objectives'])} obiettivi aggiornati."
+        )
+        if expired:
+            self.append_time_log(f"⏱️ Effetti di stato scaduti e disattivati: {expired}.")
+        if drifted:
+            self.append_time_log(
+                f"⚠️ {len(drifted)} banche con saldo diverso dai movimenti registrati "
+                f"(Banche > Riconcilia Saldi per i dettagli)."
+            )
+
+    def advance_weeks(self, weeks=1):
+        """Avanza settimane Mystara (7 giorni ogni settimana) in un solo avanzamento in background."""
+        total_days = weeks * 7
+        self.append_time_log(f"📅 Avanzamento Mystara: {weeks} settimana/e → {total_days} giorni")
+        # Attività e spese settimanali scattano dentro advance_days alla loro scadenza
+        self.advance_days(total_days, label=f"{weeks} settimana/e")
+
+    def advance_months(self, months=1):
+        """Avanza mesi Mystara, 28 giorni ciascuno, in un solo avanzamento in background."""
+        total_days = months * self.DAYS_PER_MONTH
+        self.append_time_log(f"📆 Avanzamento Mystara: {months} mese/i → {total_days} giorni")
+        # Attività e spese mensili scattano dentro advance_days alla loro scadenza (primo del mese)
+        self.advance_days(total_days, label=f"{months} mese/i")
 
     def apply_unhandled_objective_events(self):
         """Applica automaticamente le scelte dei giocatori per gli imprevisti non ancora gestiti."""
@@ -16334,15 +18550,13 @@ class DeDToolGUI:
                 new_mystara_date = f"{day:02d} {month_name} {year}"
 
                 if delta_days > 0:
-                    if not messagebox.askyesno(
-                        "Conferma avanzamento",
-                        "La nuova data è nel futuro.\n"
-                        f"Avanzare di {delta_days} giorno/i applicando attività, spese, obiettivi, imprevisti e interessi?"
-                    ):
-                        return
-                    dialog.destroy()
-                    self.append_time_log(f"Cambio data manuale in avanti verso {new_mystara_date}: applico {delta_days} giorno/i.")
-                    self.advance_days(delta_days)
+                    # Data nel futuro: prima l'anteprima in sola lettura, l'avanzamento
+                    # (attività, spese, obiettivi, imprevisti e interessi) parte solo da Avanza
+                    def confirm_advance():
+                        dialog.destroy()
+                        self.append_time_log(f"Cambio data manuale in avanti verso {new_mystara_date}: applico {delta_days} giorno/i.")
+                        self.advance_days(delta_days)
+                    self.show_time_advance_preview(delta_days, on_confirm=confirm_advance)
                     return
 
                 if delta_days < 0:
@@ -16357,6 +18571,15 @@ class DeDToolGUI:
                 # Data uguale o arretramento confermato: aggiorna solo stato data.
                 self.game_date = new_date
                 self._update_game_state_date(new_date)
+                if delta_days < 0:
+                    # Le scadenze già calcolate sono nel futuro della nuova data: riallinea
+                    try:
+                        cursor = self.db.cursor()
+                        self.reset_recurring_schedule(cursor, absolute_day)
+                        self.db.commit()
+                        cursor.close()
+                    except Exception as e:
+                        self.append_time_log(f"Errore riallineamento scadenze attività/spese: {e}")
 
                 if hasattr(self, 'date_label'):
                     try:
@@ -16411,10 +18634,11 @@ class DeDToolGUI:
         current_state = self.root.attributes('-fullscreen')
         self.root.attributes('-fullscreen', not current_state)
 
-    def init_connection_pool(self):
+    def init_connection_pool(self, fallback=True):
         with self._pool_lock:
             if not self._pool_initialized:
                 try:
+                    from dbutils.pooled_db import PooledDB
                     self.connection_pool = PooledDB(
                         creator=pymysql,
                         host=self.env_sec.get("DB_HOST"),
@@ -16435,8 +18659,9 @@ class DeDToolGUI:
                     
                 except Exception as e:
                     print(f"❌ Errore inizializzazione pool PyMySQL: {e}")
-                    # Fallback alla connessione normale
-                    self.connect_database()
+                    # Fallback alla connessione normale (all'avvio la apre già la fase "database")
+                    if fallback:
+                        self.connect_database()
 
     def get_db_connection(self):
         if not self._pool_initialized:
@@ -16569,20 +18794,10 @@ class DeDToolGUI:
 
             self.update_chat_button_fast()
 
-            # Refresh leggero quando si torna al tab Chat Comune: non azzerare l'ultimo ID,
-            # altrimenti ogni cambio tab ricarica lo storico e peggiora il lag.
+            # Refresh leggero quando si torna al tab Chat Comune: il servizio chat
+            # legge solo i messaggi successivi all'ultimo ID visto.
             if "Chat Comune" in tab_name:
-                try:
-                    # Trova il widget messages_text all'interno del frame
-                    for widget in comune_frame.winfo_children():
-                        if isinstance(widget, ttk.Frame):
-                            for subwidget in widget.winfo_children():
-                                if isinstance(subwidget, scrolledtext.ScrolledText):
-                                    chat_key = f"comune_{self.current_user['id']}"
-                                    self._load_common_messages_display(subwidget, chat_key)
-                                    break
-                except Exception as e:
-                    print(f"Errore refresh chat comune: {e}")
+                self.get_chat_sync().poke()
             
             if "Chat Segreta" in tab_name:
                 if hasattr(self, "secret_contacts_tree"):
@@ -16636,14 +18851,34 @@ class DeDToolGUI:
             self.close_connection(conn, cursor)
 
     def _count_unread_by_category_fast(self):
-        """Conta messaggi non letti - Versione OTTIMIZZATA"""
+        """
+        Conta messaggi non letti dai contatori incrementali in memoria.
+        Il conteggio completo sul DB viene rifatto solo al primo uso e ogni
+        CHAT_UNREAD_RECONCILE_SECONDS secondi per correggere eventuali scostamenti.
+        """
         if not self.current_user:
             return {"comune": 0, "privati": 0, "segreti": 0}
         
+        reconciled_at = getattr(self, '_chat_unread_reconciled_at', None)
+        if (getattr(self, '_chat_unread', None) is None or reconciled_at is None
+                or (datetime.now() - reconciled_at).total_seconds() >= self.CHAT_UNREAD_RECONCILE_SECONDS):
+            self._reconcile_chat_unread_counts()
+        
+        return {
+            "comune": max(0, self._chat_unread['comune']),
+            "privati": 0,
+            "segreti": max(0, self._chat_unread['segreti'])
+        }
+
+    def _reconcile_chat_unread_counts(self):
+        """Conteggio completo dei non letti: riallinea i contatori e il loro id di riferimento."""
         conn, cursor = self.safe_cursor()
         user_id = self.current_user['id']
         
         try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM chat_messages")
+            high_water = cursor.fetchone()['max_id'] or 0
+            
             # Conta solo messaggi ricevuti/non propri: evita badge fantasma su messaggi inviati dall'utente.
             cursor.execute("""
                 SELECT 
@@ -16653,25 +18888,63 @@ class DeDToolGUI:
                 LEFT JOIN chat_reads r ON c.id = r.message_id AND r.user_id = %s
                 WHERE r.id IS NULL
                   AND c.sender_id != %s
-            """, (user_id, user_id, user_id, user_id))
+                  AND c.id <= %s
+            """, (user_id, user_id, user_id, user_id, high_water))
             
             result = cursor.fetchone()
-            comune = result['comune'] or 0
-            segreti = result['segreti'] or 0
-            
-            return {
-                "comune": comune,
-                "privati": 0,
-                "segreti": segreti
+            self._chat_unread = {
+                "comune": int(result['comune'] or 0),
+                "segreti": int(result['segreti'] or 0)
             }
+            self._chat_unread_high_water = high_water
+            self._chat_unread_reconciled_at = datetime.now()
             
         finally:
             self.close_connection(conn, cursor)
 
+    def _chat_message_category(self, message):
+        """Categoria del badge per un messaggio ('comune', 'segreti') o None se non conta."""
+        if self.current_user and message.get('sender_id') == self.current_user['id']:
+            return None
+        if not message.get('is_secret') and message.get('receiver_id') is None:
+            return 'comune'
+        if message.get('is_secret') and self.current_user and message.get('receiver_id') == self.current_user['id']:
+            return 'segreti'
+        return None
+
+    def _chat_unread_on_new_messages(self, messages, read_ids=()):
+        """
+        Aggiorna i contatori con i messaggi nuovi consegnati dal ChatSyncService.
+        Contano solo gli id oltre l'id di riferimento (gli altri sono gia' nel conteggio)
+        e ancora non letti dopo la consegna ai widget.
+        """
+        if getattr(self, '_chat_unread', None) is None:
+            return
+        high_water = self._chat_unread_high_water
+        for m in messages:
+            if m['id'] <= high_water:
+                continue
+            category = self._chat_message_category(m)
+            if category and m.get('is_new') == 1 and m['id'] not in read_ids:
+                self._chat_unread[category] += 1
+        self._chat_unread_high_water = max(high_water, max(m['id'] for m in messages)) if messages else high_water
+
+    def _chat_unread_on_read(self, category, message_ids):
+        """
+        Scala i contatori per messaggi appena inseriti in chat_reads (erano non letti).
+        Gli id oltre l'id di riferimento non sono ancora contati: arriveranno dal servizio gia' letti.
+        """
+        if getattr(self, '_chat_unread', None) is None or category not in self._chat_unread:
+            return
+        high_water = self._chat_unread_high_water
+        self._chat_unread[category] -= sum(1 for msg_id in message_ids if msg_id <= high_water)
+
     def create_chat_interface_fast(self, parent, chat_type='comune'):
         """Interfaccia chat comune con funzionamento simile alla chat segreta"""
         if not hasattr(self, '_last_chat_message_id'):
             self._last_chat_message_id = {}
+        if not hasattr(self, '_chat_high_water_at_load'):
+            self._chat_high_water_at_load = {}
         
         chat_key = f"{chat_type}_{self.current_user['id']}"
         
@@ -16705,42 +18978,32 @@ class DeDToolGUI:
         
         message_entry.bind('<Return>', lambda e: self._send_common_message(message_entry, messages_text))
             
-        def load_messages_periodic():
-            """Polling per chat comune - Versione simile a quella segreta"""
-            if not hasattr(parent, '_polling_active') or not parent._polling_active:
-                return
-            
-            parent._polling_scheduled = False
-            
-            try:
-                was_at_bottom = messages_text.yview()[1] >= 0.95
-                
-                # Carica i messaggi
-                self._load_common_messages_display(messages_text, chat_key)
-                
-                if was_at_bottom:
-                    messages_text.see(tk.END)
-                    
-            except Exception as e:
-                print(f"Errore polling chat comune: {e}")
-            
-            # Ripianifica il polling
-            if hasattr(parent, '_polling_active') and parent._polling_active and not parent._polling_scheduled:
-                try:
-                    parent._polling_scheduled = True
-                    polling_interval = 1500
-                    parent.after_id = parent.after(polling_interval, load_messages_periodic)
-                except Exception as e:
-                    print(f"Errore scheduling: {e}")
-        
-        parent.load_messages_periodic = load_messages_periodic
-        
-        # Inizializza polling
+        # Caricamento iniziale, poi aggiornamenti dal servizio di sincronizzazione chat
         parent._polling_active = True
-        parent._polling_scheduled = False
-        
-        # Avvia il polling
-        load_messages_periodic()
+        self._load_common_messages_display(messages_text, chat_key)
+
+        def on_new_messages(messages):
+            """Riceve i messaggi nuovi dal ChatSyncService e mostra quelli della chat comune."""
+            if not getattr(parent, '_polling_active', False):
+                return []
+            last_id = self._last_chat_message_id.get(chat_key, 0)
+            msgs = [
+                m for m in messages
+                if not m['is_secret'] and m['receiver_id'] is None and m['id'] > last_id
+            ]
+            if not msgs:
+                return []
+            self._last_chat_message_id[chat_key] = msgs[-1]['id']
+            self._render_chat_messages(
+                messages_text, msgs,
+                lambda m, sender_name: "Tu" if m['sender_id'] == self.current_user['id'] else sender_name
+            )
+            return [m['id'] for m in msgs if m['is_new'] == 1]
+
+        sync = self.get_chat_sync()
+        # Iscrizione dal massimo globale letto al caricamento: i messaggi piu' vecchi sono gia' a video
+        since_id = max(self._last_chat_message_id.get(chat_key, 0), self._chat_high_water_at_load.pop(chat_key, 0))
+        parent._chat_sync_token = sync.subscribe(on_new_messages, since_id or None)
         
         def clean_up_polling():
             """Pulizia risorse"""
@@ -16748,11 +19011,10 @@ class DeDToolGUI:
                 if hasattr(parent, '_polling_active'):
                     parent._polling_active = False
                 
-                if hasattr(parent, 'after_id'):
-                    try:
-                        parent.after_cancel(parent.after_id)
-                    except:
-                        pass
+                token = getattr(parent, '_chat_sync_token', None)
+                if token:
+                    sync.unsubscribe(token)
+                    parent._chat_sync_token = None
                 
                 chat_key = f"{chat_type}_{self.current_user['id']}"
                 if hasattr(self, '_last_chat_message_id') and chat_key in self._last_chat_message_id:
@@ -16784,6 +19046,9 @@ class DeDToolGUI:
             initial_load = last_seen_id <= 0
 
             if initial_load:
+                # Letto prima dello storico: un messaggio arrivato nel frattempo arriva dal servizio chat
+                if hasattr(self, '_chat_high_water_at_load'):
+                    self._chat_high_water_at_load[chat_key] = self.get_chat_sync().read_high_water(cursor)
                 cursor.execute("""
                     SELECT
                         c.id,
@@ -16837,41 +19102,18 @@ class DeDToolGUI:
                     SELECT %s, id FROM chat_messages WHERE id IN ({placeholders})
                 """, [user_id] + new_msg_ids)
                 conn.commit()
+                self._chat_unread_on_read('comune', new_msg_ids)
             
             # 🔥 AGGIORNA L'ULTIMO ID (il più grande)
             if msgs:
                 self._last_chat_message_id[chat_key] = max(m['id'] for m in msgs)
             
             # 🔥 MOSTRA MESSAGGI (in ordine cronologico inverso per visualizzazione)
-            text_widget.config(state='normal')
-            if initial_load:
-                text_widget.delete(1.0, tk.END)
-            
-            for m in msgs:
-                created_at = m.get('created_at')
-                if created_at:
-                    date_str = created_at.strftime('%d/%m/%Y %H:%M:%S')
-                else:
-                    date_str = ''
-                
-                sender_name = self._chat_users_cache.get(m['sender_id'], {}).get('username', 'Unknown')
-                
-                if m['sender_id'] == user_id:
-                    header = f"[{date_str}] Tu: "
-                else:
-                    header = f"[{date_str}] {sender_name}: "
-                
-                text_widget.insert(tk.END, header)
-                text_widget.insert(tk.END, m['message'] + "\n")
-                
-                # 🔥 EVIDENZIA IN VERDE CHIARO SOLO I NUOVI MESSAGGI
-                if m['is_new'] == 1:
-                    start_idx = text_widget.index("end-2l linestart")
-                    end_idx = text_widget.index("end-1l lineend")
-                    text_widget.tag_add("new_message", start_idx, end_idx)
-            
-            text_widget.config(state='disabled')
-            text_widget.see(tk.END)
+            self._render_chat_messages(
+                text_widget, msgs,
+                lambda m, sender_name: "Tu" if m['sender_id'] == user_id else sender_name,
+                clear=initial_load
+            )
             
             # 🔥 AGGIORNA IL CONTATORE
             self.update_chat_button_fast()
@@ -16882,6 +19124,42 @@ class DeDToolGUI:
         finally:
             self.close_connection(conn, cursor)
 
+    def get_chat_sync(self):
+        """Servizio di sincronizzazione chat condiviso da tutte le finestre del client."""
+        if getattr(self, 'chat_sync', None) is None:
+            self.chat_sync = ChatSyncService(self)
+        return self.chat_sync
+
+    def _render_chat_messages(self, text_widget, msgs, header_label, clear=False):
+        """
+        Accoda i messaggi al widget di testo evidenziando i nuovi.
+        header_label(m, sender_name) restituisce l'intestazione dopo la data (es. "Tu", "Tu → Anna").
+        """
+        text_widget.config(state='normal')
+        if clear:
+            text_widget.delete(1.0, tk.END)
+        
+        for m in msgs:
+            created_at = m.get('created_at')
+            if created_at:
+                date_str = created_at.strftime('%d/%m/%Y %H:%M:%S')
+            else:
+                date_str = ''
+            
+            sender_name = self._chat_users_cache.get(m['sender_id'], {}).get('username', 'Unknown')
+            
+            text_widget.insert(tk.END, f"[{date_str}] {header_label(m, sender_name)}: ")
+            text_widget.insert(tk.END, m['message'] + "\n")
+            
+            # 🔥 EVIDENZIA IN VERDE CHIARO SOLO I NUOVI MESSAGGI
+            if m['is_new'] == 1:
+                start_idx = text_widget.index("end-2l linestart")
+                end_idx = text_widget.index("end-1l lineend")
+                text_widget.tag_add("new_message", start_idx, end_idx)
+        
+        text_widget.config(state='disabled')
+        text_widget.see(tk.END)
+
     def _send_common_message(self, message_entry, messages_text):
         """Invia messaggio nella chat comune - Versione semplificata"""
         text = message_entry.get().strip()
@@ -16909,9 +19187,8 @@ class DeDToolGUI:
             
             message_entry.delete(0, tk.END)
             
-            # 🔥 FORZA IL REFRESH DEI MESSAGGI
-            chat_key = f"comune_{self.current_user['id']}"
-            self._load_common_messages_display(messages_text, chat_key)
+            # 🔥 FORZA IL REFRESH DEI MESSAGGI (tick immediato del servizio chat)
+            self.get_chat_sync().poke()
             
             
         except Exception as e:
@@ -16943,6 +19220,7 @@ class DeDToolGUI:
                 """, values)
                 
                 conn.commit()
+                self._chat_unread_reconciled_at = None  # categoria non nota: riconteggio al prossimo badge
                 # Aggiorna contatore chat
                 self.update_chat_button_fast()
                             
@@ -16978,6 +19256,7 @@ class DeDToolGUI:
                     VALUES {','.join([f'(%s, %s)'] * len(unread_ids))}
                 """, [val for msg_id in unread_ids for val in (self.current_user['id'], msg_id)])
                 conn.commit()
+                self._chat_unread_on_read('comune', unread_ids)
                 
         finally:
             cursor.close()
@@ -17054,6 +19333,16 @@ class DeDToolGUI:
         # Salva per aggiornamenti automatici
         self.secret_contacts_tree = tree
 
+        def on_new_messages(messages):
+            """Ricarica la lista contatti solo quando arriva un messaggio segreto."""
+            if any(m['is_secret'] for m in messages) and tree.winfo_exists():
+                self._load_secret_conversations_list(tree)
+            return []
+
+        sync = self.get_chat_sync()
+        token = sync.subscribe(on_new_messages)
+        tree.bind("<Destroy>", lambda e: sync.unsubscribe(token) if e.widget == tree else None)
+
     def _load_secret_conversations_list(self, tree):
         """Versione corretta per contare SOLO messaggi ricevuti non letti"""
         conn = None
@@ -17122,7 +19411,7 @@ class DeDToolGUI:
     def _open_secret_chat_window(self, contact_id):
         """
         Apre popup conversazione segreta con contact_id.
-        Questo popup ha polling (after) per aggiornare i messaggi ogni 2s.
+        I messaggi nuovi arrivano dal ChatSyncService condiviso, senza polling per finestra.
         """
         try:
             # Recupera info contatto
@@ -17140,6 +19429,7 @@ class DeDToolGUI:
             popup.title(f"Chat segreta — {contact['username']}")
             popup.geometry("700x500")
             popup._last_chat_message_id = 0
+            popup._chat_high_water_at_load = 0
 
             # Frame messaggi
             messages_frame = ttk.Frame(popup)
@@ -17171,65 +19461,43 @@ class DeDToolGUI:
 
             msg_entry.bind('<Return>', lambda e: self._send_secret_message_popup(contact_id, msg_entry, messages_text))
 
-            # ------- FUNZIONE DI POLLING -------
-            def load_messages_periodic():
-                """Polling ottimizzato per chat segreta"""
+            # ------- CARICAMENTO INIZIALE -------
+            def secret_header(m, sender_name):
+                if m['sender_id'] == self.current_user['id']:
+                    return f"Tu → {contact['username']}"
+                return f"{sender_name} → Tu"
+
+            def load_initial_messages():
+                """Carica lo storico recente della conversazione (gli aggiornamenti arrivano dal servizio chat)"""
                 conn = None
                 cursor = None
                 try:
                     conn, cursor = self.safe_cursor()
                     user_id = self.current_user['id']
+                    # Letto prima dello storico: un messaggio arrivato nel frattempo arriva dal servizio chat
+                    popup._chat_high_water_at_load = self.get_chat_sync().read_high_water(cursor)
                     
-                    # ---- 1) QUERY OTTIMIZZATA ----
-                    last_seen_id = getattr(popup, '_last_chat_message_id', 0)
-                    initial_load = last_seen_id <= 0
-
-                    if initial_load:
-                        cursor.execute("""
-                            SELECT
-                                c.id,
-                                c.message,
-                                c.created_at,
-                                c.sender_id,
-                                CASE
-                                    WHEN r.id IS NULL AND c.sender_id != %s THEN 1
-                                    ELSE 0
-                                END as is_new
-                            FROM chat_messages c
-                            LEFT JOIN chat_reads r ON c.id = r.message_id AND r.user_id = %s
-                            WHERE c.is_secret = 1
-                              AND ((c.sender_id = %s AND c.receiver_id = %s)
-                                   OR (c.sender_id = %s AND c.receiver_id = %s))
-                            ORDER BY c.id DESC
-                            LIMIT 200
-                        """, (user_id, user_id, user_id, contact_id, contact_id, user_id))
-                        msgs = list(reversed(cursor.fetchall()))
-                    else:
-                        cursor.execute("""
-                            SELECT
-                                c.id,
-                                c.message,
-                                c.created_at,
-                                c.sender_id,
-                                CASE
-                                    WHEN r.id IS NULL AND c.sender_id != %s THEN 1
-                                    ELSE 0
-                                END as is_new
-                            FROM chat_messages c
-                            LEFT JOIN chat_reads r ON c.id = r.message_id AND r.user_id = %s
-                            WHERE c.is_secret = 1
-                              AND ((c.sender_id = %s AND c.receiver_id = %s)
-                                   OR (c.sender_id = %s AND c.receiver_id = %s))
-                              AND c.id > %s
-                            ORDER BY c.id ASC
-                            LIMIT 200
-                        """, (user_id, user_id, user_id, contact_id, contact_id, user_id, last_seen_id))
-                        msgs = cursor.fetchall()
-
-                    if not msgs and not initial_load:
-                        pass
+                    cursor.execute("""
+                        SELECT
+                            c.id,
+                            c.message,
+                            c.created_at,
+                            c.sender_id,
+                            CASE
+                                WHEN r.id IS NULL AND c.sender_id != %s THEN 1
+                                ELSE 0
+                            END as is_new
+                        FROM chat_messages c
+                        LEFT JOIN chat_reads r ON c.id = r.message_id AND r.user_id = %s
+                        WHERE c.is_secret = 1
+                          AND ((c.sender_id = %s AND c.receiver_id = %s)
+                               OR (c.sender_id = %s AND c.receiver_id = %s))
+                        ORDER BY c.id DESC
+                        LIMIT 200
+                    """, (user_id, user_id, user_id, contact_id, contact_id, user_id))
+                    msgs = list(reversed(cursor.fetchall()))
                     
-                    # ---- 2) MARCA COME LETTI IN BATCH ----
+                    # ---- MARCA COME LETTI IN BATCH ----
                     new_msg_ids = [m['id'] for m in msgs if m['is_new'] == 1]
                     
                     if new_msg_ids:
@@ -17240,41 +19508,13 @@ class DeDToolGUI:
                             SELECT %s, id FROM chat_messages WHERE id IN ({placeholders})
                         """, [user_id] + new_msg_ids)
                         conn.commit()
+                        self._chat_unread_on_read('segreti', new_msg_ids)
 
                     if msgs:
                         popup._last_chat_message_id = max(m['id'] for m in msgs)
                     
-                    # ---- 3) MOSTRA MESSAGGI CON DATA GREGORIANA ----
-                    messages_text.config(state='normal')
-                    if initial_load:
-                        messages_text.delete(1.0, tk.END)
-                    
-                    for m in msgs:
-                        # 🔥 USA DATA GREGORIANA (created_at)
-                        created_at = m.get('created_at')
-                        if created_at:
-                            date_str = created_at.strftime('%d/%m/%Y %H:%M:%S')
-                        else:
-                            date_str = ''
-                        
-                        sender_name = self._chat_users_cache.get(m['sender_id'], {}).get('username', 'Unknown')
-                        
-                        if m['sender_id'] == user_id:
-                            header = f"[{date_str}] Tu → {contact['username']}: "
-                        else:
-                            header = f"[{date_str}] {sender_name} → Tu: "
-                        
-                        messages_text.insert(tk.END, header)
-                        messages_text.insert(tk.END, m['message'] + "\n")
-                        
-                        # 🔥 EVIDENZIA IN VERDE CHIARO SOLO I NUOVI MESSAGGI
-                        if m['is_new'] == 1:
-                            start_idx = messages_text.index("end-2l linestart")
-                            end_idx = messages_text.index("end-1l lineend")
-                            messages_text.tag_add("new_message", start_idx, end_idx)
-                    
-                    messages_text.config(state='disabled')
-                    messages_text.see(tk.END)
+                    # ---- MOSTRA MESSAGGI CON DATA GREGORIANA ----
+                    self._render_chat_messages(messages_text, msgs, secret_header, clear=True)
                     
                 except Exception as e:
                     print(f"Errore caricamento chat segreta: {e}")
@@ -17288,21 +19528,35 @@ class DeDToolGUI:
                         pass
                 finally:
                     self.close_connection(conn, cursor)
-                
-                # ---- 4) SCHEDULA PROSSIMA LETTURA CON INTERVALLO MAGGIORE ----
-                try:
-                    polling_interval = 2000  # 2 secondi per chat segreta (meno frequente)
-                    popup._chat_after_id = popup.after(polling_interval, load_messages_periodic)
-                except:
-                    pass
+
+            def on_new_messages(messages):
+                """Riceve i messaggi nuovi dal ChatSyncService e mostra quelli di questa conversazione."""
+                if not popup.winfo_exists():
+                    return []
+                user_id = self.current_user['id']
+                last_id = getattr(popup, '_last_chat_message_id', 0)
+                msgs = [
+                    m for m in messages
+                    if m['is_secret'] and m['id'] > last_id and (
+                        (m['sender_id'] == user_id and m['receiver_id'] == contact_id)
+                        or (m['sender_id'] == contact_id and m['receiver_id'] == user_id)
+                    )
+                ]
+                if not msgs:
+                    return []
+                popup._last_chat_message_id = msgs[-1]['id']
+                self._render_chat_messages(messages_text, msgs, secret_header)
+                return [m['id'] for m in msgs if m['is_new'] == 1]
 
             # ------- CHIUSURA POPUP -------
+            def release_sync():
+                token = getattr(popup, '_chat_sync_token', None)
+                if token:
+                    self.get_chat_sync().unsubscribe(token)
+                    popup._chat_sync_token = None
+
             def on_close():
-                try:
-                    if hasattr(popup, '_chat_after_id'):
-                        popup.after_cancel(popup._chat_after_id)
-                except:
-                    pass
+                release_sync()
                 popup.destroy()
                 # Aggiorna lista conversazioni
                 try:
@@ -17312,93 +19566,16 @@ class DeDToolGUI:
                     pass
 
             popup.protocol("WM_DELETE_WINDOW", on_close)
+            popup.bind("<Destroy>", lambda e: release_sync() if e.widget == popup else None)
 
-            # Avvia polling immediatamente
-            load_messages_periodic()
+            # Carica subito lo storico e iscrivi il popup al servizio chat
+            load_initial_messages()
+            since_id = max(popup._last_chat_message_id, popup._chat_high_water_at_load)
+            popup._chat_sync_token = self.get_chat_sync().subscribe(on_new_messages, since_id or None)
 
         except Exception as e:
             messagebox.showerror("Errore", f"Errore apertura conversazione: {e}")
 
-    def load_secret_chat_messages_fast(self, text_widget, contact_id):
-        """Caricamento ottimizzato per chat segreta - METODO DI CLASSE"""
-        connection = None
-        cursor = None
-        
-        try:
-            connection = self.get_db_connection()
-            cursor = connection.cursor()
-            user_id = self.current_user['id']
-            
-            # Query ottimizzata con JOIN singolo
-            cursor.execute("""
-                SELECT 
-                    c.id, 
-                    c.message, 
-                    c.created_at,
-                    c.sender_id,
-                    CASE 
-                        WHEN r.id IS NULL AND c.sender_id != %s THEN 1 
-                        ELSE 0 
-                    END as is_new
-                FROM chat_messages c
-                LEFT JOIN chat_reads r ON c.id = r.message_id AND r.user_id = %s
-                WHERE c.is_secret = 1
-                  AND c.receiver_id = %s  # Solo messaggi dove IO sono il destinatario
-                ORDER BY c.created_at ASC
-                LIMIT 50
-            """, (user_id, user_id, user_id))
-            
-            new_messages = cursor.fetchall()
-            
-            if not new_messages:
-                return
-            
-            # Marca come letti in batch
-            new_msg_ids = [msg['id'] for msg in new_messages if msg['is_new'] == 1]
-            
-            if new_msg_ids:
-                placeholders = ','.join(['%s'] * len(new_msg_ids))
-                cursor.execute(f"""
-                    INSERT IGNORE INTO chat_reads (user_id, message_id)
-                    VALUES {','.join([f'(%s, %s)'] * len(new_msg_ids))}
-                """, [val for msg_id in new_msg_ids for val in (user_id, msg_id)])
-                connection.commit()
-            
-            # Mostra messaggi
-            text_widget.config(state='normal')
-            scroll_pos = text_widget.yview()
-            at_bottom = scroll_pos[1] >= 0.95
-            
-            for msg in new_messages:
-                # Data gregoriana
-                created_at = msg.get('created_at')
-                if created_at:
-                    date_str = created_at.strftime('%d/%m/%Y %H:%M:%S')
-                else:
-                    date_str = ''
-                    
-                sender_name = self._chat_users_cache.get(msg['sender_id'], {}).get('username', 'Unknown')
-                message_line = f"[{date_str}] {sender_name}: {msg['message']}\n"
-                text_widget.insert(tk.END, message_line)
-                
-                # Evidenzia in verde chiaro solo se nuovo
-                if msg['is_new'] == 1:
-                    start_idx = text_widget.index("end-2l linestart")
-                    end_idx = text_widget.index("end-1l lineend")
-                    text_widget.tag_add("new_message", start_idx, end_idx)
-            
-            text_widget.config(state='disabled')
-            
-            if at_bottom:
-                text_widget.see(tk.END)
-            
-            self.update_chat_button_fast()
-            
-        except Exception as e:
-            print(f"Errore caricamento chat segreta: {e}")
-        finally:
-            self.close_connection(connection, cursor)
-
     def _send_secret_message_popup(self, contact_id, msg_entry, messages_text):
         """Invia messaggio segreto verso contact_id (usato dal popup)."""
         text = msg_entry.get().strip()
@@ -17420,15 +19597,8 @@ class DeDToolGUI:
             """, (self.current_user['id'], new_msg_id))
             conn.commit()
             msg_entry.delete(0, tk.END)
-            # forziamo refresh immediato della finestra popup (caricamento con funzione interna)
-            # il polling la ricaricherà automaticamente entro 1s; qui ricarichiamo subito
-            try:
-                # simula il refresh: cerca il Toplevel aperto con titolo contenente username
-                # ma più robusto è fare refresh della tree delle conversazioni e lasciare il polling aggiornare il testo
-                if hasattr(self, 'secret_contacts_tree'):
-                    self._load_secret_conversations_list(self.secret_contacts_tree)
-            except:
-                pass
+            # Tick immediato del servizio chat: aggiorna il popup e la lista conversazioni
+            self.get_chat_sync().poke()
         except Exception as e:
             messagebox.showerror("Errore", f"Errore invio messaggio segreto: {e}")
         finally:
@@ -17446,17 +19616,57 @@ class DeDToolGUI:
                 self.chat_button.config(text="💬 Chat")
 
     def export_to_excel(self):
-        """Esporta i dati finanziari in Excel (solo DM)"""
+        """
+        Esporta i dati finanziari (solo DM) in Excel oppure in file CSV, uno per foglio.
+        Le righe arrivano da cursori lato server e vengono scritte in streaming: anche lo
+        storico completo dei movimenti bancari non viene mai caricato tutto in memoria.
+        """
         if not self.current_user or self.current_user['role'] != 'DM':
             messagebox.showwarning("Avviso", "Solo il DM può esportare in Excel")
             return
         
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel", "*.xlsx"), ("CSV (un file per foglio)", "*.csv")],
+            initialfile=f"Dati_Finanziari_{timestamp}.xlsx"
+        )
+        if not filename:
+            return
+        include_ledger = messagebox.askyesno(
+            "Movimenti bancari",
+            "Includere anche lo storico completo dei movimenti bancari?"
+        )
+        sheets = self._financial_export_sheets(include_ledger)
+
+        self.root.config(cursor='watch')
+        self.root.update_idletasks()
         try:
-            
-            cursor = self.db.cursor()
-            
-            # 🔹 CORREZIONE: Rimossa la colonna created_at che non esiste
-            cursor.execute("""
+            if filename.lower().endswith(".csv"):
+                written = self._stream_export_csv(filename, sheets)
+            else:
+                written = self._stream_export_xlsx(filename, sheets)
+        except ImportError:
+            messagebox.showerror("Errore", "Librerie necessarie non installate.\nInstalla con: pip install openpyxl")
+            return
+        except Exception as e:
+            messagebox.showerror("Errore", f"Errore durante l'esportazione: {e}")
+            return
+        finally:
+            self.root.config(cursor='')
+
+        if not written:
+            messagebox.showinfo("Info", "Nessun dato da esportare")
+            return
+        messagebox.showinfo("Successo", "Dati esportati in:\n" + "\n".join(written))
+
+    def _financial_export_sheets(self, include_ledger=False):
+        """Fogli dell'esportazione dati finanziari: (nome foglio, query, formattatori per colonna)."""
+        def money(x):
+            return f"{float(x or 0):.2f}"
+
+        sheets = [
+            ('Banche', """
                 SELECT 
                     pc.name as 'Nome PG',
                     u.username as 'Giocatore',
@@ -17464,15 +19674,15 @@ class DeDToolGUI:
                     b.current_balance as 'Saldo (MO)',
                     b.annual_interest as 'Tasso Interesse (%)',
                     b.location as 'Luogo'
-                    -- Rimossa: b.created_at as 'Data Creazione'
                 FROM banks b
                 LEFT JOIN player_characters pc ON b.pg_id = pc.id
                 LEFT JOIN users u ON pc.user_id = u.id
                 ORDER BY pc.name, b.name
-            """)
-            bank_data = cursor.fetchall()
-            
-            cursor.execute("""
+            """, {
+                'Saldo (MO)': money,
+                'Tasso Interesse (%)': lambda x: f"{float(x):.2f}%" if x else "0.00%",
+            }),
+            ('Attività Economiche', """
                 SELECT 
                     pc.name as 'Nome PG',
                     u.username as 'Giocatore',
@@ -17485,10 +19695,8 @@ class DeDToolGUI:
                 LEFT JOIN users u ON pc.user_id = u.id
                 LEFT JOIN banks b ON ea.destination_bank_id = b.id
                 ORDER BY pc.name, ea.description
-            """)
-            activity_data = cursor.fetchall()
-            
-            cursor.execute("""
+            """, {'Reddito (MO)': money}),
+            ('Spese Fisse', """
                 SELECT 
                     pc.name as 'Nome PG',
                     u.username as 'Giocatore',
@@ -17501,69 +19709,139 @@ class DeDToolGUI:
                 LEFT JOIN users u ON pc.user_id = u.id
                 LEFT JOIN banks b ON fe.source_bank_id = b.id
                 ORDER BY pc.name, fe.description
-            """)
-            expense_data = cursor.fetchall()
-            
-            if not bank_data and not activity_data and not expense_data:
-                messagebox.showinfo("Info", "Nessun dato da esportare")
-                return
-            
-            # 🔹 MODIFICA: Crea file Excel con più fogli
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"Dati_Finanziari_{timestamp}.xlsx"
-            
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                # Foglio BANCHE
-                if bank_data:
-                    df_banks = pd.DataFrame(bank_data)
-                    df_banks['Saldo (MO)'] = df_banks['Saldo (MO)'].apply(lambda x: f"{float(x):.2f}")
-                    df_banks['Tasso Interesse (%)'] = df_banks['Tasso Interesse (%)'].apply(lambda x: f"{float(x):.2f}%" if x else "0.00%")
-                    df_banks.to_excel(writer, sheet_name='Banche', index=False)
-                
-                # Foglio ATTIVITÀ ECONOMICHE
-                if activity_data:
-                    df_activities = pd.DataFrame(activity_data)
-                    df_activities['Reddito (MO)'] = df_activities['Reddito (MO)'].apply(lambda x: f"{float(x):.2f}")
-                    df_activities.to_excel(writer, sheet_name='Attività Economiche', index=False)
-                
-                # Foglio SPESE FISSE
-                if expense_data:
-                    df_expenses = pd.DataFrame(expense_data)
-                    df_expenses['Importo (MO)'] = df_expenses['Importo (MO)'].apply(lambda x: f"-{float(x):.2f}")
-                    df_expenses.to_excel(writer, sheet_name='Spese Fisse', index=False)
-                
-                # 🔹 Formatta automaticamente le colonne
-                workbook = writer.book
-                for sheet_name in writer.sheets:
-                    worksheet = writer.sheets[sheet_name]
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = min(max_length + 2, 50)
-                        worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            messagebox.showinfo("Successo", f"Dati esportati in:\n{filename}")
-            
-        except ImportError:
-            messagebox.showerror("Errore", "Librerie necessarie non installate.\nInstalla con: pip install pandas openpyxl")
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore durante l'esportazione: {e}")
+            """, {'Importo (MO)': lambda x: f"-{float(x):.2f}"}),
+        ]
+        if include_ledger:
+            sheets.append(('Movimenti', """
+                SELECT
+                    t.id as 'ID',
+                    t.timestamp as 'Data/Ora',
+                    b.name as 'Banca',
+                    t.operation_type as 'Operazione',
+                    t.amount as 'Importo (MO)',
+                    pc.name as 'Nome PG',
+                    u.username as 'Giocatore',
+                    b2.name as 'Banca Collegata',
+                    t.reason as 'Motivo'
+                FROM bank_transactions t
+                LEFT JOIN banks b ON t.bank_id = b.id
+                LEFT JOIN banks b2 ON t.target_bank_id = b2.id
+                LEFT JOIN player_characters pc ON t.pg_id = pc.id
+                LEFT JOIN users u ON t.user_id = u.id
+                ORDER BY t.id
+            """, {'Importo (MO)': money}))
+        return sheets
+
+    def _iter_export_rows(self, query, formatters):
+        """
+        Righe di una query di esportazione lette con cursore lato server (SSCursor).
+        Il primo elemento prodotto sono le intestazioni; i valori sono gia' pronti per il file.
+        """
+        conn = self.get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(query)
+            headers = [col[0] for col in cursor.description or []]
+            yield headers
+            column_formatters = [formatters.get(name) for name in headers]
+            for row in cursor:
+                values = []
+                for value, formatter in zip(row, column_formatters):
+                    if formatter:
+                        value = formatter(value)
+                    elif isinstance(value, Decimal):
+                        value = float(value)
+                    elif isinstance(value, (datetime, date)):
+                        value = value.strftime('%Y-%m-%d %H:%M:%S' if isinstance(value, datetime) else '%Y-%m-%d')
+                    values.append(value)
+                yield values
+        finally:
+            self.close_connection(conn, cursor)
+
+    def _stream_export_xlsx(self, filename, sheets):
+        """
+        Scrive i fogli in un workbook openpyxl in sola scrittura (write_only).
+        In questa modalita' le larghezze delle colonne vanno impostate prima della prima riga:
+        ogni foglio passa quindi da un file temporaneo JSON Lines, scritto insieme al calcolo
+        della lunghezza massima di ogni colonna, e poi riletto nel foglio Excel.
+        I fogli oltre il limite di righe di Excel proseguono in "Nome (2)", "Nome (3)"...
+        Restituisce [filename] se e' stata scritta almeno una riga, altrimenti [].
+        """
+        from openpyxl import Workbook
+        from openpyxl.utils import get_column_letter
+
+        workbook = Workbook(write_only=True)
+        total_rows = 0
+        for sheet_name, query, formatters in sheets:
+            with tempfile.TemporaryFile('w+', encoding='utf-8', newline='\n') as spool:
+                rows = self._iter_export_rows(query, formatters)
+                headers = next(rows)
+                widths = [len(str(h)) for h in headers]
+                count = 0
+                for values in rows:
+                    for i, value in enumerate(values):
+                        length = len(str(value)) if value is not None else 0
+                        if length > widths[i]:
+                            widths[i] = length
+                    spool.write(json.dumps(values, ensure_ascii=False) + "\n")
+                    count += 1
+                if not count:
+                    continue
+                total_rows += count
+
+                spool.seek(0)
+                part = 0
+                worksheet = None
+                written = 0
+                for line in spool:
+                    if worksheet is None or written >= self.EXPORT_EXCEL_MAX_ROWS:
+                        part += 1
+                        title = sheet_name if part == 1 else f"{sheet_name} ({part})"
+                        worksheet = workbook.create_sheet(title=title[:31])
+                        for i, width in enumerate(widths, 1):
+                            worksheet.column_dimensions[get_column_letter(i)].width = min(width + 2, self.EXPORT_MAX_COLUMN_WIDTH)
+                        worksheet.append(headers)
+                        written = 0
+                    worksheet.append(json.loads(line))
+                    written += 1
+
+        if not total_rows:
+            return []
+        workbook.save(filename)
+        return [filename]
+
+    def _stream_export_csv(self, filename, sheets):
+        """
+        Scrive un CSV per foglio accanto al nome scelto (es. Dati_Banche.csv), riga per riga.
+        I file senza righe vengono rimossi; restituisce l'elenco dei file scritti.
+        """
+        base, _ext = os.path.splitext(filename)
+        written = []
+        for sheet_name, query, formatters in sheets:
+            slug = re.sub(r"\W+", "_", sheet_name).strip("_")
+            path = f"{base}_{slug}.csv"
+            count = 0
+            # utf-8-sig: Excel riconosce la codifica all'apertura diretta del file
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f, delimiter=';')
+                for values in self._iter_export_rows(query, formatters):
+                    writer.writerow(values)
+                    count += 1
+            if count > 1:
+                written.append(path)
+            else:
+                os.remove(path)
+        return written
 
     def refresh_mount_list(self, pg_id, tree=None):
         """Ricarica cavalcature con i campi logistici della Fase 04."""
         try:
             tree = tree or self.mount_tree
             tree.delete(*tree.get_children())
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM pc_cavalcature WHERE pg_id = %s ORDER BY nome, id", (pg_id,))
-            mounts = cursor.fetchall()
-            cursor.close()
+            mounts = sorted(
+                self.get_character_rows(pg_id, 'pc_cavalcature'),
+                key=lambda r: (self._sql_sort_key(r.get('nome')), r.get('id') or 0)
+            )
             for i, mount in enumerate(mounts):
                 values = (
                     mount.get('tipo') or '',
@@ -17723,14 +20001,11 @@ class DeDToolGUI:
             self.property_tree.delete(*self.property_tree.get_children())
             self.property_tree.tag_configure('oddrow', background='white')
             self.property_tree.tag_configure('evenrow', background='#f0f0f0')
-            cursor = self.db.cursor()
-            query = "SELECT * FROM pc_possedimenti WHERE pg_id = %s"
-            params = [pg_id]
+            properties = self.get_character_rows(pg_id, 'pc_possedimenti')
             if self.current_user and self.current_user.get('role') == 'GIOCATORE':
-                query += " AND visible_to_player = 1"
-            query += " ORDER BY tipo, possedimento"
-            cursor.execute(query, params)
-            for i, prop in enumerate(cursor.fetchall()):
+                properties = [prop for prop in properties if prop.get('visible_to_player') == 1]
+            properties.sort(key=lambda r: (self._sql_sort_key(r.get('tipo')), self._sql_sort_key(r.get('possedimento'))))
+            for i, prop in enumerate(properties):
                 self.property_tree.insert('', 'end', values=(
                     prop.get('tipo') or '',
                     prop.get('possedimento') or '',
@@ -17740,7 +20015,6 @@ class DeDToolGUI:
                     prop.get('rendita') or '',
                     prop.get('costo_manutenzione') or '',
                 ), tags=(prop['id'], 'evenrow' if i % 2 == 0 else 'oddrow'))
-            cursor.close()
         except Exception as e:
             print(f"Errore refresh possedimenti: {e}")
 
@@ -17981,10 +20255,12 @@ class DeDToolGUI:
             if economic_activity_id:
                 cursor.execute("""
                     UPDATE economic_activities
-                    SET pg_id = %s, description = %s, income = %s,
+                    SET next_due_day = IF(frequency = %s AND next_due_day IS NOT NULL, next_due_day, %s),
+                        pg_id = %s, description = %s, income = %s,
                         frequency = %s, destination_bank_id = %s
                     WHERE id = %s AND pg_id = %s
-                """, (pg_id, description, income, frequency, bank_id, economic_activity_id, pg_id))
+                """, (frequency, self._current_next_due_day(frequency),
+                      pg_id, description, income, frequency, bank_id, economic_activity_id, pg_id))
                 if cursor.rowcount == 0:
                     cursor.execute(
                         "SELECT id FROM economic_activities WHERE id = %s AND pg_id = %s",
@@ -17995,9 +20271,9 @@ class DeDToolGUI:
             if not economic_activity_id:
                 cursor.execute("""
                     INSERT INTO economic_activities
-                        (pg_id, description, income, frequency, destination_bank_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (pg_id, description, income, frequency, bank_id))
+                        (pg_id, description, income, frequency, destination_bank_id, next_due_day)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pg_id, description, income, frequency, bank_id, self._current_next_due_day(frequency)))
                 economic_activity_id = cursor.lastrowid
         elif economic_activity_id:
             cursor.execute("DELETE FROM economic_activities WHERE id = %s AND pg_id = %s", (economic_activity_id, pg_id))
@@ -18008,10 +20284,12 @@ class DeDToolGUI:
             if fixed_expense_id:
                 cursor.execute("""
                     UPDATE fixed_expenses
-                    SET pg_id = %s, description = %s, amount = %s,
+                    SET next_due_day = IF(frequency = %s AND next_due_day IS NOT NULL, next_due_day, %s),
+                        pg_id = %s, description = %s, amount = %s,
                         frequency = %s, source_bank_id = %s
                     WHERE id = %s AND pg_id = %s
-                """, (pg_id, description, maintenance, frequency, bank_id, fixed_expense_id, pg_id))
+                """, (frequency, self._current_next_due_day(frequency),
+                      pg_id, description, maintenance, frequency, bank_id, fixed_expense_id, pg_id))
                 if cursor.rowcount == 0:
                     cursor.execute(
                         "SELECT id FROM fixed_expenses WHERE id = %s AND pg_id = %s",
@@ -18022,9 +20300,9 @@ class DeDToolGUI:
             if not fixed_expense_id:
                 cursor.execute("""
                     INSERT INTO fixed_expenses
-                        (pg_id, description, amount, frequency, source_bank_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (pg_id, description, maintenance, frequency, bank_id))
+                        (pg_id, description, amount, frequency, source_bank_id, next_due_day)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pg_id, description, maintenance, frequency, bank_id, self._current_next_due_day(frequency)))
                 fixed_expense_id = cursor.lastrowid
         elif fixed_expense_id:
             cursor.execute("DELETE FROM fixed_expenses WHERE id = %s AND pg_id = %s", (fixed_expense_id, pg_id))
@@ -18150,7 +20428,7 @@ class DeDToolGUI:
 
 def main():
     """Funzione principale"""
-    check_for_updates()
+    # Il controllo aggiornamenti gira in background all'avvio della GUI
     app = DeDToolGUI()
     app.run()
 
@@ -0,0 +1,239 @@
+"""
+Benchmark di build_status_model (Stato Campagna / Esporta TXT) su una campagna sintetica.
+
+Genera in memoria 100 PG e circa 50.000 righe collegate (banche, seguaci, attivita',
+spese, oggetti in banca, obiettivi con eventi, effetti, diario, possedimenti, override)
+e misura:
+- build_status_model: query servite da un cursore finto + raggruppamento negli indici;
+- su richiesta (--legacy-repeat 1) il vecchio abbinamento per PG con scansioni complete
+  delle liste, come riferimento: con i valori predefiniti richiede decine di secondi.
+
+Non serve un database ne' una finestra Tk: la GUI viene creata senza __init__.
+
+Uso:
+    python tools/bench_status_model.py [--pgs 100] [--rows 50000] [--repeat 5] [--legacy-repeat 0] [--max-ms 0]
+"""
+
+import argparse
+import importlib
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Quota delle righe sintetiche per tabella (la somma e' 1)
+ROW_SHARES = (
+    ('banks', 0.006),
+    ('followers', 0.02),
+    ('economic_activities', 0.09),
+    ('fixed_expenses', 0.09),
+    ('bank_items', 0.09),
+    ('follower_objectives', 0.06),
+    ('follower_objective_events', 0.50),
+    ('pc_status_effects', 0.04),
+    ('pc_journal_entries', 0.05),
+    ('pc_possedimenti', 0.034),
+    ('pc_rule_overrides', 0.02),
+)
+
+
+def load_gui_class():
+    sys.path.insert(0, ROOT)
+    module = importlib.import_module("DeD-Tool")
+    return module.DeDToolGUI
+
+
+def generate_campaign(pg_count, row_count, seed=1):
+    """Crea le tabelle sintetiche come liste di dict, con gli stessi campi letti dallo Stato Campagna."""
+    rng = random.Random(seed)
+    counts = {table: max(1, int(row_count * share)) for table, share in ROW_SHARES}
+    base_date = datetime(2026, 1, 1)
+    pg_ids = list(range(1, pg_count + 1))
+    data = {
+        'player_characters': [
+            {'id': pg_id, 'name': f"PG {pg_id}", 'user_id': pg_id % 10 + 1,
+             'pf_attuali': rng.randint(0, 40), 'pf_massimi': 40, 'username': f"utente{pg_id % 10 + 1}"}
+            for pg_id in pg_ids
+        ],
+    }
+    data['banks'] = [
+        {'id': i, 'pg_id': rng.choice(pg_ids), 'name': f"Banca {i}",
+         'current_balance': Decimal(rng.randint(0, 100000)) / 10, 'annual_interest': Decimal('2.0')}
+        for i in range(1, counts['banks'] + 1)
+    ]
+    bank_ids = [bank['id'] for bank in data['banks']]
+    bank_pg = {bank['id']: bank['pg_id'] for bank in data['banks']}
+    data['followers'] = [
+        {'id': i, 'pg_id': rng.choice(pg_ids), 'name': f"Seguace {i}", 'level': rng.randint(1, 12)}
+        for i in range(1, counts['followers'] + 1)
+    ]
+    follower_pg = {follower['id']: follower['pg_id'] for follower in data['followers']}
+    for table, label in (('economic_activities', 'Attivita'), ('fixed_expenses', 'Spesa')):
+        data[table] = []
+        for i in range(1, counts[table] + 1):
+            bank_id = rng.choice(bank_ids)
+            data[table].append({
+                'id': i, 'pg_id': bank_pg[bank_id], 'bank_id': bank_id, 'description': f"{label} {i}",
+                'income': Decimal(rng.randint(1, 500)), 'cost': Decimal(rng.randint(1, 500)),
+                'frequency': rng.choice(('giornaliera', 'settimanale', 'mensile')),
+            })
+    data['bank_items'] = [
+        {'id': i, 'pg_id': rng.choice(pg_ids), 'item_name': f"Oggetto {i}", 'quantity': rng.randint(1, 5),
+         'status': 'DEPOSITATO', 'declared_value': Decimal(rng.randint(1, 1000))}
+        for i in range(1, counts['bank_items'] + 1)
+    ]
+    data['follower_objectives'] = []
+    for i in range(1, counts['follower_objectives'] + 1):
+        follower_id = rng.choice(list(follower_pg))
+        bank_id = rng.choice(bank_ids)
+        data['follower_objectives'].append({
+            'id': i, 'follower_id': follower_id, 'pg_id': follower_pg[follower_id],
+            'bank_id': bank_id, 'bank_name': f"Banca {bank_id}", 'objective_name': f"Obiettivo {i}",
+            'status': rng.choice(('IN_CORSO', 'COMPLETATO', 'FALLITO')), 'progress_percentage': rng.randint(0, 100),
+        })
+    objective_ids = [objective['id'] for objective in data['follower_objectives']]
+    events = [
+        {'id': i, 'objective_id': rng.choice(objective_ids), 'event_type': 'PROGRESSO',
+         'description': f"Evento {i}", 'event_date': base_date + timedelta(days=rng.randint(0, 3650))}
+        for i in range(1, counts['follower_objective_events'] + 1)
+    ]
+    data['follower_objective_events'] = sorted(events, key=lambda e: (e['event_date'], e['id']), reverse=True)
+    data['pc_status_effects'] = sorted((
+        {'id': i, 'pg_id': rng.choice(pg_ids), 'effect_name': f"Effetto {i}", 'is_active': 1,
+         'end_absolute_day': rng.randint(1, 5000)}
+        for i in range(1, counts['pc_status_effects'] + 1)
+    ), key=lambda r: (r['pg_id'], r['end_absolute_day'], r['effect_name']))
+    data['pc_journal_entries'] = sorted((
+        {'id': i, 'pg_id': rng.choice(pg_ids), 'entry_type': 'MISSIONE', 'status': 'APERTO',
+         'title': f"Voce {i}", 'updated_at': base_date + timedelta(minutes=i)}
+        for i in range(1, counts['pc_journal_entries'] + 1)
+    ), key=lambda r: (r['pg_id'], -r['id']))
+    data['pc_possedimenti'] = sorted((
+        {'id': i, 'pg_id': rng.choice(pg_ids), 'tipo': rng.choice(('Casa', 'Terreno', 'Bottega')),
+         'possedimento': f"Possedimento {i}", 'valore': Decimal(rng.randint(100, 10000))}
+        for i in range(1, counts['pc_possedimenti'] + 1)
+    ), key=lambda r: (r['pg_id'], r['tipo'], r['possedimento']))
+    data['pc_rule_overrides'] = sorted((
+        {'id': i, 'pg_id': rng.choice(pg_ids), 'override_scope': 'SAVE', 'field_name': f"campo_{i}",
+         'is_active': 1}
+        for i in range(1, counts['pc_rule_overrides'] + 1)
+    ), key=lambda r: (r['pg_id'], r['override_scope'], r['field_name']))
+    return data
+
+
+class SyntheticCursor:
+    """Cursore finto: riconosce la tabella dalla clausola FROM e restituisce le righe gia' pronte."""
+
+    TABLE_ORDER = (
+        'follower_objective_events', 'follower_objectives', 'player_characters', 'economic_activities',
+        'fixed_expenses', 'bank_items', 'followers', 'banks', 'pc_status_effects',
+        'pc_journal_entries', 'pc_possedimenti', 'pc_rule_overrides',
+    )
+
+    def __init__(self, data):
+        self.data = data
+        self.queries = 0
+        self._rows = []
+
+    def execute(self, query, params=None):
+        self.queries += 1
+        for table in self.TABLE_ORDER:
+            if f"FROM {table}" in query:
+                self._rows = self.data[table]
+                return
+        raise ValueError(f"Query non prevista dal benchmark: {query.strip()[:80]}")
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
+
+
+def legacy_status_join(data):
+    """Abbinamento per PG del vecchio show_status: una scansione completa delle liste per ogni PG."""
+    all_banks = data['banks']
+    all_objectives = data['follower_objectives']
+    all_events = data['follower_objective_events']
+    rendered = 0
+    for pg in data['player_characters']:
+        pg_id = pg['id']
+        pg_banks = [b for b in all_banks if b['pg_id'] == pg_id]
+        pg_followers = [f for f in data['followers'] if f['pg_id'] == pg_id]
+        pg_activities = [a for a in data['economic_activities'] if a['pg_id'] == pg_id]
+        pg_expenses = [e for e in data['fixed_expenses'] if e['pg_id'] == pg_id]
+        pg_items = [i for i in data['bank_items'] if i['pg_id'] == pg_id]
+        for table in ('pc_status_effects', 'pc_journal_entries', 'pc_possedimenti', 'pc_rule_overrides'):
+            rendered += sum(1 for row in data[table] if row['pg_id'] == pg_id)
+        for activity in pg_activities:
+            next((b['name'] for b in all_banks if b['id'] == activity['bank_id']), None)
+        for expense in pg_expenses:
+            next((b['name'] for b in all_banks if b['id'] == expense['bank_id']), None)
+        for follower in pg_followers:
+            for objective in [o for o in all_objectives if o['follower_id'] == follower['id']]:
+                rendered += len([e for e in all_events if e['objective_id'] == objective['id']])
+        rendered += len(pg_banks) + len(pg_items)
+    return rendered
+
+
+def time_runs(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark di build_status_model su dati sintetici")
+    parser.add_argument('--pgs', type=int, default=100, help="numero di PG (default 100)")
+    parser.add_argument('--rows', type=int, default=50000, help="righe collegate totali (default 50000)")
+    parser.add_argument('--repeat', type=int, default=5, help="ripetizioni per misura (default 5)")
+    parser.add_argument('--legacy-repeat', type=int, default=0,
+                        help="ripetizioni del vecchio abbinamento per confronto (default 0: saltato)")
+    parser.add_argument('--max-ms', type=float, default=0,
+                        help="se > 0, termina con errore se la mediana di build_status_model lo supera")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    gui_class = load_gui_class()
+    gui = gui_class.__new__(gui_class)
+    gui.current_user = {'id': 1, 'role': 'DM'}
+
+    start = time.perf_counter()
+    data = generate_campaign(args.pgs, args.rows, args.seed)
+    generated = sum(len(rows) for table, rows in data.items() if table != 'player_characters')
+    print(f"Campagna sintetica: {args.pgs} PG, {generated} righe collegate "
+          f"(generata in {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    cursor = SyntheticCursor(data)
+    model = gui.build_status_model(cursor)
+    indexed = sum(len(rows) for key, index in model.items() if key.endswith('_by_pg')
+                  or key.endswith('_by_follower') or key.endswith('_by_objective')
+                  for rows in index.values())
+    print(f"Query per costruzione: {cursor.queries}, righe indicizzate: {indexed}")
+
+    timings = time_runs(lambda: gui.build_status_model(SyntheticCursor(data)), args.repeat)
+    median = statistics.median(timings)
+    print(f"build_status_model: mediana {median:.1f} ms, min {min(timings):.1f} ms ({args.repeat} giri)")
+
+    if args.legacy_repeat > 0:
+        legacy = time_runs(lambda: legacy_status_join(data), args.legacy_repeat)
+        legacy_median = statistics.median(legacy)
+        print(f"Vecchio abbinamento per PG: mediana {legacy_median:.1f} ms ({args.legacy_repeat} giri), "
+              f"{legacy_median / median if median else 0:.0f}x")
+
+    if args.max_ms > 0 and median > args.max_ms:
+        print(f"❌ build_status_model oltre il limite: {median:.1f} ms > {args.max_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Controllo del tempo di import a freddo di DeD-Tool.py.
+
+Importa il modulo in un processo separato con `python -X importtime` e fallisce
+(exit code 1) se:
+- uno dei pacchetti pesanti caricati su richiesta (pandas, openai, cryptography,
+  requests, dbutils, openpyxl) compare tra gli import dell'avvio;
+- il tempo cumulativo di import supera il budget (--budget-ms).
+
+pymysql importa cryptography da pymysql._auth quando e' installato: quel percorso
+e' ammesso perche' non dipende da DeD-Tool.
+
+Uso:
+    python tools/check_import_time.py [--budget-ms 500] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "DeD-Tool"
+
+# Pacchetti che DeD-Tool importa solo nelle funzioni che li usano
+FORBIDDEN = ('pandas', 'openai', 'cryptography', 'requests', 'dbutils', 'openpyxl')
+# Pacchetto vietato -> pacchetti terzi da cui puo' arrivare legittimamente
+ALLOWED_VIA = {
+    'cryptography': ('pymysql',),
+}
+DEFAULT_BUDGET_MS = 500
+
+
+def run_importtime():
+    """Importa DeD-Tool in un processo nuovo e restituisce le righe di -X importtime."""
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); import importlib; importlib.import_module({MODULE!r})"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import di {MODULE} fallito:\n{result.stderr[-2000:]}")
+    return [line for line in result.stderr.splitlines() if line.startswith("import time:")]
+
+
+def parse_importtime(lines):
+    """
+    Converte le righe di -X importtime in record (nome, self_us, cumulative_us, depth, parents).
+    Il formato e' post-ordine: un modulo compare prima di chi lo ha importato, con
+    un'indentazione maggiore; parents e' la catena degli importatori fino al livello 0.
+    """
+    records = []
+    for line in lines:
+        body = line[len("import time:"):]
+        parts = body.split("|", 2)
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name_field = parts[2]
+        stripped = name_field.lstrip()
+        depth = (len(name_field) - len(stripped) - 1) // 2
+        records.append({
+            'name': stripped.strip(),
+            'self_us': int(parts[0].strip()),
+            'cumulative_us': int(parts[1].strip()),
+            'depth': depth,
+        })
+    # Il padre di una riga e' la prima riga successiva con profondita' minore
+    pending = []
+    for record in reversed(records):
+        while pending and pending[-1]['depth'] >= record['depth']:
+            pending.pop()
+        record['parents'] = [parent['name'] for parent in pending]
+        pending.append(record)
+    return records
+
+
+def forbidden_imports(records):
+    """Restituisce i moduli vietati caricati all'avvio, con la catena di import che li ha richiesti."""
+    hits = []
+    for record in records:
+        root_package = record['name'].split('.')[0].lower()
+        if root_package not in FORBIDDEN:
+            continue
+        importers = [parent.split('.')[0].lower() for parent in record['parents']]
+        if any(parent in ALLOWED_VIA.get(root_package, ()) for parent in importers):
+            continue
+        if any(parent == root_package for parent in importers):
+            # Sottomodulo di un pacchetto gia' segnalato
+            continue
+        hits.append(record)
+    return hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Controllo tempo di import a freddo di DeD-Tool.py")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"tempo massimo di import cumulativo in ms (default {DEFAULT_BUDGET_MS})")
+    parser.add_argument('--top', type=int, default=15, help="moduli piu' lenti da mostrare")
+    args = parser.parse_args(argv)
+
+    # Primo giro solo per scrivere il bytecode in __pycache__: si misura l'avvio normale,
+    # non la compilazione dopo un aggiornamento dello script
+    run_importtime()
+    records = parse_importtime(run_importtime())
+
+    total_us = sum(record['cumulative_us'] for record in records if record['depth'] == 0)
+    print(f"Import di {MODULE}: {total_us / 1000:.1f} ms cumulativi (budget {args.budget_ms:.0f} ms)")
+    print("Moduli piu' lenti (self):")
+    for record in sorted(records, key=lambda r: r['self_us'], reverse=True)[:args.top]:
+        print(f"  {record['self_us'] / 1000:8.1f} ms  {record['name']}")
+
+    failed = False
+    for record in forbidden_imports(records):
+        chain = " <- ".join([record['name']] + record['parents'][::-1])
+        print(f"❌ Import pesante all'avvio: {chain}")
+        failed = True
+    if total_us / 1000 > args.budget_ms:
+        print(f"❌ Tempo di import oltre il budget: {total_us / 1000:.1f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ Nessun import pesante all'avvio e tempo entro il budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())